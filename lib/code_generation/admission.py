@@ -0,0 +1,184 @@
+"""
+Admission control: bounded in-flight work and wait queues with load shedding.
+
+Each controller admits up to max_in_flight requests at once and lets at
+most max_queue more wait, first come first served. Anything beyond that
+is rejected immediately (the server answers 503 with Retry-After), and a
+queued request whose deadline passes is dropped before it runs. Under
+overload this keeps latency for admitted requests bounded instead of
+letting every request queue behind every other.
+
+Clients can send their own budget in milliseconds with the
+X-Request-Timeout-Ms header.
+
+Controllers live in process memory, so limits apply per server process.
+They need a threaded server to see concurrent requests: api_server.py's
+development server, or serve.py, whose workers each serve up to
+--threads requests and answer connections beyond that with 503 at
+accept time, with a listen backlog sized to match.
+
+Configuration (environment variables):
+    CODEGEN_MAX_IN_FLIGHT      - concurrent requests per endpoint (default: 8)
+    CODEGEN_MAX_QUEUE          - requests allowed to wait per endpoint (default: 16)
+    CODEGEN_MAX_QUEUE_WAIT_MS  - longest any request waits for a slot (default: 5000)
+"""
+
+from typing import Dict, Any, Optional, Tuple
+from collections import deque
+import math
+import os
+import threading
+import time
+
+
+MAX_IN_FLIGHT = int(os.environ.get("CODEGEN_MAX_IN_FLIGHT", 8))
+MAX_QUEUE = int(os.environ.get("CODEGEN_MAX_QUEUE", 16))
+MAX_QUEUE_WAIT = float(os.environ.get("CODEGEN_MAX_QUEUE_WAIT_MS", 5000)) / 1000
+
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+# Smoothing factor for the moving average of service time
+_EWMA_ALPHA = 0.2
+
+
+class Rejected(Exception):
+    """Raised when a request is shed: queue full or deadline passed."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_deadline(timeout_ms: Optional[str], now: Optional[float] = None) -> float:
+    """
+    Absolute monotonic deadline for a request.
+
+    Args:
+        timeout_ms: Value of the X-Request-Timeout-Ms header, if any
+        now: Current monotonic time (defaults to time.monotonic())
+
+    Returns:
+        The client's deadline, capped at the server's maximum queue wait
+    """
+    now = time.monotonic() if now is None else now
+    deadline = now + MAX_QUEUE_WAIT
+    if timeout_ms:
+        try:
+            deadline = min(deadline, now + max(float(timeout_ms), 0.0) / 1000)
+        except ValueError:
+            pass
+    return deadline
+
+
+class AdmissionController:
+    """
+    Counting gate with a bounded FIFO wait queue.
+    A released slot is handed directly to the oldest waiter.
+    """
+
+    def __init__(self, name: str, max_in_flight: int = MAX_IN_FLIGHT, max_queue: int = MAX_QUEUE):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.in_flight = 0
+        self._waiters: "deque[threading.Event]" = deque()
+        self._lock = threading.Lock()
+        self._service_time = 0.05
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait, from queue depth and service time."""
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._service_time * backlog / self.max_in_flight))
+
+    def acquire(self, deadline: float) -> None:
+        """
+        Take a slot, waiting in line until the deadline if none is free.
+
+        Args:
+            deadline: Absolute time.monotonic() deadline
+
+        Raises:
+            Rejected: If the queue is full or the deadline passes first
+        """
+        with self._lock:
+            if self.in_flight < self.max_in_flight and not self._waiters:
+                self.in_flight += 1
+                self.admitted += 1
+                return
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise Rejected(f"Server busy ({self.name} queue full)", self.retry_after())
+            granted = threading.Event()
+            self._waiters.append(granted)
+
+        granted.wait(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            # A slot handed over just after the timeout still counts
+            if granted.is_set():
+                self.admitted += 1
+                return
+            self._waiters.remove(granted)
+            self.expired += 1
+            raise Rejected("Request deadline exceeded while queued", self.retry_after())
+
+    def release(self, elapsed: Optional[float] = None) -> None:
+        """
+        Free a slot, passing it to the next waiter if there is one.
+
+        Args:
+            elapsed: How long the request held its slot, for Retry-After estimates
+        """
+        with self._lock:
+            if elapsed is not None:
+                self._service_time += _EWMA_ALPHA * (elapsed - self._service_time)
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring."""
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "service_time_ms": round(self._service_time * 1000, 3)
+        }
+
+
+_controllers: Dict[str, AdmissionController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(name: str, limits: Optional[Tuple[int, int]] = None) -> AdmissionController:
+    """
+    Get the controller for an endpoint (created on first use).
+
+    Args:
+        name: Endpoint name
+        limits: Optional (max_in_flight, max_queue); defaults from the environment
+    """
+    with _controllers_lock:
+        controller = _controllers.get(name)
+        if controller is None:
+            max_in_flight, max_queue = limits or (MAX_IN_FLIGHT, MAX_QUEUE)
+            controller = _controllers[name] = AdmissionController(name, max_in_flight, max_queue)
+        return controller
+
+
+def all_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every controller, keyed by endpoint name."""
+    with _controllers_lock:
+        return {name: controller.stats() for name, controller in _controllers.items()}
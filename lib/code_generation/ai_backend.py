@@ -0,0 +1,367 @@
+"""
+Pluggable backends for the AI-generated code display mode.
+
+The AI mode asks a backend to write idiomatic Python for a block program.
+Every request goes through AICodeGenerator, which:
+
+    - normalizes the program (fingerprint.normalize: defaults filled in,
+      values and conditions normalized) and hashes it, so programs that
+      differ only in spelling share one result
+    - answers from the result cache (result_cache.py, kind "ai"), so an
+      identical program never pays for model latency twice, across
+      requests, workers and restarts. The key is the backend/model id,
+      PROMPT_VERSION and the normalized program hash, so http answers also
+      survive deploys; the local backend's id includes the result cache's
+      CODE_VERSION, because its output is derived from this code
+    - coalesces identical in-flight requests into one backend call
+      (single flight): concurrent callers wait for the same result
+    - limits concurrent backend calls and bounds every call by a timeout,
+      which includes the time spent waiting for a slot
+
+Backends:
+
+    local   deterministic stand-in that writes the code itself; no network,
+            same output for the same program (tests, offline deployments)
+    http    POSTs {"model", "prompt"} as JSON to CODEGEN_AI_URL and expects
+            {"code": "..."} back; put a proxy for the model provider there
+
+Failures are not cached; callers get an AIBackendError.
+
+Configuration (environment variables):
+    CODEGEN_AI_BACKEND          - "local" (default) or "http"
+    CODEGEN_AI_URL              - endpoint of the http backend
+    CODEGEN_AI_API_KEY          - bearer token sent to the http backend (optional)
+    CODEGEN_AI_MODEL            - model name sent to the http backend (default: "default")
+    CODEGEN_AI_TIMEOUT          - seconds one generation may take (default: 30)
+    CODEGEN_AI_MAX_CONCURRENCY  - backend calls in flight at once (default: 4)
+"""
+
+from typing import Dict, List, Any, Optional
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import json
+import os
+import threading
+import time
+import urllib.request
+
+from code_generator import BlockType
+from fingerprint import normalize
+from result_cache import CODE_VERSION, ResultCache, get_result_cache, program_hash
+import wire
+
+
+AI_BACKEND = os.environ.get("CODEGEN_AI_BACKEND", "local")
+AI_URL = os.environ.get("CODEGEN_AI_URL") or None
+AI_API_KEY = os.environ.get("CODEGEN_AI_API_KEY") or None
+AI_MODEL = os.environ.get("CODEGEN_AI_MODEL", "default")
+AI_TIMEOUT = float(os.environ.get("CODEGEN_AI_TIMEOUT", 30))
+AI_MAX_CONCURRENCY = int(os.environ.get("CODEGEN_AI_MAX_CONCURRENCY", 4))
+
+# Bump when the prompt changes, so cached answers to the old prompt are not reused
+PROMPT_VERSION = "p1"
+
+# Runs of at least this many identical blocks become a for loop (local backend)
+MIN_LOOP_RUN = 3
+
+_BODY_PARAMS = ("body", "if_body", "else_body")
+
+
+class AIBackendError(RuntimeError):
+    """Raised when AI code can't be produced: backend failure, busy or timed out."""
+
+
+def build_prompt(program: List[Dict[str, Any]]) -> str:
+    """
+    Prompt asking a model to write code for a normalized program.
+
+    Args:
+        program: Normalized list of block dictionaries
+
+    Returns:
+        The prompt text (deterministic for a given program)
+    """
+    lines = [
+        "Write idiomatic Python for the following robot program.",
+        "The functions move_forward(distance), move_backward(distance), turn_left(degrees),",
+        "turn_right(degrees), jump(height) and pick_object(object_name) are defined.",
+        "Use loops for repetition and keep short comments. Reply with code only.",
+        "",
+    ]
+
+    def describe(blocks: List[Dict[str, Any]], depth: int) -> None:
+        for index, block in enumerate(blocks):
+            params = {name: value for name, value in block["params"].items() if name not in _BODY_PARAMS}
+            lines.append(f"{'  ' * depth}{index + 1}. {block['type']} {json.dumps(params, sort_keys=True)}")
+            for name in _BODY_PARAMS:
+                if name in block["params"]:
+                    lines.append(f"{'  ' * (depth + 1)}{name}:")
+                    describe(block["params"][name], depth + 2)
+
+    describe(program, 0)
+    return "\n".join(lines) + "\n"
+
+
+class AIBackend(ABC):
+    """Base class: turns a prompt (and the program it describes) into code."""
+
+    name = "base"
+
+    @property
+    def cache_id(self) -> str:
+        """Identifies the backend and model in cache keys."""
+        return self.name
+
+    @abstractmethod
+    def generate(self, prompt: str, program: List[Dict[str, Any]], timeout: float) -> str:
+        """
+        Produce code for a program.
+
+        Args:
+            prompt: Prompt built by build_prompt
+            program: The normalized program the prompt describes
+            timeout: Seconds the call may take
+
+        Returns:
+            Python source code
+
+        Raises:
+            AIBackendError: If no code could be produced
+        """
+
+
+class LocalBackend(AIBackend):
+    """
+    Deterministic stand-in for a model: writes compact, commented code
+    (repeated blocks folded into loops) straight from the program.
+    """
+
+    name = "local"
+    # Bump when the rendered code changes (this file is not part of CODE_VERSION)
+    version = "1"
+
+    @property
+    def cache_id(self) -> str:
+        # Output depends on normalization and block definitions too
+        return f"{self.name}:v{self.version}:{CODE_VERSION}"
+
+    def generate(self, prompt: str, program: List[Dict[str, Any]], timeout: float) -> str:
+        body: List[str] = []
+        self._render(program, 0, body)
+        header = ["# AI-generated code (local stand-in)"]
+        if any(line.lstrip().startswith("time.sleep") for line in body):
+            header.append("import time")
+        return "\n".join(header + [""] + (body or ["pass"])) + "\n"
+
+    def _render(self, blocks: List[Dict[str, Any]], depth: int, lines: List[str]) -> None:
+        index = 0
+        while index < len(blocks):
+            block = blocks[index]
+            run = 1
+            while index + run < len(blocks) and blocks[index + run] == block:
+                run += 1
+            if run >= MIN_LOOP_RUN:
+                lines.append(f"{'    ' * depth}for _ in range({run}):")
+                self._render_block(block, depth + 1, lines)
+                index += run
+            else:
+                self._render_block(block, depth, lines)
+                index += 1
+
+    def _render_body(self, blocks: List[Dict[str, Any]], depth: int, lines: List[str]) -> None:
+        if blocks:
+            self._render(blocks, depth, lines)
+        else:
+            lines.append(f"{'    ' * depth}pass")
+
+    def _render_block(self, block: Dict[str, Any], depth: int, lines: List[str]) -> None:
+        pad = "    " * depth
+        block_type = block["type"]
+        params = block["params"]
+        if block_type in (BlockType.MOVE_FORWARD.value, BlockType.MOVE_BACKWARD.value):
+            lines.append(f"{pad}{block_type}({params.get('distance', 1)})")
+        elif block_type in (BlockType.TURN_LEFT.value, BlockType.TURN_RIGHT.value):
+            lines.append(f"{pad}{block_type}({params.get('degrees', 90)})")
+        elif block_type == BlockType.JUMP.value:
+            lines.append(f"{pad}jump({params.get('height', 1)})")
+        elif block_type == BlockType.PICK_OBJECT.value:
+            lines.append(f"{pad}pick_object({json.dumps(params.get('object_name', ''))})")
+        elif block_type == BlockType.PRINT.value:
+            lines.append(f"{pad}print({json.dumps(params.get('message', ''))})")
+        elif block_type == BlockType.WAIT.value:
+            lines.append(f"{pad}time.sleep({params.get('seconds', 1)})")
+        elif block_type == BlockType.LOOP.value:
+            lines.append(f"{pad}# Repeat {params.get('iterations', 3)} times")
+            lines.append(f"{pad}for _ in range({params.get('iterations', 3)}):")
+            self._render_body(params.get("body", []), depth + 1, lines)
+        elif block_type == BlockType.CONDITIONAL.value:
+            lines.append(f"{pad}if {params.get('condition', 'True')}:")
+            self._render_body(params.get("if_body", []), depth + 1, lines)
+            if params.get("else_body"):
+                lines.append(f"{pad}else:")
+                self._render_body(params["else_body"], depth + 1, lines)
+        else:
+            lines.append(f"{pad}# {block_type}: {json.dumps(params, sort_keys=True)}")
+
+
+class HTTPBackend(AIBackend):
+    """Model behind an HTTP endpoint: POST {"model", "prompt"}, answer {"code"}."""
+
+    name = "http"
+
+    def __init__(self, url: str, api_key: Optional[str] = None, model: str = AI_MODEL):
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+
+    @property
+    def cache_id(self) -> str:
+        return f"http:{self.model}"
+
+    def generate(self, prompt: str, program: List[Dict[str, Any]], timeout: float) -> str:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(
+            self.url, data=wire.dumps({"model": self.model, "prompt": prompt}),
+            headers=headers, method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                payload = wire.loads(response.read())
+        except (OSError, ValueError) as e:
+            raise AIBackendError(f"AI backend request failed: {e}") from None
+        code = payload.get("code") if isinstance(payload, dict) else None
+        if not isinstance(code, str):
+            raise AIBackendError("AI backend response has no code")
+        return code
+
+
+def create_backend(name: str = AI_BACKEND) -> AIBackend:
+    """
+    Create a backend by name ("local" or "http").
+
+    Raises:
+        ValueError: On an unknown name, or "http" without CODEGEN_AI_URL
+    """
+    if name == "local":
+        return LocalBackend()
+    if name == "http":
+        if not AI_URL:
+            raise ValueError("CODEGEN_AI_URL must be set for the http AI backend")
+        return HTTPBackend(AI_URL, AI_API_KEY, AI_MODEL)
+    raise ValueError(f"Unknown AI backend: {name!r}")
+
+
+class AICodeGenerator:
+    """
+    Cached, single-flight, concurrency-limited front end to an AIBackend.
+
+        code = get_ai_code_generator().generate(blocks)
+    """
+
+    def __init__(self, backend: AIBackend, timeout: float = AI_TIMEOUT,
+                 max_concurrency: int = AI_MAX_CONCURRENCY, cache: Optional[ResultCache] = None):
+        self.backend = backend
+        self.timeout = timeout
+        self.cache = cache if cache is not None else get_result_cache()
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    @staticmethod
+    def program_key(blocks: List[Dict[str, Any]]) -> str:
+        """Hash of the normalized program (equal for equally generated programs)."""
+        return program_hash(normalize(blocks))
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Get the cached code for a program_key without calling the backend."""
+        return self.cache.get("ai", self.backend.cache_id, PROMPT_VERSION, key)
+
+    def generate(self, blocks: List[Dict[str, Any]], timeout: Optional[float] = None) -> str:
+        """
+        Get AI-generated code for a program.
+
+        Args:
+            blocks: List of block dictionaries
+            timeout: Seconds to wait at most (defaults to the generator's timeout)
+
+        Returns:
+            Python source code
+
+        Raises:
+            AIBackendError: If the backend fails, no slot frees up or the call times out
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        program = normalize(blocks)
+        key = program_hash(program)
+        code = self.lookup(key)
+        if code is not None:
+            self.cache_hits += 1
+            return code
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            try:
+                return future.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeoutError:
+                raise AIBackendError("Timed out waiting for AI-generated code") from None
+
+        try:
+            code = self._call(program, deadline)
+            self.cache.put("ai", self.backend.cache_id, PROMPT_VERSION, key, code)
+            future.set_result(code)
+            return code
+        except BaseException as e:
+            self.failures += 1
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _call(self, program: List[Dict[str, Any]], deadline: float) -> str:
+        if not self._slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            raise AIBackendError("AI backend is busy; try again later")
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise AIBackendError("Timed out waiting for the AI backend")
+            self.calls += 1
+            return self.backend.generate(build_prompt(program), program, remaining)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring."""
+        return {
+            "backend": self.backend.cache_id,
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "in_flight": len(self._in_flight)
+        }
+
+
+_generator: Optional[AICodeGenerator] = None
+_generator_lock = threading.Lock()
+
+
+def get_ai_code_generator() -> AICodeGenerator:
+    """Get the process-wide AI code generator (created on first use)."""
+    global _generator
+    with _generator_lock:
+        if _generator is None:
+            _generator = AICodeGenerator(create_backend())
+        return _generator
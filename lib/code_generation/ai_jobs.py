@@ -0,0 +1,282 @@
+"""
+Background jobs for AI-generated code.
+
+POST /generate-code/ai answers at once with the template code and a job
+ID; the AI code is produced in the background, so no request thread
+ever waits for the model. Clients poll GET /ai-jobs/<id> or open
+GET /ai-jobs/<id>/events, an SSE stream that ends with one "done" or
+"failed" event.
+
+Jobs run in the scheduler's background class (scheduler.py): they step
+aside at a yield point while interactive or grading requests are
+pending and only take a background slot. A program whose AI code is
+already cached gets a job that is done on creation, and requests for a
+program with a pending job share that job. Finished jobs stay fetchable
+for CODEGEN_AI_JOB_TTL seconds.
+
+The job table is per process. When the result cache has a shared SQLite
+store (CODEGEN_RESULT_CACHE), every job's status is also written there,
+so under serve.py any worker can answer GET /ai-jobs/<id> and its event
+stream (which then polls the shared status). Without one, api_server.py
+refuses the AI job routes when serve.py runs more than one worker.
+
+Configuration (environment variables):
+    CODEGEN_AI_JOB_TTL   - seconds a finished job is kept (default: 600)
+    CODEGEN_AI_MAX_JOBS  - jobs kept at once, pending or finished (default: 10000)
+"""
+
+from typing import Dict, List, Any, Iterator, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import os
+import secrets
+import threading
+import time
+
+from admission import Rejected
+from ai_backend import AI_MAX_CONCURRENCY, AICodeGenerator, get_ai_code_generator
+from result_cache import ResultCache
+from live_preview import SSE_KEEPALIVE, SSE_RETRY_MS, format_event
+from scheduler import BACKGROUND, get_scheduler
+
+
+AI_JOB_TTL = float(os.environ.get("CODEGEN_AI_JOB_TTL", 600))
+AI_MAX_JOBS = int(os.environ.get("CODEGEN_AI_MAX_JOBS", 10000))
+
+# How often a stream for another worker's job re-reads its shared status (seconds)
+SHARED_POLL_INTERVAL = 0.5
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class AIJob:
+    """
+    One AI generation: its status and, once finished, the code or the error.
+    A job run by another worker is a read-only view of its shared status.
+    """
+
+    def __init__(self, job_id: str, key: str, cache: Optional[ResultCache] = None):
+        self.job_id = job_id
+        self.key = key
+        self.status = QUEUED
+        self.code: Optional[str] = None
+        self.error: Optional[str] = None
+        self.finished_at: Optional[float] = None
+        self.finished = threading.Event()
+        # Set for jobs of other workers: where to re-read the status
+        self._shared: Optional[ResultCache] = cache
+
+    @classmethod
+    def from_record(cls, job_id: str, record: Dict[str, Any], cache: ResultCache) -> "AIJob":
+        """View of a job from its shared status record."""
+        job = cls(job_id, "", cache)
+        job._apply(record)
+        return job
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        self.status = record.get("status", QUEUED)
+        if self.status in (DONE, FAILED):
+            self.code = record.get("ai_code")
+            self.error = record.get("error")
+            self.finished_at = time.monotonic()
+            self.finished.set()
+
+    def wait(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for the job to finish; True if it has."""
+        if self._shared is None:
+            return self.finished.wait(timeout)
+        deadline = time.monotonic() + timeout
+        while not self.finished.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(SHARED_POLL_INTERVAL, remaining))
+            record = load_record(self._shared, self.job_id)
+            if record is None:
+                self._apply({"status": FAILED, "error": "Job expired"})
+            else:
+                self._apply(record)
+        return True
+
+    def finish(self, code: Optional[str] = None, error: Optional[str] = None) -> None:
+        """Record the outcome and wake everyone waiting for it."""
+        self.code = code
+        self.error = error
+        self.status = DONE if error is None else FAILED
+        self.finished_at = time.monotonic()
+        self.finished.set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view: {"job_id", "status"} plus "ai_code" or "error" once finished."""
+        payload: Dict[str, Any] = {"job_id": self.job_id, "status": self.status}
+        if self.status == DONE:
+            payload["ai_code"] = self.code
+        elif self.status == FAILED:
+            payload["error"] = self.error
+        return payload
+
+
+class AIJobQueue:
+    """
+    Job table plus a small worker pool that runs jobs in the background class.
+
+        job = get_ai_jobs().submit(blocks)
+        get_ai_jobs().get(job.job_id).to_dict()
+    """
+
+    def __init__(self, generator: AICodeGenerator, workers: int = AI_MAX_CONCURRENCY,
+                 ttl: float = AI_JOB_TTL, max_jobs: int = AI_MAX_JOBS):
+        self.generator = generator
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, AIJob]" = OrderedDict()
+        self._pending: Dict[str, AIJob] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ai-job")
+        self.submitted = 0
+        self.shared = 0
+
+    @property
+    def _cache(self) -> Optional[ResultCache]:
+        cache = self.generator.cache
+        return cache if cache.shared else None
+
+    def _publish(self, job: AIJob) -> None:
+        """Write a job's status to the shared store for the other workers."""
+        cache = self._cache
+        if cache is None:
+            return
+        # Pending jobs whose worker died must not look pending forever
+        keep = self.ttl if job.finished.is_set() else self.generator.timeout + self.ttl
+        cache.put(_RECORD_KIND, "-", "status", job.job_id, {**job.to_dict(), "expires": time.time() + keep})
+
+    def _expire(self, now: float) -> None:
+        """Drop finished jobs past their TTL (oldest first). Caller holds the lock."""
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job.finished_at is None or now - job.finished_at < self.ttl:
+                break
+            self._jobs.popitem(last=False)
+
+    def submit(self, blocks: List[Dict[str, Any]]) -> AIJob:
+        """
+        Start (or join) the AI generation of a validated program.
+
+        Args:
+            blocks: List of block dictionaries
+
+        Returns:
+            The job; already done if the code was cached
+
+        Raises:
+            Rejected: If too many jobs are kept
+        """
+        key = self.generator.program_key(blocks)
+        with self._lock:
+            self._expire(time.monotonic())
+            job = self._pending.get(key)
+            if job is not None:
+                self.shared += 1
+                return job
+            if len(self._jobs) >= self.max_jobs:
+                raise Rejected("Too many AI jobs", 5)
+            job = AIJob(secrets.token_urlsafe(12), key)
+            self._jobs[job.job_id] = job
+            self._pending[key] = job
+            self.submitted += 1
+
+        code = self.generator.lookup(key)
+        if code is not None:
+            job.finish(code)
+            with self._lock:
+                self._pending.pop(key, None)
+            self._publish(job)
+            return job
+        self._publish(job)
+        self._executor.submit(self._run, job, blocks)
+        return job
+
+    def _run(self, job: AIJob, blocks: List[Dict[str, Any]]) -> None:
+        scheduler = get_scheduler()
+        deadline = time.monotonic() + self.generator.timeout
+        try:
+            try:
+                scheduler.yield_point(BACKGROUND)
+                scheduler.acquire(BACKGROUND, deadline)
+            except Rejected as e:
+                job.finish(error=e.reason)
+                return
+            started = time.monotonic()
+            job.status = RUNNING
+            self._publish(job)
+            try:
+                code = self.generator.generate(blocks, timeout=max(deadline - time.monotonic(), 0))
+                job.finish(code)
+            except Exception as e:
+                job.finish(error=str(e))
+            finally:
+                scheduler.release(BACKGROUND, time.monotonic() - started)
+        finally:
+            with self._lock:
+                self._pending.pop(job.key, None)
+            self._publish(job)
+
+    def get(self, job_id: str) -> Optional[AIJob]:
+        """Get a job by ID, from this worker or the shared store (None if unknown or expired)."""
+        with self._lock:
+            self._expire(time.monotonic())
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        cache = self._cache
+        record = load_record(cache, job_id) if cache is not None else None
+        return AIJob.from_record(job_id, record, cache) if record is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring."""
+        return {
+            "jobs": len(self._jobs),
+            "pending": len(self._pending),
+            "submitted": self.submitted,
+            "shared": self.shared,
+            "generator": self.generator.stats()
+        }
+
+
+_RECORD_KIND = "ai_job"
+
+
+def load_record(cache: ResultCache, job_id: str) -> Optional[Dict[str, Any]]:
+    """A job's shared status record, or None if there is none or it expired."""
+    record = cache.get(_RECORD_KIND, "-", "status", job_id)
+    if not isinstance(record, dict) or record.get("expires", 0) < time.time():
+        return None
+    return record
+
+
+def event_stream(job: AIJob) -> Iterator[bytes]:
+    """
+    SSE byte stream of one job: a "status" event, keep-alives while it
+    runs, then a final "done" or "failed" event.
+    """
+    yield f"retry: {SSE_RETRY_MS}\n\n".encode("utf-8")
+    yield format_event("status", job.to_dict())
+    while not job.wait(SSE_KEEPALIVE):
+        yield b": keep-alive\n\n"
+    yield format_event(job.status, job.to_dict())
+
+
+_jobs: Optional[AIJobQueue] = None
+_jobs_lock = threading.Lock()
+
+
+def get_ai_jobs() -> AIJobQueue:
+    """Get the process-wide AI job queue (created on first use)."""
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = AIJobQueue(get_ai_code_generator())
+        return _jobs
@@ -4,21 +4,184 @@ Simple Flask API Server for Code Generation
 This receives blocks from your Next.js frontend and returns generated code.
 
 Usage:
-    python3 api_server.py
+    python3 api_server.py        # development server (FLASK_DEBUG=1 for debugger/reloader)
+    python3 serve.py             # production: prefork multi-worker server
 
 Then from Next.js, call:
     POST http://localhost:5000/generate-code
     Body: { "blocks": [...], "level": 4 }
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from code_generator import CodeGenerator, GameplaySession
-import json
+from code_generator import CodeGenerator
+from level_solver import get_hint, precompute_all
+from fingerprint import get_solution_index
+from batch import generate_batch
+from block_input import STREAM_PARSE_BYTES
+from session_store import SessionNotFound, get_session_store
+from coalesce import get_coalescer
+import live_preview
+import ai_jobs
+from admission import DEADLINE_HEADER, Rejected, get_controller, parse_deadline
+from scheduler import GRADING, INTERACTIVE, get_scheduler
+from validation import ValidationError, check_blocks
+from result_cache import get_result_cache
+import plan_codec
+import service
+import wire
+import os
+import time
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes through wire.dumps (orjson when installed)."""
+    
+    def dumps(self, obj, **kwargs):
+        return wire.dumps(obj).decode('utf-8')
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(wire.dumps(obj), mimetype=self.mimetype)
+
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)  # Enable CORS for Next.js frontend
 
+# Largest batch accepted by /generate-code/batch
+BATCH_MAX_ITEMS = int(os.environ.get('CODEGEN_BATCH_MAX_ITEMS', 1000))
+
+# (max in flight, max queued) for endpoints that differ from the defaults
+ENDPOINT_LIMITS = {
+    'generate_code_batch': (2, 4),
+}
+# Cheap or long-lived endpoints that bypass admission control
+ADMISSION_EXEMPT = {'health_check', 'session_events', 'ai_job_events', 'static'}
+
+# Priority class of each endpoint; anything not listed is interactive
+ENDPOINT_PRIORITY = {
+    'generate_code_batch': GRADING,
+    'grade': GRADING,
+}
+
+# Server processes sharing the listening socket (exported by serve.py)
+SERVER_WORKERS = max(1, int(os.environ.get('CODEGEN_SERVER_WORKERS', 1)))
+# Endpoints whose state lives in one process's memory; requests are not
+# routed to a particular worker, so they are refused with several workers
+_SESSIONS_NEED_ONE_WORKER = 'Sessions need a single server process; run serve.py with --workers 1'
+_AI_JOBS_NEED_SHARING = ('AI jobs need a single server process or a shared result cache; '
+                         'run serve.py with --workers 1 or set CODEGEN_RESULT_CACHE')
+SINGLE_PROCESS_ENDPOINTS = {
+    'create_session': _SESSIONS_NEED_ONE_WORKER,
+    'get_session': _SESSIONS_NEED_ONE_WORKER,
+    'delete_session': _SESSIONS_NEED_ONE_WORKER,
+    'apply_session_ops': _SESSIONS_NEED_ONE_WORKER,
+    'session_events': _SESSIONS_NEED_ONE_WORKER,
+}
+if not get_result_cache().shared:
+    # Otherwise job statuses are shared through the SQLite store (ai_jobs.py)
+    SINGLE_PROCESS_ENDPOINTS.update({
+        'generate_code_ai': _AI_JOBS_NEED_SHARING,
+        'ai_job': _AI_JOBS_NEED_SHARING,
+        'ai_job_events': _AI_JOBS_NEED_SHARING,
+    })
+
+
+def _stream_body() -> bool:
+    """True if the request body is large (or unsized) enough to parse incrementally."""
+    return request.content_length is None or request.content_length >= STREAM_PARSE_BYTES
+
+
+def request_priority() -> str:
+    """Priority class of the current request (executable-mode generation is heavy)."""
+    if request.endpoint == 'generate_code':
+        if _stream_body():
+            return GRADING  # large submission; don't parse it up front
+        data = request.get_json(silent=True)
+        if isinstance(data, dict) and data.get('include_implementations'):
+            return GRADING
+    return ENDPOINT_PRIORITY.get(request.endpoint, INTERACTIVE)
+
+
+def _shed(e: Rejected):
+    response = jsonify({
+        'success': False,
+        'error': e.reason
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+
+@app.before_request
+def refuse_single_process_endpoints():
+    """Refuse per-process routes (sessions, unshared AI jobs) when serve.py runs more than one worker."""
+    if SERVER_WORKERS > 1 and request.endpoint in SINGLE_PROCESS_ENDPOINTS:
+        response = jsonify({
+            'success': False,
+            'error': SINGLE_PROCESS_ENDPOINTS[request.endpoint]
+        })
+        response.status_code = 503
+        return response
+    return None
+
+
+@app.before_request
+def admit_request():
+    """
+    Wait for a slot on this endpoint and in its priority class, or shed the
+    request with 503 + Retry-After.
+    """
+    if request.method == 'OPTIONS' or request.endpoint is None or request.endpoint in ADMISSION_EXEMPT:
+        return None
+    deadline = parse_deadline(request.headers.get(DEADLINE_HEADER))
+    controller = get_controller(request.endpoint, ENDPOINT_LIMITS.get(request.endpoint))
+    try:
+        controller.acquire(deadline)
+    except Rejected as e:
+        return _shed(e)
+    g.admission = (controller, time.monotonic())
+    
+    priority = request_priority()
+    try:
+        get_scheduler().acquire(priority, deadline)
+    except Rejected as e:
+        return _shed(e)
+    g.priority = (priority, time.monotonic())
+    return None
+
+
+@app.teardown_request
+def release_admission(exc=None):
+    scheduled = g.pop('priority', None)
+    if scheduled is not None:
+        priority, started = scheduled
+        get_scheduler().release(priority, time.monotonic() - started)
+    admission = g.pop('admission', None)
+    if admission is not None:
+        controller, started = admission
+        controller.release(time.monotonic() - started)
+
+
+@app.after_request
+def compress_response(response):
+    """Gzip/deflate large responses when the client accepts it."""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers):
+        return response
+    body, headers = wire.maybe_compress(response.get_data(), request.headers.get('Accept-Encoding'),
+                                        response.headers.get('ETag'))
+    response.set_data(body)
+    response.vary.add('Accept-Encoding')
+    for name in ('Content-Encoding', 'ETag'):
+        if name in headers:
+            response.headers[name] = headers[name]
+    return response
+
+
 @app.route('/generate-code', methods=['POST'])
 def generate_code():
     """
@@ -38,39 +201,162 @@ def generate_code():
                 }
             }
         ],
-        "level": 4  # optional, defaults to 1
+        "level": 4,  # optional, defaults to 1
+        "include_implementations": false,  # optional, executable code
+        "base_version": "...",  # optional, "version" of a previous response
+        "client_id": "...",     # optional, remembers versions per client (e.g. editor tab)
+        "include_plan": true  # optional, false for a code-only preview
     }
     
+    Blocks may also use the compact array form, e.g. [0, 2] for
+    move_forward 2 (see block_input.py). Bodies of CODEGEN_STREAM_PARSE_BYTES
+    or more are parsed incrementally, generating blocks as they arrive.
+    
+    Large responses are gzip/deflate-compressed per Accept-Encoding.
+    Send "Accept: application/vnd.syntax-saga.plan" (or ?plan_format=binary)
+    for the compact binary encoding of plan_codec.py.
+    
     Returns:
     {
         "success": true,
-        "code": "# Generated code...",
-        "execution_plan": [...]
+        "version": "3f9c...",
+        "code": "# Generated code...",  # or, with a known base_version:
+        "diff": {"base_version": "...", "hunks": [[start, delete_count, ["line", ...]], ...]},
+        "execution_plan": [...],
+        "fingerprint": "..."    # canonical program hash, for analytics
     }
+    
+    Blocks not offered at the level, params of the wrong type or out of
+    range, and unsafe messages or conditions are rejected with 422 and a
+    "violations" list of {"path", "code", "message"} (see validation.py).
+    """
+    if _stream_body():
+        payload, status = service.generate_code_stream(request.stream)
+    else:
+        payload, status = service.generate_code(request.get_json(silent=True))
+    if status == 200 and plan_codec.wants_binary(request.headers.get('Accept'), request.args.get('plan_format')):
+        return Response(plan_codec.encode_response(payload), status=status, mimetype=plan_codec.BINARY_MIME)
+    return jsonify(payload), status
+
+
+@app.route('/generate-code/ai', methods=['POST'])
+def generate_code_ai():
+    """
+    Return the template code now and start generating the AI code in the
+    background (see ai_jobs.py).
+    
+    Expected input: as for /generate-code.
+    
+    Returns (202 while the AI code is pending, 200 if it was cached):
+    {
+        "success": true,
+        "code": "# Generated code...",   # template code, as from /generate-code
+        "execution_plan": [...],
+        "job_id": "Xk3...",
+        "status": "queued",              # "done" with "ai_code" if cached
+    }
+    
+    Then poll GET /ai-jobs/<job_id> or listen on GET /ai-jobs/<job_id>/events.
     """
     try:
-        data = request.json
-        blocks = data.get('blocks', [])
-        level = data.get('level', 1)
-        
-        if not blocks:
+        payload, status = service.generate_ai_code(request.get_json(silent=True))
+    except Rejected as e:
+        return _shed(e)
+    return jsonify(payload), status
+
+
+@app.route('/ai-jobs/<job_id>', methods=['GET'])
+def ai_job(job_id):
+    """
+    Status of an AI generation job.
+    
+    Returns:
+    {
+        "success": true,
+        "job_id": "Xk3...",
+        "status": "queued" | "running" | "done" | "failed",
+        "ai_code": "...",    # when done
+        "error": "..."       # when failed
+    }
+    """
+    payload, status = service.ai_job(job_id)
+    return jsonify(payload), status
+
+
+@app.route('/ai-jobs/<job_id>/events', methods=['GET'])
+def ai_job_events(job_id):
+    """
+    Server-Sent Events stream of an AI generation job: a "status" event on
+    connect, then one "done" or "failed" event with the job's final state.
+    
+    From the browser:
+        new EventSource('http://localhost:5000/ai-jobs/<job_id>/events')
+    """
+    job = ai_jobs.get_ai_jobs().get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found or expired'
+        }), 404
+    
+    return Response(
+        stream_with_context(ai_jobs.event_stream(job)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/generate-code/batch', methods=['POST'])
+def generate_code_batch():
+    """
+    Generate code for many programs in one request, using a process pool.
+    
+    Expected input:
+    {
+        "items": [
+            {"blocks": [...], "level": 4},
+            {"blocks": [...], "level": 1}
+        ]
+    }
+    
+    Returns (results are in the same order as items):
+    {
+        "success": true,
+        "results": [
+            {"success": true, "code": "...", "execution_plan": [...], ...},
+            {"success": false, "error": "No blocks provided"}
+        ]
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
             return jsonify({
                 'success': False,
-                'error': 'No blocks provided'
+                'error': 'Request body must be a JSON object'
             }), 400
+        items = data.get('items', [])
         
-        # Generate code
-        generator = CodeGenerator()
-        code, execution_plan = generator.generate_from_blocks(
-            blocks, 
-            include_implementations=False
-        )
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                'success': False,
+                'error': 'No items provided'
+            }), 400
+        if len(items) > BATCH_MAX_ITEMS:
+            return jsonify({
+                'success': False,
+                'error': f'Too many items (max {BATCH_MAX_ITEMS})'
+            }), 413
         
+        # Pause between chunks while previews are waiting; cap the batch's cores
+        scheduler = get_scheduler()
         return jsonify({
             'success': True,
-            'code': code,
-            'execution_plan': execution_plan,
-            'level': level
+            'results': generate_batch(
+                items,
+                yield_point=lambda: scheduler.yield_point(GRADING),
+                max_outstanding=scheduler.gate(GRADING).max_in_flight
+            )
         })
         
     except Exception as e:
@@ -84,6 +370,9 @@ def generate_code():
 def get_available_commands():
     """
     Get available commands for a specific level.
+    Payloads are serialized once at startup and served with a strong ETag
+    (with the coding appended for a compressed body, e.g. "...-gzip");
+    send If-None-Match to get a 304 when nothing changed.
     
     Query params:
         level: int (1-4)
@@ -95,18 +384,345 @@ def get_available_commands():
         "commands": [...]
     }
     """
+    body, status, headers = service.available_commands_response(
+        request.args.get('level'),
+        request.headers.get('If-None-Match'),
+        request.headers.get('Accept-Encoding')
+    )
+    return Response(body, status=status, headers=headers, mimetype='application/json')
+
+
+@app.route('/hint', methods=['POST'])
+def hint():
+    """
+    Suggest the next optimal block for the player's current program.
+    
+    Expected input:
+    {
+        "blocks": [...],          # the program so far (may be empty)
+        "level": 3,
+        "full_program": false     # optional, also return a full solution
+    }
+    
+    Returns:
+    {
+        "success": true,
+        "pose": {"col": 2, "row": 0, "heading": "east"},
+        "target": "key",
+        "distance": 3,
+        "next_command": {"type": "turn_left", "params": {"degrees": 90}},
+        "program": [...]          # only if full_program was requested
+    }
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({
+                'success': False,
+                'error': 'Request body must be a JSON object'
+            }), 400
+        blocks = data.get('blocks', [])
+        level = check_blocks(blocks, data.get('level', 1))
+        full_program = bool(data.get('full_program', False))
+        
+        generator = CodeGenerator()
+        _, execution_plan = generator.generate_from_blocks(blocks, include_implementations=False)
+        result = get_hint(execution_plan, level, full_program=full_program)
+        
+        return jsonify({
+            'success': True,
+            'level': level,
+            **result
+        })
+        
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 422
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/grade', methods=['POST'])
+def grade():
+    """
+    Grade a submission against a level.
+    Equivalent programs share a fingerprint, so repeats are a single lookup.
+    
+    Expected input:
+    {
+        "blocks": [...],
+        "level": 2
+    }
+    
+    Returns:
+    {
+        "success": true,
+        "fingerprint": "...",
+        "cache_hit": true,
+        "completed": true,
+        "collected": ["coin", "finish"],
+        "failed": null
+    }
+    """
     try:
-        level = int(request.args.get('level', 1))
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({
+                'success': False,
+                'error': 'Request body must be a JSON object'
+            }), 400
+        blocks = data.get('blocks', [])
+        level = check_blocks(blocks, data.get('level', 1))
         
-        session = GameplaySession(current_level=level)
-        commands = session.get_available_commands_for_level(level)
+        result = get_solution_index(level).grade(blocks)
         
         return jsonify({
             'success': True,
             'level': level,
-            'commands': commands
+            **result
+        })
+        
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 422
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/timeline', methods=['POST'])
+def timeline():
+    """
+    Timeline of a program's execution plan, for scrubbing the animation.
+    
+    Expected input:
+    {
+        "blocks": [...],
+        "level": 4,          # optional, defaults to 1
+        "time": 2.5,         # optional, look up the step running at this time
+        "step": "0_iter1_0"  # optional, look up when this step starts (index or step ID)
+    }
+    
+    Returns:
+    {
+        "success": true,
+        "total_duration": 6.0,
+        "starts": [0.0, 1.0, ...],
+        "step_at": 2,        # only if time was given
+        "time_of": 1.5       # only if step was given
+    }
+    
+    A conditional counts as its longer branch, so times after one (and
+    total_duration) are upper bounds.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({
+                'success': False,
+                'error': 'Request body must be a JSON object'
+            }), 400
+        blocks = data.get('blocks', [])
+        check_blocks(blocks, data.get('level', 1))
+        
+        generator = CodeGenerator()
+        _, execution_plan, plan_timeline = generator.generate_with_timeline(blocks)
+        
+        response = {
+            'success': True,
+            **plan_timeline.to_dict()
+        }
+        if data.get('time') is not None:
+            index = plan_timeline.step_at(float(data['time']))
+            response['step_at'] = index
+            response['step_id'] = execution_plan[index].get('step') if index is not None else None
+        if data.get('step') is not None:
+            response['time_of'] = plan_timeline.time_of(data['step'])
+        
+        return jsonify(response)
+        
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 422
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/sessions', methods=['POST'])
+def create_session():
+    """
+    Create a server-side editing session for incremental live preview.
+    
+    Expected input (all optional):
+    {
+        "level": 2,
+        "blocks": [...]   # seed program
+    }
+    
+    Returns:
+    {
+        "success": true,
+        "session_id": "...",
+        "version": 0,
+        "code": "# Generated code..."
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({
+                'success': False,
+                'error': 'Request body must be a JSON object'
+            }), 400
+        session = get_session_store().create(
+            level=data.get('level', 1),
+            blocks=data.get('blocks')
+        )
+        
+        return jsonify({
+            'success': True,
+            **session.snapshot(include_plan=False)
+        }), 201
+        
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 422
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    """
+    Full state of a session: blocks, code and execution plan.
+    Use this to resync; edits should go through /sessions/<id>/ops.
+    
+    Query params:
+        base_version: code_version from an earlier response; the code
+                      is then returned as a line diff ("diff")
+    """
+    try:
+        session = get_session_store().get(session_id)
+        with session.lock:
+            return jsonify({
+                'success': True,
+                **session.snapshot(base_version=request.args.get('base_version'))
+            })
+        
+    except SessionNotFound:
+        return jsonify({
+            'success': False,
+            'error': 'Session not found or expired'
+        }), 404
+
+
+@app.route('/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    """Close a session and free its memory."""
+    if not get_session_store().delete(session_id):
+        return jsonify({
+            'success': False,
+            'error': 'Session not found or expired'
+        }), 404
+    return jsonify({'success': True})
+
+
+@app.route('/sessions/<session_id>/ops', methods=['POST'])
+def apply_session_ops(session_id):
+    """
+    Apply delta operations to a session's workflow.
+    Only the touched blocks are regenerated, and only their code is returned.
+    
+    Expected input:
+    {
+        "ops": [
+            {"op": "add", "block": {"type": "move_forward", "params": {"distance": 1}}},
+            {"op": "insert", "index": 0, "block": {...}},
+            {"op": "remove", "index": 2},
+            {"op": "move", "from": 0, "to": 3},
+            {"op": "update", "index": 1, "block": {...}}
+        ]
+    }
+    
+    Returns:
+    {
+        "success": true,
+        "version": 7,
+        "length": 4,
+        "changes": [{"op": "add", "index": 3, "code": "print(...)"}, ...],
+        "coalesced": 1
+    }
+    
+    Requests arriving while an earlier batch is still being applied are
+    applied as one batch and regenerated once ("coalesced" is the batch
+    size); "version" is the session version after the whole batch. A
+    single edit to an idle session is not delayed.
+    
+    Open /sessions/<id>/events streams also receive the update. Clients
+    listening there can send "ack_only": true to get just success/version.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({
+                'success': False,
+                'error': 'Request body must be a JSON object'
+            }), 400
+        ops = data.get('ops')
+        if not isinstance(ops, list) or not ops:
+            return jsonify({
+                'success': False,
+                'error': 'No ops provided'
+            }), 400
+        
+        session = get_session_store().get(session_id)
+        result = get_coalescer(session).submit(ops)
+        if data.get('ack_only'):
+            return jsonify({'success': True, 'version': result['version']})
+        return jsonify({
+            'success': True,
+            **result
         })
         
+    except SessionNotFound:
+        return jsonify({
+            'success': False,
+            'error': 'Session not found or expired'
+        }), 404
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 422
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -114,14 +730,44 @@ def get_available_commands():
         }), 500
 
 
+@app.route('/sessions/<session_id>/events', methods=['GET'])
+def session_events(session_id):
+    """
+    Server-Sent Events stream of a session's live preview.
+    
+    Sends a "snapshot" event (blocks, code, execution plan, stats) on
+    connect, then an "update" event after every /sessions/<id>/ops call:
+    {"version", "changes", "code_version", "diff", "execution_plan", "stats"}
+    
+    From the browser:
+        new EventSource('http://localhost:5000/sessions/<id>/events')
+    """
+    try:
+        session = get_session_store().get(session_id)
+        subscription = live_preview.subscribe(session)
+    except SessionNotFound:
+        return jsonify({
+            'success': False,
+            'error': 'Session not found or expired'
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 429
+    
+    return Response(
+        stream_with_context(live_preview.event_stream(session, subscription)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({
-        'status': 'healthy',
-        'service': 'code-generator-api',
-        'version': '1.0'
-    })
+    payload, status = service.health()
+    return jsonify(payload), status
 
 
 @app.route('/test-loop', methods=['GET'])
@@ -130,28 +776,8 @@ def test_loop():
     Test endpoint that generates a simple loop example.
     Useful for testing the API is working.
     """
-    blocks = [
-        {
-            "type": "loop",
-            "params": {
-                "iterations": 4,
-                "body": [
-                    {"type": "move_forward", "params": {"distance": 1}},
-                    {"type": "turn_right", "params": {"degrees": 90}}
-                ]
-            }
-        }
-    ]
-    
-    generator = CodeGenerator()
-    code, execution_plan = generator.generate_from_blocks(blocks, include_implementations=False)
-    
-    return jsonify({
-        'success': True,
-        'example': 'Square path loop',
-        'blocks': blocks,
-        'code': code
-    })
+    payload, status = service.test_loop()
+    return jsonify(payload), status
 
 
 if __name__ == '__main__':
@@ -161,9 +787,21 @@ if __name__ == '__main__':
     print("")
     print("📡 API Endpoints:")
     print("  POST   http://localhost:5000/generate-code")
+    print("  POST   http://localhost:5000/generate-code/batch")
+    print("  POST   http://localhost:5000/generate-code/ai")
+    print("  GET    http://localhost:5000/ai-jobs/<id>")
+    print("  GET    http://localhost:5000/ai-jobs/<id>/events (SSE)")
     print("  GET    http://localhost:5000/available-commands?level=4")
     print("  GET    http://localhost:5000/health")
     print("  GET    http://localhost:5000/test-loop")
+    print("  POST   http://localhost:5000/hint")
+    print("  POST   http://localhost:5000/grade")
+    print("  POST   http://localhost:5000/timeline")
+    print("  POST   http://localhost:5000/sessions")
+    print("  GET    http://localhost:5000/sessions/<id>")
+    print("  POST   http://localhost:5000/sessions/<id>/ops")
+    print("  GET    http://localhost:5000/sessions/<id>/events (SSE)")
+    print("  DELETE http://localhost:5000/sessions/<id>")
     print("")
     print("📝 Example Request:")
     print("""
@@ -191,5 +829,10 @@ if __name__ == '__main__':
     print("Press Ctrl+C to stop the server")
     print("=" * 70)
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Load (or build) the hint distance fields before taking requests
+    precompute_all()
+    
+    # Development server; use serve.py for production (multi-worker)
+    debug = os.environ.get('FLASK_DEBUG', '0') == '1'
+    app.run(host='0.0.0.0', port=5000, debug=debug)
 
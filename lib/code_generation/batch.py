@@ -0,0 +1,119 @@
+"""
+Batch code generation over a process pool.
+Used by the /generate-code/batch endpoint to regenerate many programs
+(e.g. a whole class's workflows) in one request using every core.
+Work is handed to the pool in chunks, so a batch can be paused between
+chunks when interactive requests need the CPU.
+
+Every server process has its own pool. Under serve.py, which exports
+its worker count as CODEGEN_SERVER_WORKERS, the default pool size is the
+CPU count divided by that, so all pools together use about one process
+per core rather than cores squared.
+
+Configuration (environment variables):
+    CODEGEN_BATCH_WORKERS   - pool size per server process
+                              (default: CPU count / server workers, at least 1; 0 = run inline)
+    CODEGEN_BATCH_INLINE    - batches this small skip the pool (default: 4)
+"""
+
+from typing import Callable, Dict, List, Any, Optional
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import os
+import threading
+
+import service
+
+
+SERVER_WORKERS = max(1, int(os.environ.get("CODEGEN_SERVER_WORKERS", 1)))
+BATCH_WORKERS = int(os.environ.get("CODEGEN_BATCH_WORKERS",
+                                   max(1, (os.cpu_count() or 1) // SERVER_WORKERS)))
+BATCH_INLINE = int(os.environ.get("CODEGEN_BATCH_INLINE", 4))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def generate_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generate code for one batch item. Never raises: errors are reported per item.
+
+    Args:
+        item: Dictionary with "blocks", optional "level" and "include_implementations"
+
+    Returns:
+        Same shape as a /generate-code response body
+    """
+    try:
+        payload, _ = service.generate_code(item)
+        return payload
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """Get the shared process pool (created on first use), or None if disabled."""
+    global _pool
+    if BATCH_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS)
+        return _pool
+
+
+def generate_chunk(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Generate a contiguous run of items in one worker call."""
+    return [generate_item(item) for item in items]
+
+
+def generate_batch(items: List[Dict[str, Any]],
+                   yield_point: Optional[Callable[[], Any]] = None,
+                   max_outstanding: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Generate code for many items, in order.
+
+    Args:
+        items: List of {"blocks": [...], "level": n} dictionaries
+        yield_point: Called before each chunk is handed out; may block to
+            let higher-priority work run first (see scheduler.py)
+        max_outstanding: Chunks allowed in the pool at once (default: pool size),
+            which caps the share of cores the batch can take
+
+    Returns:
+        List of per-item results in the same order as the input
+    """
+    pool = get_pool() if len(items) > BATCH_INLINE else None
+    # A few chunks per worker keeps IPC low while balancing uneven items
+    workers = max(1, BATCH_WORKERS)
+    chunksize = max(1, len(items) // (workers * 4))
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+
+    results: List[Dict[str, Any]] = []
+    if pool is None:
+        for chunk in chunks:
+            if yield_point is not None:
+                yield_point()
+            results.extend(generate_chunk(chunk))
+        return results
+
+    window = max(1, max_outstanding or workers)
+    pending: "deque[Future]" = deque()
+    for chunk in chunks:
+        if yield_point is not None:
+            yield_point()
+        pending.append(pool.submit(generate_chunk, chunk))
+        if len(pending) >= window:
+            results.extend(pending.popleft().result())
+    while pending:
+        results.extend(pending.popleft().result())
+    return results
+
+
+def shutdown_pool() -> None:
+    """Shut down the shared process pool, if it was started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: time from process launch to the first /health response.
+
+Compares the Flask server (api_server.py) with the standard-library
+server (stdlib_server.py). Each run starts a fresh interpreter.
+
+Usage:
+    python3 bench_cold_start.py --runs 10
+"""
+
+from urllib.request import urlopen
+from urllib.error import URLError
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SERVERS = {
+    "flask": "import api_server; api_server.app.run(host='127.0.0.1', port={port})",
+    "stdlib": "import stdlib_server; stdlib_server.make_server('127.0.0.1', {port}).serve_forever()",
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_response(server: str, timeout: float = 30.0) -> float:
+    """
+    Launch a server in a fresh interpreter and time its first /health response.
+
+    Args:
+        server: Key of SERVERS
+        timeout: Give up after this many seconds
+
+    Returns:
+        Seconds from launch to first successful response
+    """
+    port = _free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVERS[server].format(port=port)],
+        cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    response.read()
+                return time.perf_counter() - start
+            except (URLError, ConnectionError, OSError):
+                time.sleep(0.002)
+        raise TimeoutError(f"{server} server did not respond within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import-to-first-response time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--servers", nargs="+", default=list(SERVERS), choices=list(SERVERS))
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"⏱  Cold start: launch → first /health response ({args.runs} runs)")
+    print("=" * 70)
+    results = {}
+    for server in args.servers:
+        try:
+            timings = [time_to_first_response(server) for _ in range(args.runs)]
+        except TimeoutError as e:
+            print(f"  {server:<8} ❌ {e}")
+            continue
+        results[server] = statistics.median(timings)
+        print(f"  {server:<8} median {results[server] * 1000:8.1f} ms   "
+              f"min {min(timings) * 1000:8.1f} ms   max {max(timings) * 1000:8.1f} ms")
+
+    if "flask" in results and "stdlib" in results:
+        print(f"\n  stdlib server starts {results['flask'] / results['stdlib']:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Compact block encoding and incremental parsing of /generate-code bodies.
+
+Besides the usual {"type": ..., "params": {...}} form, a block may be
+sent as an array: a type code (or type name) followed by its params in
+a fixed order, with nested bodies in the same compact form:
+
+    [0, 2]                      move_forward, distance 2
+    [5, 4, [[0], [3, 90]]]      loop 4 times: move_forward, turn_right 90
+    ["print", "Hello"]          type names work too
+
+Type codes are the positions in BLOCK_TYPE_CODES (the BlockType order);
+trailing params may be left out to use the defaults. Both forms can be
+mixed in one program.
+
+StreamingRequestParser reads a request body from a file-like stream and
+yields the blocks one by one as they arrive, keeping only the unparsed
+tail of the body in memory, so generation starts before the upload ends
+and the raw body and the parsed document never coexist in full.
+
+Configuration (environment variables):
+    CODEGEN_STREAM_PARSE_BYTES - bodies at least this large are parsed
+                                 incrementally (default: 262144)
+"""
+
+from typing import Dict, List, Any, Iterator
+import codecs
+import json
+import os
+
+from code_generator import BlockType
+
+
+STREAM_PARSE_BYTES = int(os.environ.get("CODEGEN_STREAM_PARSE_BYTES", 256 * 1024))
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Append only: a type's code is its position here
+BLOCK_TYPE_CODES = [block_type.value for block_type in BlockType]
+
+# Positional param order of the compact form
+COMPACT_PARAMS = {
+    "move_forward": ["distance"],
+    "move_backward": ["distance"],
+    "turn_left": ["degrees"],
+    "turn_right": ["degrees"],
+    "jump": ["height"],
+    "loop": ["iterations", "body"],
+    "conditional": ["condition", "if_body", "else_body"],
+    "print": ["message"],
+    "variable": ["name", "value"],
+    "function": ["name", "parameters", "body"],
+    "wait": ["seconds"],
+    "pick_object": ["object_name"],
+}
+
+# Params that hold nested block lists
+BODY_PARAMS = ("body", "if_body", "else_body")
+
+_WHITESPACE = " \t\n\r"
+
+
+def expand_block(block: Any) -> Any:
+    """
+    Convert a block (and its nested bodies) from the compact form to the dict form.
+    Dict blocks pass through unchanged unless a nested body is compact.
+
+    Raises:
+        ValueError: On an unknown type code or too many params
+    """
+    if isinstance(block, list):
+        if not block:
+            raise ValueError("Compact block must start with a type code")
+        type_ref, values = block[0], block[1:]
+        if isinstance(type_ref, int) and not isinstance(type_ref, bool):
+            if not 0 <= type_ref < len(BLOCK_TYPE_CODES):
+                raise ValueError(f"Unknown block type code: {type_ref}")
+            block_type = BLOCK_TYPE_CODES[type_ref]
+        elif isinstance(type_ref, str):
+            block_type = type_ref
+        else:
+            raise ValueError(f"Invalid block type: {type_ref!r}")
+        names = COMPACT_PARAMS.get(block_type, [])
+        if len(values) > len(names):
+            raise ValueError(f"Too many params for {block_type} (expected at most {len(names)})")
+        params = dict(zip(names, values))
+    elif isinstance(block, dict):
+        params = block.get("params")
+        if not isinstance(params, dict) or not any(
+                isinstance(params.get(name), list) for name in BODY_PARAMS):
+            return block
+        block_type = block.get("type")
+        params = dict(params)
+    else:
+        return block
+
+    for name in BODY_PARAMS:
+        if isinstance(params.get(name), list):
+            params[name] = expand_blocks(params[name])
+    expanded = dict(block) if isinstance(block, dict) else {}
+    expanded["type"] = block_type
+    expanded["params"] = params
+    return expanded
+
+
+def expand_blocks(blocks: Any) -> Any:
+    """Expand a list of blocks; anything that isn't a list is returned as is."""
+    if not isinstance(blocks, list):
+        return blocks
+    return [expand_block(block) for block in blocks]
+
+
+class StreamingRequestParser:
+    """
+    Incremental parser for a JSON object body whose "blocks" array is large.
+
+        parser = StreamingRequestParser(request.stream)
+        for block in parser.blocks():   # expanded, in order
+            ...
+        level = parser.fields.get("level", 1)   # complete once blocks() is exhausted
+
+    Raises ValueError on malformed JSON.
+    """
+
+    def __init__(self, stream, chunk_size: int = STREAM_CHUNK_BYTES):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.fields: Dict[str, Any] = {}
+        self.bytes_read = 0
+
+    def _fill(self, at_least: int = 1) -> bool:
+        """Read at least at_least more characters (or to EOF). False if nothing was added."""
+        if self._eof:
+            return False
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+        added = 0
+        while added < at_least:
+            chunk = self._stream.read(self._chunk_size)
+            if not chunk:
+                self._eof = True
+                tail = self._text.decode(b"", final=True)
+                self._buf += tail
+                return added + len(tail) > 0
+            self.bytes_read += len(chunk)
+            text = self._text.decode(chunk)
+            self._buf += text
+            added += len(text)
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise ValueError(f"Invalid JSON body: expected {char!r} at byte ~{self.bytes_read}")
+        self._pos += 1
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A number or literal at the very end may continue in the next chunk
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise ValueError(f"Invalid JSON body: {e.msg}") from None
+            # Incomplete value: at least double the unparsed tail before retrying
+            self._fill(max(self._chunk_size, len(self._buf) - self._pos))
+
+    def blocks(self) -> Iterator[Any]:
+        """Yield the expanded blocks of the "blocks" array; collect other keys in fields."""
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+        else:
+            while True:
+                key = self._value()
+                if not isinstance(key, str):
+                    raise ValueError("Invalid JSON body: object keys must be strings")
+                self._expect(":")
+                if key == "blocks" and self._peek() == "[":
+                    self._pos += 1
+                    if self._peek() == "]":
+                        self._pos += 1
+                    else:
+                        while True:
+                            yield expand_block(self._value())
+                            if self._peek() == ",":
+                                self._pos += 1
+                                continue
+                            self._expect("]")
+                            break
+                else:
+                    self.fields[key] = self._value()
+                if self._peek() == ",":
+                    self._pos += 1
+                    continue
+                self._expect("}")
+                break
+        if self._peek():
+            raise ValueError("Invalid JSON body: trailing data")
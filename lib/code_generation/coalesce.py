@@ -0,0 +1,155 @@
+"""
+Per-session coalescing of edit bursts.
+
+Dragging blocks fires many /sessions/<id>/ops requests in quick
+succession. Rather than regenerating and publishing after each one,
+requests that arrive while the previous batch is still being applied are
+collected into the next batch, which is applied in arrival order and
+regenerated once. A lone edit to an idle session is applied immediately;
+only once a second edit has queued up does the batch wait a short
+debounce window for the burst to go quiet. Every caller in the batch is
+answered with the same, latest session version.
+
+Configuration (environment variables):
+    CODEGEN_COALESCE_WINDOW_MS     - debounce window once a burst is under way
+                                     (default: 15, 0 = off)
+    CODEGEN_COALESCE_MAX_DELAY_MS  - longest a burst is held back (default: 100)
+"""
+
+from typing import Dict, List, Any, Optional
+import os
+import threading
+import time
+
+from session_store import HostedSession
+import live_preview
+
+
+COALESCE_WINDOW = float(os.environ.get("CODEGEN_COALESCE_WINDOW_MS", 15)) / 1000
+COALESCE_MAX_DELAY = float(os.environ.get("CODEGEN_COALESCE_MAX_DELAY_MS", 100)) / 1000
+
+
+class _Batch:
+    """Op lists collected into one batch."""
+
+    def __init__(self, sequence: int, now: float):
+        self.sequence = sequence
+        self.op_lists: List[List[Dict[str, Any]]] = []
+        self.first_arrival = now
+        self.last_arrival = now
+        self.results: List[Any] = []
+        self.version = 0
+        self.length = 0
+        self.done = threading.Event()
+
+
+class EditCoalescer:
+    """
+    Debounces op submissions for one session and applies them in batches.
+    Batches are applied strictly in the order they were opened.
+    """
+
+    def __init__(self, session: HostedSession, window: float = COALESCE_WINDOW,
+                 max_delay: float = COALESCE_MAX_DELAY):
+        self.session = session
+        self.window = window
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._pending: Optional[_Batch] = None
+        self._opened = 0
+        self._applied = 0
+
+    def _apply(self, batch: _Batch) -> None:
+        applied = []
+        with self.session.lock:
+            for ops in batch.op_lists:
+                try:
+                    changes = self.session.apply_ops(ops)
+                    applied.extend(changes)
+                    batch.results.append(changes)
+                except ValueError as e:
+                    batch.results.append(e)
+            # One regeneration for the whole burst
+            live_preview.publish_update(self.session, applied)
+            batch.version = self.session.version
+            batch.length = len(self.session)
+
+    def submit(self, ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Apply ops, possibly together with concurrent submissions.
+
+        Args:
+            ops: Delta ops for HostedSession.apply_ops
+
+        Returns:
+            {"version", "length", "changes", "coalesced"}, where version
+            and length are the session's state after the whole batch
+
+        Raises:
+            ValueError: If one of these ops was invalid (ops before it stay applied)
+        """
+        if self.window <= 0:
+            batch = _Batch(0, 0.0)
+            batch.op_lists.append(ops)
+            self._apply(batch)
+            return self._result(batch, 0)
+
+        now = time.monotonic()
+        with self._cond:
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                self._opened += 1
+                batch = self._pending = _Batch(self._opened, now)
+            batch.last_arrival = now
+            position = len(batch.op_lists)
+            batch.op_lists.append(ops)
+
+            if leader:
+                # Wait for the batch ahead of us; edits arriving meanwhile join this one
+                while self._applied != batch.sequence - 1:
+                    self._cond.wait()
+                # Debounce only while a burst is under way (a second edit is queued);
+                # a lone edit to an idle session is applied straight away
+                while len(batch.op_lists) > 1:
+                    deadline = min(batch.last_arrival + self.window,
+                                   batch.first_arrival + self.max_delay)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._pending = None
+
+        if not leader:
+            batch.done.wait()
+            return self._result(batch, position)
+
+        try:
+            self._apply(batch)
+        except Exception as e:
+            batch.results = [e] * len(batch.op_lists)
+        finally:
+            with self._cond:
+                self._applied = batch.sequence
+                self._cond.notify_all()
+            batch.done.set()
+        return self._result(batch, position)
+
+    def _result(self, batch: _Batch, position: int) -> Dict[str, Any]:
+        result = batch.results[position]
+        if isinstance(result, Exception):
+            raise result
+        return {
+            "version": batch.version,
+            "length": batch.length,
+            "changes": result,
+            "coalesced": len(batch.op_lists)
+        }
+
+
+def get_coalescer(session: HostedSession) -> EditCoalescer:
+    """Get the session's coalescer (created on first use)."""
+    with session.lock:
+        if session.coalescer is None:
+            session.coalescer = EditCoalescer(session)
+        return session.coalescer
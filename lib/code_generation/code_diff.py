@@ -0,0 +1,168 @@
+"""
+Line-level diffs of generated code against recently served versions.
+
+Every generated program gets a version ID (a hash of its code). A client
+that sends the version it last saw as "base_version" gets back only the
+hunks that turn that version into the new one, instead of the whole
+code string. Recent versions are kept in a bounded ring; an unknown or
+evicted base version simply falls back to the full code.
+
+Hosted sessions own their ring (session_store.py). Stateless
+/generate-code callers that send a "client_id" (any ID the client picks,
+e.g. one per editor tab) get a small ring of their own, so other
+clients' traffic can't evict their base version; the least recently used
+client rings are dropped past CODEGEN_DIFF_CLIENTS. Requests without a
+client_id share one ring, which busy servers may churn through quickly.
+
+A diff is a list of hunks [start, delete_count, insert_lines], with start
+counted in lines of the base version. Apply them from last to first:
+
+    lines = base_code.split("\\n")
+    for start, count, insert in reversed(hunks):
+        lines[start:start + count] = insert
+    code = "\\n".join(lines)
+
+Configuration (environment variables):
+    CODEGEN_DIFF_VERSIONS         - versions kept for requests without a client_id (default: 256)
+    CODEGEN_DIFF_CLIENT_VERSIONS  - versions kept per client_id (default: 8)
+    CODEGEN_DIFF_CLIENTS          - client_id rings kept (default: 1024)
+"""
+
+from typing import Dict, List, Any, Optional
+from collections import OrderedDict
+from difflib import SequenceMatcher
+import hashlib
+import os
+import threading
+
+
+DIFF_VERSIONS = int(os.environ.get("CODEGEN_DIFF_VERSIONS", 256))
+DIFF_CLIENT_VERSIONS = int(os.environ.get("CODEGEN_DIFF_CLIENT_VERSIONS", 8))
+DIFF_CLIENTS = int(os.environ.get("CODEGEN_DIFF_CLIENTS", 1024))
+# Longest client_id accepted as a ring key
+MAX_CLIENT_ID_LENGTH = 128
+
+
+def version_id(code: str) -> str:
+    """Content-derived version ID of a code string."""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()[:16]
+
+
+def line_diff(old_lines: List[str], new_lines: List[str]) -> List[List[Any]]:
+    """
+    Compute insert/delete hunks that turn old_lines into new_lines.
+
+    Args:
+        old_lines: Lines of the base version
+        new_lines: Lines of the new version
+
+    Returns:
+        List of [start, delete_count, insert_lines] hunks, in order
+    """
+    # Most edits touch one region; trim the common ends before matching
+    prefix = 0
+    limit = min(len(old_lines), len(new_lines))
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+
+    old_mid = old_lines[prefix:len(old_lines) - suffix]
+    new_mid = new_lines[prefix:len(new_lines) - suffix]
+    if not old_mid or not new_mid:
+        return [[prefix, len(old_mid), new_mid]] if old_mid or new_mid else []
+
+    hunks = []
+    matcher = SequenceMatcher(None, old_mid, new_mid, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            hunks.append([prefix + i1, i2 - i1, new_mid[j1:j2]])
+    return hunks
+
+
+def apply_diff(old_lines: List[str], hunks: List[List[Any]]) -> List[str]:
+    """Apply hunks from line_diff to a copy of old_lines."""
+    lines = list(old_lines)
+    for start, count, insert in reversed(hunks):
+        lines[start:start + count] = insert
+    return lines
+
+
+class VersionRing:
+    """
+    Bounded, thread-safe map of version ID -> code, oldest evicted first.
+    """
+
+    def __init__(self, capacity: int = DIFF_VERSIONS):
+        self.capacity = capacity
+        self._versions: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def put(self, code: str) -> str:
+        """Remember a version and return its ID."""
+        version = version_id(code)
+        with self._lock:
+            self._versions[version] = code
+            self._versions.move_to_end(version)
+            while len(self._versions) > self.capacity:
+                self._versions.popitem(last=False)
+        return version
+
+    def get(self, version: str) -> Optional[str]:
+        """Code of a remembered version, or None if unknown or evicted."""
+        with self._lock:
+            return self._versions.get(version)
+
+    def code_payload(self, code: str, base_version: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Response fields for a code string: a diff against base_version when
+        that version is still in the ring, otherwise the full code.
+
+        Args:
+            code: Newly generated code
+            base_version: Version ID the client last saw, if any
+
+        Returns:
+            {"version": ..., "diff": {"base_version": ..., "hunks": [...]}}
+            or {"version": ..., "code": ...}
+        """
+        base_code = self.get(base_version) if base_version else None
+        version = self.put(code)
+        if base_code is None:
+            return {"version": version, "code": code}
+        hunks = [] if version == base_version else line_diff(base_code.split("\n"), code.split("\n"))
+        return {"version": version, "diff": {"base_version": base_version, "hunks": hunks}}
+
+
+_shared_ring = VersionRing()
+_client_rings: "OrderedDict[str, VersionRing]" = OrderedDict()
+_client_rings_lock = threading.Lock()
+
+
+def get_version_ring(client_id: Any = None) -> VersionRing:
+    """
+    Get the version ring for a stateless /generate-code request.
+
+    Args:
+        client_id: The request's "client_id", if any
+
+    Returns:
+        The client's own ring (created on first use), or the shared ring
+        when no usable client_id was given
+    """
+    if not isinstance(client_id, str) or not client_id or len(client_id) > MAX_CLIENT_ID_LENGTH:
+        return _shared_ring
+    with _client_rings_lock:
+        ring = _client_rings.get(client_id)
+        if ring is None:
+            ring = _client_rings[client_id] = VersionRing(DIFF_CLIENT_VERSIONS)
+            while len(_client_rings) > DIFF_CLIENTS:
+                _client_rings.popitem(last=False)
+        else:
+            _client_rings.move_to_end(client_id)
+        return ring
@@ -9,9 +9,14 @@ Core Gameplay Features:
 4. Toggle between template-based deterministic code and AI-generated code
 """
 
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, List, Any, Tuple, Optional, Union, Iterable, Sequence
 from enum import Enum
+from bisect import bisect_right
 import json
+import threading
+
+from interning import freeze
+from persistent_sequence import PersistentSequence
 
 
 class BlockType(Enum):
@@ -48,13 +53,29 @@ class CommandPalette:
     Command palette for selecting available commands.
     Provides a structured interface for users to select commands.
     Supports level-based command filtering.
+    
+    The command table is built once and shared, read-only, by every palette;
+    a palette itself only holds its current level.
     """
     
+    _shared_commands: Optional[Dict[str, Dict[str, Any]]] = None
+    _shared_lock = threading.Lock()
+    
     def __init__(self, current_level: int = 1):
-        self.commands = self._initialize_commands()
+        self.commands = self.shared_commands()
         self.current_level = current_level
     
-    def _initialize_commands(self) -> Dict[str, Dict[str, Any]]:
+    @classmethod
+    def shared_commands(cls) -> Dict[str, Dict[str, Any]]:
+        """Get the process-wide command table (frozen; built on first use)."""
+        if cls._shared_commands is None:
+            with cls._shared_lock:
+                if cls._shared_commands is None:
+                    cls._shared_commands = freeze(cls._initialize_commands())
+        return cls._shared_commands
+    
+    @staticmethod
+    def _initialize_commands() -> Dict[str, Dict[str, Any]]:
         """Initialize available commands with their metadata and level availability."""
         return {
             "move": {
@@ -229,11 +250,55 @@ class VisualWorkflow:
     """
     Visual workflow manager for displaying commands in a sequence list.
     Maintains the sequence of selected commands.
+    
+    The sequence is a PersistentSequence: every edit makes a new version in
+    O(log n) that shares structure with the previous one. Past versions are
+    kept for undo/redo (O(1) per step), and get_snapshot() hands out the
+    current version without copying it.
+    
+    With max_history=0 there are no versions to share, so the sequence is a
+    plain list (edited in place, far smaller than tree nodes) and
+    get_snapshot() returns a tuple copy, made at most once per edit.
     """
     
-    def __init__(self):
-        self.sequence: List[Dict[str, Any]] = []
+    def __init__(self, max_history: Optional[int] = None):
+        """
+        Args:
+            max_history: Versions kept for undo (None: unlimited, 0: no history)
+        """
+        self.max_history = max_history
+        self.sequence: Union[PersistentSequence, List[Dict[str, Any]]] = (
+            [] if max_history == 0 else PersistentSequence()
+        )
         self.current_index: int = -1
+        self._undo: List[PersistentSequence] = []
+        self._redo: List[PersistentSequence] = []
+        self._frozen: Optional[Tuple[Dict[str, Any], ...]] = None
+    
+    def __len__(self) -> int:
+        return len(self.sequence)
+    
+    @property
+    def _versioned(self) -> bool:
+        return self.max_history != 0
+    
+    def _edit(self) -> List[Dict[str, Any]]:
+        """The plain list, about to be edited in place (max_history=0 only)."""
+        self._frozen = None
+        return self.sequence
+    
+    def _commit(self, sequence: PersistentSequence) -> None:
+        """Make a new version current; it can be undone, and the redo history is dropped."""
+        self._push_undo(self.sequence)
+        self._redo.clear()
+        self.sequence = sequence
+    
+    def _push_undo(self, sequence: PersistentSequence) -> None:
+        if self.max_history == 0:
+            return
+        self._undo.append(sequence)
+        if self.max_history is not None and len(self._undo) > self.max_history:
+            del self._undo[0]
     
     def add_command(self, command: Dict[str, Any]) -> int:
         """
@@ -245,37 +310,103 @@ class VisualWorkflow:
         Returns:
             Index of the added command
         """
-        self.sequence.append(command)
+        if self._versioned:
+            self._commit(self.sequence.append(command))
+        else:
+            self._edit().append(command)
         return len(self.sequence) - 1
     
     def insert_command(self, index: int, command: Dict[str, Any]) -> None:
         """Insert a command at a specific position."""
-        self.sequence.insert(index, command)
+        if self._versioned:
+            self._commit(self.sequence.insert(index, command))
+        else:
+            self._edit().insert(index, command)
     
     def remove_command(self, index: int) -> None:
         """Remove a command from the sequence."""
         if 0 <= index < len(self.sequence):
-            self.sequence.pop(index)
+            if self._versioned:
+                self._commit(self.sequence.delete(index))
+            else:
+                del self._edit()[index]
     
     def move_command(self, from_index: int, to_index: int) -> None:
         """Move a command from one position to another."""
         if 0 <= from_index < len(self.sequence) and 0 <= to_index < len(self.sequence):
-            command = self.sequence.pop(from_index)
-            self.sequence.insert(to_index, command)
+            if self._versioned:
+                command = self.sequence[from_index]
+                self._commit(self.sequence.delete(from_index).insert(to_index, command))
+            else:
+                items = self._edit()
+                items.insert(to_index, items.pop(from_index))
     
     def update_command(self, index: int, command: Dict[str, Any]) -> None:
         """Update a command at a specific position."""
         if 0 <= index < len(self.sequence):
-            self.sequence[index] = command
+            if self._versioned:
+                self._commit(self.sequence.set(index, command))
+            else:
+                self._edit()[index] = command
     
     def clear(self) -> None:
         """Clear all commands from the sequence."""
-        self.sequence.clear()
+        if len(self.sequence):
+            if self._versioned:
+                self._commit(PersistentSequence())
+            else:
+                self._edit().clear()
         self.current_index = -1
     
+    def undo(self) -> bool:
+        """
+        Go back to the version before the last edit.
+        
+        Returns:
+            False if there is nothing to undo
+        """
+        if not self._undo:
+            return False
+        self._redo.append(self.sequence)
+        self.sequence = self._undo.pop()
+        return True
+    
+    def redo(self) -> bool:
+        """
+        Reapply the last undone edit.
+        
+        Returns:
+            False if there is nothing to redo
+        """
+        if not self._redo:
+            return False
+        self._push_undo(self.sequence)
+        self.sequence = self._redo.pop()
+        return True
+    
+    def can_undo(self) -> bool:
+        """True if there is an edit to undo."""
+        return bool(self._undo)
+    
+    def can_redo(self) -> bool:
+        """True if there is an undone edit to redo."""
+        return bool(self._redo)
+    
     def get_sequence(self) -> List[Dict[str, Any]]:
-        """Get the full command sequence."""
-        return self.sequence.copy()
+        """Get the full command sequence (a new list; O(n))."""
+        return list(self.sequence)
+    
+    def get_snapshot(self) -> Sequence[Dict[str, Any]]:
+        """
+        Get the current version of the sequence. It is immutable: the
+        PersistentSequence itself (shared, not copied), or with
+        max_history=0 a tuple copy reused until the next edit.
+        """
+        if self._versioned:
+            return self.sequence
+        if self._frozen is None:
+            self._frozen = tuple(self.sequence)
+        return self._frozen
     
     def get_command(self, index: int) -> Optional[Dict[str, Any]]:
         """Get a command at a specific index."""
@@ -297,6 +428,171 @@ class VisualWorkflow:
         return visual
 
 
+class PlanTimeline:
+    """
+    Prefix-summed durations for an execution plan.
+    Lets the animation seek to a time or a step in O(log n) / O(1)
+    instead of scanning the plan.
+    
+    Which branch of a conditional runs depends on the simulation state,
+    which the timeline doesn't have, so a conditional counts as its longer
+    branch: times after a conditional are upper bounds. A function
+    definition counts as 0, since defining a function doesn't run its body.
+    """
+    
+    def __init__(self, plan: List[Dict[str, Any]]):
+        # starts[i] is the time plan item i begins; starts[-1] is the total duration
+        self.starts: List[float] = [0.0]
+        self.step_ids: List[Any] = []
+        for item in plan:
+            self.starts.append(self.starts[-1] + self.item_duration(item))
+            self.step_ids.append(item.get("step"))
+        self._index_by_step: Optional[Dict[Any, int]] = None
+    
+    @classmethod
+    def item_duration(cls, item: Dict[str, Any]) -> float:
+        """
+        Get the duration of one plan item (the longer branch for a conditional).
+        
+        Args:
+            item: Execution plan item
+            
+        Returns:
+            Duration in seconds (0 for missing or invalid durations)
+        """
+        if item.get("action") == "conditional":
+            return max(
+                sum(cls.item_duration(branch_item) for branch_item in item.get(branch) or [])
+                for branch in ("if_branch", "else_branch")
+            )
+        duration = item.get("duration", 0.0)
+        if not isinstance(duration, (int, float)) or isinstance(duration, bool) or duration < 0:
+            return 0.0
+        return float(duration)
+    
+    def __len__(self) -> int:
+        return len(self.step_ids)
+    
+    @property
+    def total_duration(self) -> float:
+        """Total duration of the plan in seconds."""
+        return self.starts[-1]
+    
+    def step_at(self, t: float) -> Optional[int]:
+        """
+        Get the index of the plan item running at time t.
+        
+        Args:
+            t: Time in seconds from the start of the program
+            
+        Returns:
+            Plan index (clamped to the plan), or None for an empty plan
+        """
+        if not self.step_ids:
+            return None
+        index = bisect_right(self.starts, t) - 1
+        return min(max(index, 0), len(self.step_ids) - 1)
+    
+    def time_of(self, step: Union[int, str]) -> Optional[float]:
+        """
+        Get the start time of a plan item.
+        
+        Args:
+            step: Plan index, or a step ID such as "0_iter3_1"
+            
+        Returns:
+            Start time in seconds, or None if the step is not in the plan
+        """
+        if isinstance(step, int) and not isinstance(step, bool):
+            index = step
+        else:
+            if self._index_by_step is None:
+                self._index_by_step = {}
+                for idx, step_id in enumerate(self.step_ids):
+                    self._index_by_step.setdefault(str(step_id), idx)
+            index = self._index_by_step.get(str(step))
+            if index is None:
+                return None
+        if 0 <= index < len(self.step_ids):
+            return self.starts[index]
+        return None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the timeline for API responses."""
+        return {
+            "total_duration": self.total_duration,
+            "starts": self.starts[:-1]
+        }
+
+
+# First lines of every generated program
+CODE_HEADER_LINES = [
+    "# Generated code from visual blocks",
+    "import time",
+]
+
+# Function implementations that make the generated code executable
+FUNCTION_IMPLEMENTATIONS = [
+    "# Character state",
+    "class Character:",
+    "    def __init__(self):",
+    "        self.x = 0",
+    "        self.y = 0",
+    "        self.angle = 0  # degrees (0 = facing right)",
+    "        self.history = []",
+    "        self.inventory = []  # For picked objects",
+    "        ",
+    "    def log_action(self, action):",
+    "        self.history.append(action)",
+    "        print(f'  → {action}')",
+    "",
+    "character = Character()",
+    "",
+    "# Movement functions",
+    "def move_forward(distance):",
+    "    \"\"\"Move the character forward in the current direction.\"\"\"",
+    "    import math",
+    "    radians = math.radians(character.angle)",
+    "    character.x += distance * math.cos(radians)",
+    "    character.y += distance * math.sin(radians)",
+    "    character.log_action(f'Moved forward {distance} units to ({character.x:.2f}, {character.y:.2f})')",
+    "",
+    "def move_backward(distance):",
+    "    \"\"\"Move the character backward.\"\"\"",
+    "    move_forward(-distance)",
+    "",
+    "def turn_left(degrees):",
+    "    \"\"\"Turn the character left (counter-clockwise).\"\"\"",
+    "    character.angle = (character.angle + degrees) % 360",
+    "    character.log_action(f'Turned left {degrees}° (now facing {character.angle:.1f}°)')",
+    "",
+    "def turn_right(degrees):",
+    "    \"\"\"Turn the character right (clockwise).\"\"\"",
+    "    character.angle = (character.angle - degrees) % 360",
+    "    character.log_action(f'Turned right {degrees}° (now facing {character.angle:.1f}°)')",
+    "",
+    "def jump(height):",
+    "    \"\"\"Make the character jump.\"\"\"",
+    "    character.log_action(f'Jumped {height} units high')",
+    "",
+    "def pick_object(object_name):",
+    "    \"\"\"Pick up an object and add it to inventory.\"\"\"",
+    "    character.inventory.append(object_name)",
+    "    character.log_action(f'Picked up {object_name} (inventory: {len(character.inventory)} items)')",
+    "",
+    "def show_final_position():",
+    "    \"\"\"Display the final character position.\"\"\"",
+    "    print(f'\\n📍 Final Position: ({character.x:.2f}, {character.y:.2f})')",
+    "    print(f'📐 Final Angle: {character.angle:.1f}°')",
+    "    print(f'📊 Total Actions: {len(character.history)}')",
+    "    print(f'🎒 Inventory: {character.inventory}')",
+    ""
+]
+
+# Constant prefix of every executable program (header + implementations)
+EXECUTABLE_PRELUDE = "\n".join(CODE_HEADER_LINES + [""] + FUNCTION_IMPLEMENTATIONS)
+
+
 class CodeGenerator:
     """
     Deterministic code generator that converts blocks to Python code.
@@ -361,47 +657,42 @@ class CodeGenerator:
         """Return current indentation string."""
         return " " * (self.indent_level * self.indent_size)
     
-    def display_code_with_mode(self, blocks: List[Dict[str, Any]]) -> Dict[str, str]:
+    def display_code_with_mode(self, blocks: List[Dict[str, Any]],
+                               mode: Optional[CodeDisplayMode] = None) -> Dict[str, str]:
         """
-        Generate and display code based on current display mode.
-        Returns both template-based and AI-generated versions for comparison.
+        Generate code for one display mode; the other mode is not computed.
         
         Args:
             blocks: List of block dictionaries
+            mode: Mode to generate (defaults to the current display mode)
             
         Returns:
-            Dictionary with 'template_based' and 'ai_generated' code
+            Dictionary with 'active_mode' and the code under 'template_based'
+            or 'ai_generated'
         """
-        # Generate template-based code
-        template_code, _ = self.generate_from_blocks(blocks, include_implementations=False)
-        
-        # Generate AI-generated code (placeholder for now)
-        # In a real implementation, this would call an AI API
-        ai_code = self._generate_ai_code_placeholder(blocks)
+        mode = mode or self.display_mode
+        if mode == CodeDisplayMode.AI_GENERATED:
+            # Cached per normalized program (see ai_backend.py)
+            code = self._generate_ai_code(blocks)
+        else:
+            code, _ = self.generate_from_blocks(blocks, include_implementations=False)
         
         return {
-            "template_based": template_code,
-            "ai_generated": ai_code,
-            "active_mode": self.display_mode.value
+            mode.value: code,
+            "active_mode": mode.value
         }
     
-    def _generate_ai_code_placeholder(self, blocks: List[Dict[str, Any]]) -> str:
+    def _generate_ai_code(self, blocks: List[Dict[str, Any]]) -> str:
         """
-        Placeholder for AI-generated code.
-        In production, this would call an AI API like OpenAI or Claude.
+        Get AI-generated code from the configured backend.
+        If the backend fails, the code is a comment saying why.
         """
-        prompt = f"Generate Python code for the following commands:\n"
-        for idx, block in enumerate(blocks):
-            prompt += f"{idx + 1}. {block.get('type')} with params {block.get('params')}\n"
-        
-        # For now, return a more natural AI-style code with comments
-        return f"""# AI-Generated Code
-# This is a placeholder for AI-generated code
-# In production, this would be generated by an AI model
-
-{prompt}
-# The AI would generate more natural, optimized code here
-"""
+        # Imported here: ai_backend imports this module
+        from ai_backend import AIBackendError, get_ai_code_generator
+        try:
+            return get_ai_code_generator().generate(blocks)
+        except AIBackendError as e:
+            return f"# AI-generated code is unavailable: {e}\n"
     
     def generate_from_blocks(self, blocks: List[Dict[str, Any]], include_implementations: bool = False) -> Tuple[str, List[Dict[str, Any]]]:
         """
@@ -414,13 +705,49 @@ class CodeGenerator:
         Returns:
             Tuple of (generated_code, execution_plan)
         """
+        program_lines, execution_plan = self.generate_program(blocks)
+        return self.assemble_code(program_lines, include_implementations), execution_plan
+    
+    def generate_program(self, blocks: Iterable[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        Generate the main-program lines and execution plan, one block at a time.
+        Accepts any iterable, so blocks can be fed in while a request is still being parsed.
+        
+        Args:
+            blocks: Iterable of block dictionaries
+            
+        Returns:
+            Tuple of (main program code lines, execution_plan)
+        """
         self.reset()
-        code_lines = []
+        program_lines = []
         execution_plan = []
         
+        # Process each block
+        for idx, block in enumerate(blocks):
+            block_code, block_plan = self._process_block(block, idx)
+            if block_code:
+                program_lines.append(block_code)
+            if block_plan:
+                execution_plan.extend(block_plan)
+        
+        return program_lines, execution_plan
+    
+    def assemble_code(self, program_lines: List[str], include_implementations: bool = False) -> str:
+        """
+        Wrap main-program lines with the header (and implementations, if requested).
+        
+        Args:
+            program_lines: Lines from generate_program
+            include_implementations: If True, includes actual function implementations for executable code
+            
+        Returns:
+            Complete generated code
+        """
+        code_lines = []
+        
         # Add imports and setup
-        code_lines.append("# Generated code from visual blocks")
-        code_lines.append("import time")
+        code_lines.extend(CODE_HEADER_LINES)
         
         # Add function implementations if requested
         if include_implementations:
@@ -430,14 +757,7 @@ class CodeGenerator:
         code_lines.append("")
         code_lines.append("# Main program")
         code_lines.append("")
-        
-        # Process each block
-        for idx, block in enumerate(blocks):
-            block_code, block_plan = self._process_block(block, idx)
-            if block_code:
-                code_lines.append(block_code)
-            if block_plan:
-                execution_plan.extend(block_plan)
+        code_lines.extend(program_lines)
         
         # Add final position display if implementations are included
         if include_implementations:
@@ -445,69 +765,28 @@ class CodeGenerator:
             code_lines.append("# Show results")
             code_lines.append("show_final_position()")
         
-        return "\n".join(code_lines), execution_plan
+        return "\n".join(code_lines)
+    
+    def generate_with_timeline(self, blocks: List[Dict[str, Any]], include_implementations: bool = False) -> Tuple[str, List[Dict[str, Any]], PlanTimeline]:
+        """
+        Generate code and execution plan, plus the plan's timeline index.
+        
+        Args:
+            blocks: List of block dictionaries with type and parameters
+            include_implementations: If True, includes actual function implementations for executable code
+            
+        Returns:
+            Tuple of (generated_code, execution_plan, timeline)
+        """
+        code, execution_plan = self.generate_from_blocks(blocks, include_implementations)
+        return code, execution_plan, PlanTimeline(execution_plan)
     
     def _get_function_implementations(self) -> List[str]:
         """
         Get actual Python function implementations for movement commands.
         This makes the generated code executable.
         """
-        return [
-            "# Character state",
-            "class Character:",
-            "    def __init__(self):",
-            "        self.x = 0",
-            "        self.y = 0",
-            "        self.angle = 0  # degrees (0 = facing right)",
-            "        self.history = []",
-            "        self.inventory = []  # For picked objects",
-            "        ",
-            "    def log_action(self, action):",
-            "        self.history.append(action)",
-            "        print(f'  → {action}')",
-            "",
-            "character = Character()",
-            "",
-            "# Movement functions",
-            "def move_forward(distance):",
-            "    \"\"\"Move the character forward in the current direction.\"\"\"",
-            "    import math",
-            "    radians = math.radians(character.angle)",
-            "    character.x += distance * math.cos(radians)",
-            "    character.y += distance * math.sin(radians)",
-            "    character.log_action(f'Moved forward {distance} units to ({character.x:.2f}, {character.y:.2f})')",
-            "",
-            "def move_backward(distance):",
-            "    \"\"\"Move the character backward.\"\"\"",
-            "    move_forward(-distance)",
-            "",
-            "def turn_left(degrees):",
-            "    \"\"\"Turn the character left (counter-clockwise).\"\"\"",
-            "    character.angle = (character.angle + degrees) % 360",
-            "    character.log_action(f'Turned left {degrees}° (now facing {character.angle:.1f}°)')",
-            "",
-            "def turn_right(degrees):",
-            "    \"\"\"Turn the character right (clockwise).\"\"\"",
-            "    character.angle = (character.angle - degrees) % 360",
-            "    character.log_action(f'Turned right {degrees}° (now facing {character.angle:.1f}°)')",
-            "",
-            "def jump(height):",
-            "    \"\"\"Make the character jump.\"\"\"",
-            "    character.log_action(f'Jumped {height} units high')",
-            "",
-            "def pick_object(object_name):",
-            "    \"\"\"Pick up an object and add it to inventory.\"\"\"",
-            "    character.inventory.append(object_name)",
-            "    character.log_action(f'Picked up {object_name} (inventory: {len(character.inventory)} items)')",
-            "",
-            "def show_final_position():",
-            "    \"\"\"Display the final character position.\"\"\"",
-            "    print(f'\\n📍 Final Position: ({character.x:.2f}, {character.y:.2f})')",
-            "    print(f'📐 Final Angle: {character.angle:.1f}°')",
-            "    print(f'📊 Total Actions: {len(character.history)}')",
-            "    print(f'🎒 Inventory: {character.inventory}')",
-            ""
-        ]
+        return list(FUNCTION_IMPLEMENTATIONS)
     
     def _process_block(self, block: Dict[str, Any], idx: int) -> Tuple[str, List[Dict[str, Any]]]:
         """
@@ -645,6 +924,7 @@ class CodeGenerator:
         
         self.indent_level += 1
         body_code_lines = []
+        body_block_plans = []
         body_plan = []
         
         for body_idx, body_block in enumerate(body):
@@ -652,13 +932,16 @@ class CodeGenerator:
             if body_code:
                 body_code_lines.append(body_code)
             if body_block_plan:
-                # Replicate body plan for each iteration
-                for iteration in range(iterations):
-                    for plan_item in body_block_plan:
-                        plan_copy = plan_item.copy()
-                        plan_copy["step"] = f"{idx}_iter{iteration}_{body_idx}"
-                        plan_copy["loop_iteration"] = iteration
-                        body_plan.append(plan_copy)
+                body_block_plans.append((body_idx, body_block_plan))
+        
+        # Replicate body plan for each iteration, in execution order
+        for iteration in range(iterations):
+            for body_idx, body_block_plan in body_block_plans:
+                for plan_item in body_block_plan:
+                    plan_copy = plan_item.copy()
+                    plan_copy["step"] = f"{idx}_iter{iteration}_{body_idx}"
+                    plan_copy["loop_iteration"] = iteration
+                    body_plan.append(plan_copy)
         
         self.indent_level -= 1
         
@@ -681,6 +964,7 @@ class CodeGenerator:
         self.indent_level += 1
         if_code_lines = []
         if_plan = []
+        else_plan = []
         
         for body_idx, body_block in enumerate(if_body):
             body_code, body_block_plan = self._process_block(body_block, f"{idx}_if_{body_idx}")
@@ -706,7 +990,7 @@ class CodeGenerator:
                 if body_code:
                     else_code_lines.append(body_code)
                 if body_block_plan:
-                    if_plan.extend(body_block_plan)
+                    else_plan.extend(body_block_plan)
             
             self.indent_level -= 1
             
@@ -715,12 +999,13 @@ class CodeGenerator:
             else:
                 code += f"{self._indent()}    pass"
         
-        # Add conditional marker to execution plan
+        # Add conditional marker to execution plan; the simulator picks a branch
         plan = [{
             "step": idx,
             "action": "conditional",
             "condition": condition,
-            "branches": if_plan
+            "if_branch": if_plan,
+            "else_branch": else_plan
         }]
         
         return code, plan
@@ -835,10 +1120,10 @@ class GameplaySession:
     Supports level-based command filtering.
     """
     
-    def __init__(self, current_level: int = 1):
+    def __init__(self, current_level: int = 1, max_history: Optional[int] = None):
         self.current_level = current_level
         self.palette = CommandPalette(current_level=current_level)
-        self.workflow = VisualWorkflow()
+        self.workflow = VisualWorkflow(max_history=max_history)
         self.generator = CodeGenerator()
         self.code_cache = ""
         
@@ -947,10 +1232,30 @@ class GameplaySession:
         Update the code display with current workflow.
         Returns the generated code.
         """
-        sequence = self.workflow.get_sequence()
+        sequence = self.workflow.get_snapshot()
         self.code_cache = self.generator.generate_live_code_preview(sequence)
         return self.code_cache
     
+    def undo(self) -> Dict[str, Any]:
+        """Undo the last workflow edit and update code."""
+        undone = self.workflow.undo()
+        if undone:
+            self.update_code_display()
+        return {
+            "success": undone,
+            "code": self.code_cache
+        }
+    
+    def redo(self) -> Dict[str, Any]:
+        """Redo the last undone workflow edit and update code."""
+        redone = self.workflow.redo()
+        if redone:
+            self.update_code_display()
+        return {
+            "success": redone,
+            "code": self.code_cache
+        }
+    
     def get_code_with_mode(self, mode: CodeDisplayMode) -> Dict[str, str]:
         """
         Get code in specified display mode.
@@ -959,11 +1264,11 @@ class GameplaySession:
             mode: The code display mode (template-based or AI-generated)
             
         Returns:
-            Dictionary with code for both modes and active mode
+            Dictionary with the code of that mode and the active mode
         """
         self.generator.set_display_mode(mode)
-        sequence = self.workflow.get_sequence()
-        return self.generator.display_code_with_mode(sequence)
+        sequence = self.workflow.get_snapshot()
+        return self.generator.display_code_with_mode(sequence, mode)
     
     def get_visual_workflow(self) -> str:
         """Get visual representation of the current workflow."""
@@ -1150,12 +1455,13 @@ def demonstrate_gameplay_features():
     
     print("\n\n6. TOGGLE DISPLAY MODE - AI-Generated vs Template-Based:")
     print("-" * 70)
-    code_both = session.get_code_with_mode(CodeDisplayMode.TEMPLATE_BASED)
-    print(f"Active Mode: {code_both['active_mode']}")
+    template = session.get_code_with_mode(CodeDisplayMode.TEMPLATE_BASED)
+    print(f"Active Mode: {template['active_mode']}")
     print("\nTemplate-Based Code:")
-    print(code_both['template_based'][:200] + "...")
+    print(template['template_based'][:200] + "...")
+    ai = session.get_code_with_mode(CodeDisplayMode.AI_GENERATED)
     print("\nAI-Generated Code Preview:")
-    print(code_both['ai_generated'][:200] + "...")
+    print(ai['ai_generated'][:200] + "...")
     
     print("\n" + "=" * 70)
     print("END OF DEMONSTRATION")
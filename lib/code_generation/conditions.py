@@ -0,0 +1,164 @@
+"""
+Restricted compiler for conditional-block expressions.
+
+Conditions such as "key_collected and steps < 10" are parsed once with
+the ast module, checked against a small whitelist (comparisons, boolean
+operators, constants and known state names) and turned into a tree of
+closures. Compiled evaluators are cached per distinct condition string,
+so the simulator never needs eval() or exec().
+"""
+
+from typing import Dict, Any, Callable, FrozenSet
+from functools import lru_cache
+import ast
+import operator
+
+
+# State names a condition may refer to (see simulator.condition_env)
+STATE_NAMES = frozenset([
+    "key_collected",
+    "has_key",
+    "door_open",
+    "coin_collected",
+    "coins_collected",
+    "goals_collected",
+    "completed",
+    "inventory_count",
+    "steps",
+    "x",
+    "y",
+    "col",
+    "row",
+    "heading",
+])
+
+_COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+Evaluator = Callable[[Dict[str, Any]], Any]
+
+
+class ConditionError(ValueError):
+    """Raised when a condition uses syntax or names outside the whitelist."""
+
+
+def _compile_node(node: ast.AST, source: str) -> Evaluator:
+    """Turn a whitelisted AST node into an evaluator closure."""
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, (bool, int, float, str, type(None))):
+            raise ConditionError(f"Unsupported constant in condition: {source!r}")
+        value = node.value
+        return lambda env: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name not in STATE_NAMES:
+            raise ConditionError(f"Unknown name '{name}' in condition: {source!r}")
+        return lambda env: env.get(name)
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        operand = _compile_node(node.operand, source)
+        return lambda env: not operand(env)
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        if isinstance(node.operand, ast.Constant) and not isinstance(node.operand.value, (int, float)):
+            raise ConditionError(f"Unary minus on a non-number in condition: {source!r}")
+        operand = _compile_node(node.operand, source)
+
+        def evaluate_negate(env):
+            try:
+                return -operand(env)
+            except TypeError:
+                # A state value that is not a number (e.g. missing -> None)
+                return None
+
+        return evaluate_negate
+
+    if isinstance(node, ast.BoolOp):
+        values = [_compile_node(value, source) for value in node.values]
+        if isinstance(node.op, ast.And):
+            return lambda env: all(value(env) for value in values)
+        return lambda env: any(value(env) for value in values)
+
+    if isinstance(node, ast.Compare):
+        left = _compile_node(node.left, source)
+        ops = []
+        for op, comparator in zip(node.ops, node.comparators):
+            compare = _COMPARE_OPS.get(type(op))
+            if compare is None:
+                raise ConditionError(f"Unsupported comparison in condition: {source!r}")
+            ops.append((compare, _compile_node(comparator, source)))
+
+        def evaluate_compare(env):
+            current = left(env)
+            for compare, right in ops:
+                other = right(env)
+                try:
+                    if not compare(current, other):
+                        return False
+                except TypeError:
+                    return False
+                current = other
+            return True
+
+        return evaluate_compare
+
+    raise ConditionError(f"Unsupported expression in condition: {source!r}")
+
+
+@lru_cache(maxsize=1024)
+def _parse(source: str) -> ast.Expression:
+    try:
+        return ast.parse(source.strip() or "True", mode="eval")
+    except SyntaxError as e:
+        raise ConditionError(f"Invalid condition {source!r}: {e.msg}") from None
+
+
+@lru_cache(maxsize=1024)
+def compile_condition(source: str) -> Evaluator:
+    """
+    Compile a condition string into a cached evaluator.
+
+    Args:
+        source: Condition text from a conditional block (e.g. "has_key == True")
+
+    Returns:
+        Function taking a state environment dict and returning the condition value
+
+    Raises:
+        ConditionError: If the condition is not in the supported subset
+    """
+    return _compile_node(_parse(source).body, source)
+
+
+def evaluate_condition(source: str, env: Dict[str, Any]) -> bool:
+    """Evaluate a condition string against a state environment."""
+    return bool(compile_condition(source)(env))
+
+
+def normalize_condition(source: str) -> str:
+    """
+    Canonical text for a condition (spacing and parentheses normalized).
+    Falls back to whitespace-collapsed text if the condition does not parse.
+    """
+    try:
+        return ast.unparse(_parse(source))
+    except ConditionError:
+        return " ".join(source.split())
+
+
+@lru_cache(maxsize=1024)
+def condition_names(source: str) -> FrozenSet[str]:
+    """
+    Names a condition refers to (e.g. {"steps"} for "steps < 10").
+
+    Raises:
+        ConditionError: If the condition does not parse
+    """
+    return frozenset(node.id for node in ast.walk(_parse(source)) if isinstance(node, ast.Name))
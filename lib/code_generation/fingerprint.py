@@ -0,0 +1,281 @@
+"""
+Canonical program fingerprints and a per-level solution index.
+
+Two block programs that do the same thing (default params spelled out or
+left off, a loop versus its unrolled body, two quarter turns versus one
+half turn) canonicalize to the same block list and therefore hash to the
+same fingerprint. The SolutionIndex maps fingerprints to simulation
+outcomes so repeat submissions are graded with a dictionary lookup.
+
+Every executed block counts as a simulation step, and a condition can
+test "steps", so turns are only merged when no condition in the program
+reads it. Grading always simulates the submitted program; the
+fingerprint is only the lookup key.
+"""
+
+from typing import Dict, List, Any, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+
+from code_generator import BlockType, CodeGenerator, CommandPalette
+from conditions import ConditionError, condition_names, normalize_condition
+from result_cache import get_result_cache
+from simulator import simulate_plan
+
+
+# Loops whose unrolled size would exceed this stay rolled
+MAX_UNROLLED_BLOCKS = 10000
+
+_TURN_TYPES = (BlockType.TURN_LEFT.value, BlockType.TURN_RIGHT.value)
+
+_default_params: Dict[str, Dict[str, Any]] = {}
+
+
+def default_params_for(block_type: str) -> Dict[str, Any]:
+    """Get the palette default params for a block type ({} if unknown)."""
+    if not _default_params:
+        for cmd in CommandPalette.shared_commands().values():
+            _default_params[cmd["type"]] = cmd["default_params"]
+    return _default_params.get(block_type, {})
+
+
+def _normalize_value(value: Any) -> Any:
+    """Normalize scalar params so that 1 and 1.0 compare equal."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _canonical_params(block_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill in palette defaults and normalize scalar values."""
+    merged = dict(default_params_for(block_type))
+    merged.update(params or {})
+    return {name: _normalize_value(value) for name, value in merged.items()
+            if name not in ("body", "if_body", "else_body")}
+
+
+def _turn_degrees(block: Dict[str, Any]) -> Optional[int]:
+    """Signed clockwise degrees of a quarter-turn block, or None if not mergeable."""
+    degrees = _normalize_value(block["params"].get("degrees", 90))
+    if not isinstance(degrees, int) or degrees % 90:
+        return None
+    return degrees if block["type"] == BlockType.TURN_RIGHT.value else -degrees
+
+
+def _merge_turns(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Collapse runs of adjacent quarter turns into a single net turn."""
+    merged: List[Dict[str, Any]] = []
+    net: Optional[int] = None
+
+    def flush():
+        if net is None:
+            return
+        degrees = net % 360
+        if degrees == 270:
+            merged.append({"type": BlockType.TURN_LEFT.value, "params": {"degrees": 90}})
+        elif degrees:
+            merged.append({"type": BlockType.TURN_RIGHT.value, "params": {"degrees": degrees}})
+
+    for block in blocks:
+        degrees = _turn_degrees(block) if block["type"] in _TURN_TYPES else None
+        if degrees is not None:
+            net = (net or 0) + degrees
+            continue
+        flush()
+        net = None
+        merged.append(block)
+    flush()
+    return merged
+
+
+def _reads_steps(blocks: List[Dict[str, Any]]) -> bool:
+    """True if any condition in the program may read the step counter."""
+    for block in blocks:
+        params = block.get("params", {}) or {}
+        if block.get("type") == BlockType.CONDITIONAL.value:
+            try:
+                if "steps" in condition_names(str(params.get("condition", "True"))):
+                    return True
+            except ConditionError:
+                return True
+        for name in ("body", "if_body", "else_body"):
+            if isinstance(params.get(name), list) and _reads_steps(params[name]):
+                return True
+    return False
+
+
+def canonicalize(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Rewrite a block program into its canonical form.
+
+    Default params are filled in, loops are unrolled (unless huge),
+    adjacent quarter turns are merged (unless a condition reads "steps",
+    which merging would change) and conditional bodies are canonicalized
+    recursively.
+
+    Args:
+        blocks: List of block dictionaries
+
+    Returns:
+        Canonical list of block dictionaries
+    """
+    return _canonicalize(blocks, merge_turns=not _reads_steps(blocks))
+
+
+def _canonicalize(blocks: List[Dict[str, Any]], merge_turns: bool) -> List[Dict[str, Any]]:
+    flat: List[Dict[str, Any]] = []
+    for block in blocks:
+        block_type = block.get("type", "")
+        params = block.get("params", {}) or {}
+
+        if block_type == BlockType.LOOP.value:
+            body = _canonicalize(params.get("body", []), merge_turns)
+            iterations = _normalize_value(params.get("iterations", 3))
+            if isinstance(iterations, int) and iterations * len(body) <= MAX_UNROLLED_BLOCKS:
+                flat.extend(body * max(iterations, 0))
+                continue
+            flat.append({"type": block_type, "params": {"iterations": iterations, "body": body}})
+            continue
+
+        canonical = {"type": block_type, "params": _canonical_params(block_type, params)}
+        if block_type == BlockType.CONDITIONAL.value:
+            canonical["params"]["condition"] = normalize_condition(str(params.get("condition", "True")))
+            canonical["params"]["if_body"] = _canonicalize(params.get("if_body", []), merge_turns)
+            canonical["params"]["else_body"] = _canonicalize(params.get("else_body", []), merge_turns)
+        elif block_type == BlockType.FUNCTION.value:
+            canonical["params"]["body"] = _canonicalize(params.get("body", []), merge_turns)
+        flat.append(canonical)
+
+    return _merge_turns(flat) if merge_turns else flat
+
+
+def normalize(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fill in default params and normalize values and conditions, keeping
+    the program's structure (unlike canonicalize, nothing is unrolled or
+    merged), so programs that differ only in spelling become equal.
+
+    Args:
+        blocks: List of block dictionaries
+
+    Returns:
+        Normalized list of block dictionaries
+    """
+    normalized: List[Dict[str, Any]] = []
+    for block in blocks:
+        block_type = block.get("type", "")
+        params = block.get("params", {}) or {}
+        merged = _canonical_params(block_type, params)
+        for name in ("body", "if_body", "else_body"):
+            if name in params or name in default_params_for(block_type):
+                merged[name] = normalize(params.get(name) or [])
+        if block_type == BlockType.CONDITIONAL.value:
+            merged["condition"] = normalize_condition(str(merged.get("condition", "True")))
+        normalized.append({"type": block_type, "params": merged})
+    return normalized
+
+
+def fingerprint(blocks: List[Dict[str, Any]]) -> str:
+    """
+    Hash the canonical form of a block program.
+
+    Args:
+        blocks: List of block dictionaries
+
+    Returns:
+        Hex fingerprint shared by all equivalent programs
+    """
+    return _hash_canonical(canonicalize(blocks))
+
+
+def _hash_canonical(canonical: List[Dict[str, Any]]) -> str:
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class SolutionIndex:
+    """
+    Per-level map from program fingerprints to simulation outcomes.
+    Bounded with LRU eviction; hit counts are kept for analytics.
+    Safe to share between request threads.
+    """
+
+    def __init__(self, level: int, max_entries: int = 50000):
+        self.level = level
+        self.max_entries = max_entries
+        self.outcomes: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, program_fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Get the known outcome for a fingerprint, if any."""
+        with self._lock:
+            outcome = self.outcomes.get(program_fingerprint)
+            if outcome is not None:
+                self.outcomes.move_to_end(program_fingerprint)
+                self.hits[program_fingerprint] = self.hits.get(program_fingerprint, 0) + 1
+            return outcome
+
+    def record(self, program_fingerprint: str, outcome: Dict[str, Any]) -> None:
+        """Store the outcome for a fingerprint."""
+        with self._lock:
+            self.outcomes[program_fingerprint] = outcome
+            self.outcomes.move_to_end(program_fingerprint)
+            while len(self.outcomes) > self.max_entries:
+                evicted, _ = self.outcomes.popitem(last=False)
+                self.hits.pop(evicted, None)
+
+    def grade(self, blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Grade a submission, simulating it only if its fingerprint is new.
+        The submitted blocks are simulated, never the canonical form.
+
+        Args:
+            blocks: List of block dictionaries
+
+        Returns:
+            Dictionary with fingerprint, outcome and whether it was cached
+        """
+        program_fingerprint = fingerprint(blocks)
+        outcome = self.lookup(program_fingerprint)
+        known = outcome is not None
+        if outcome is None:
+            # Other workers (or an earlier run) may have graded it already
+            results = get_result_cache()
+            outcome = results.get("grade", self.level, "outcome", program_fingerprint)
+        cache_hit = outcome is not None
+        if outcome is None:
+            _, plan = CodeGenerator().generate_from_blocks(blocks)
+            state = simulate_plan(plan, self.level)
+            outcome = {
+                "completed": state["completed"],
+                "collected": state["collected"],
+                "failed": state["failed"]
+            }
+            results.put("grade", self.level, "outcome", program_fingerprint, outcome)
+        if not known:
+            self.record(program_fingerprint, outcome)
+        return {"fingerprint": program_fingerprint, "cache_hit": cache_hit, **outcome}
+
+    def top_programs(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Most frequently resubmitted fingerprints (for analytics)."""
+        with self._lock:
+            ranked = sorted(self.hits.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [{"fingerprint": fp, "hits": count, **self.outcomes[fp]} for fp, count in ranked]
+
+
+_indexes: Dict[int, SolutionIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_solution_index(level: int) -> SolutionIndex:
+    """Get (or create) the solution index for a level."""
+    with _indexes_lock:
+        index = _indexes.get(level)
+        if index is None:
+            index = _indexes[level] = SolutionIndex(level)
+        return index
@@ -0,0 +1,175 @@
+"""
+Immutable, interned block data (flyweights).
+
+Most programs are built from the same few blocks: thousands of sessions
+each holding their own {"type": "move_forward", "params": {"distance": 1}}
+would keep thousands of identical dicts alive. intern_block() turns a
+block into FrozenDict/FrozenList objects and returns the one shared
+instance for that content, so identical blocks (and identical params or
+bodies inside different blocks) are stored once per process, and a
+session's program is little more than a list of references.
+
+FrozenDict and FrozenList subclass dict and list, so reading code and
+JSON encoders (json, orjson) treat them as usual; any mutation raises
+TypeError. copy() returns an ordinary, mutable dict or list. Interned
+objects are held weakly and disappear once no session uses them.
+"""
+
+from typing import Dict, Any, Tuple
+import sys
+import threading
+import weakref
+
+
+# Strings at most this long are interned with sys.intern
+MAX_INTERNED_STRING = 64
+
+
+def _immutable(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is immutable")
+
+
+class FrozenDict(dict):
+    """A dict that can't be changed after construction."""
+
+    __slots__ = ("_key", "__weakref__")
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+    __ior__ = _immutable
+
+    def __hash__(self):
+        return hash(_key(self))
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+class FrozenList(list):
+    """A list that can't be changed after construction."""
+
+    __slots__ = ("_key", "__weakref__")
+
+    __setitem__ = __delitem__ = _immutable
+    append = extend = insert = pop = remove = clear = sort = reverse = _immutable
+    __iadd__ = __imul__ = _immutable
+
+    def __hash__(self):
+        return hash(_key(self))
+
+    def copy(self) -> list:
+        return list(self)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+
+def _key(value: Any) -> Tuple:
+    """
+    Content key of a value. Types are part of the key, so 1, 1.0 and True
+    stay distinct; frozen containers remember their key.
+    """
+    if isinstance(value, (FrozenDict, FrozenList)):
+        try:
+            return value._key
+        except AttributeError:
+            pass
+    if isinstance(value, dict):
+        key = ("d",) + tuple(sorted((str(name), _key(item)) for name, item in value.items()))
+    elif isinstance(value, (list, tuple)):
+        key = ("l",) + tuple(_key(item) for item in value)
+    else:
+        key = (type(value).__name__, value)
+    if isinstance(value, (FrozenDict, FrozenList)):
+        value._key = key
+    return key
+
+
+def freeze(value: Any) -> Any:
+    """
+    Recursively convert dicts and lists to FrozenDict and FrozenList
+    (without interning). Other values are returned as is.
+    """
+    if isinstance(value, (FrozenDict, FrozenList)):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict((name, freeze(item)) for name, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+class InternTable:
+    """Weak table from content keys to the shared frozen instance."""
+
+    def __init__(self):
+        self._table: "weakref.WeakValueDictionary[Tuple, Any]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def intern(self, value: Any) -> Any:
+        """
+        Get the shared frozen instance equal to a value, creating it if needed.
+        Nested dicts and lists are interned too.
+        """
+        if isinstance(value, str):
+            return sys.intern(value) if len(value) <= MAX_INTERNED_STRING else value
+        if isinstance(value, dict):
+            frozen = FrozenDict((self.intern(name), self.intern(item)) for name, item in value.items())
+        elif isinstance(value, (list, tuple)):
+            frozen = FrozenList(self.intern(item) for item in value)
+        else:
+            return value
+        key = _key(frozen)
+        with self._lock:
+            existing = self._table.get(key)
+            if existing is not None:
+                self.hits += 1
+                return existing
+            self._table[key] = frozen
+            self.misses += 1
+            return frozen
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring."""
+        return {"unique": len(self._table), "hits": self.hits, "misses": self.misses}
+
+
+_table = InternTable()
+
+
+def intern_block(block: Any) -> Any:
+    """
+    Get the shared immutable instance of a block.
+
+    Args:
+        block: Block dictionary (or any JSON-like value)
+
+    Returns:
+        FrozenDict equal to the block; the same object for equal blocks
+    """
+    return _table.intern(block)
+
+
+def intern_stats() -> Dict[str, Any]:
+    """Counters of the process-wide intern table."""
+    return _table.stats()
@@ -0,0 +1,310 @@
+"""
+Append-only journal of session edits, with snapshot compaction.
+
+Each hosted session gets two files in the journal directory:
+
+    <session_id>.log    one JSON line per applied batch of ops:
+                        {"v": 7, "ops": [{"op": "add", "block": {...}}, ...]}
+    <session_id>.snap   the full state at some version:
+                        {"session_id": ..., "level": 2, "version": 5, "blocks": [...]}
+
+Persisting an edit is one small append. Appends are queued and written
+by a background thread in batches (every CODEGEN_JOURNAL_FLUSH_MS), so
+request threads never wait for the disk. After SNAPSHOT_EVERY appended
+batches a session is compacted: its snapshot is rewritten atomically and
+its log truncated. Restoring a session loads the snapshot and replays
+the log records newer than it; a torn last line from a crash is ignored.
+A session that can no longer be restored as recorded (e.g. after a
+validation rule was tightened) is quarantined, not deleted: its files
+are renamed to <session_id>.snap.rejected and <session_id>.log.rejected
+for inspection and are no longer loaded.
+
+Edits made in the last flush interval before a crash can be lost. Like
+the session store itself, the journal assumes one server process, and
+it enforces that: opening a journal takes an exclusive flock on
+<directory>/.lock, held until close() or process exit. A second process
+opening the same directory waits up to CODEGEN_JOURNAL_LOCK_WAIT_S (so a
+serve.py worker started by a graceful restart can take over from the one
+it replaces) and then fails with RuntimeError instead of interleaving
+its writes with the owner's. The lock is not available on platforms
+without fcntl.
+
+Configuration (environment variables):
+    CODEGEN_JOURNAL_DIR             - directory of session journals (default: unset, no journal)
+    CODEGEN_JOURNAL_FLUSH_MS        - how often queued appends are written (default: 50)
+    CODEGEN_JOURNAL_SNAPSHOT_EVERY  - appended batches between snapshots (default: 200)
+    CODEGEN_JOURNAL_FSYNC           - set to 1 to fsync every written batch
+    CODEGEN_JOURNAL_LOCK_WAIT_S     - how long to wait for another process's lock (default: 30)
+"""
+
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+import atexit
+import os
+import re
+import threading
+import time
+
+import wire
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+JOURNAL_DIR = os.environ.get("CODEGEN_JOURNAL_DIR") or None
+FLUSH_INTERVAL = float(os.environ.get("CODEGEN_JOURNAL_FLUSH_MS", 50)) / 1000
+SNAPSHOT_EVERY = int(os.environ.get("CODEGEN_JOURNAL_SNAPSHOT_EVERY", 200))
+JOURNAL_FSYNC = os.environ.get("CODEGEN_JOURNAL_FSYNC") == "1"
+LOCK_WAIT = float(os.environ.get("CODEGEN_JOURNAL_LOCK_WAIT_S", 30))
+
+# Session IDs come from secrets.token_urlsafe; anything else is not ours
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class SessionJournal:
+    """
+    Batched, append-only op log plus snapshots, one pair of files per session.
+
+        journal.append(session_id, version, ops)   # after applying ops
+        journal.snapshot(state)                    # full state, compacts the log
+        journal.delete(session_id)
+        journal.quarantine(session_id)             # keep the files, stop loading them
+        for state, records in journal.load_all(): ...
+    """
+
+    def __init__(self, directory: str, flush_interval: float = FLUSH_INTERVAL,
+                 snapshot_every: int = SNAPSHOT_EVERY, fsync: bool = JOURNAL_FSYNC,
+                 lock_wait: float = LOCK_WAIT):
+        """
+        Open (creating if needed) a journal directory and lock it for this process.
+
+        Raises:
+            RuntimeError: If another process still holds the directory after lock_wait seconds
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.snapshot_every = max(1, snapshot_every)
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = self._acquire_lock(lock_wait)
+        # (kind, session_id, payload) in submission order
+        self._queue: List[Tuple[str, str, Any]] = []
+        self._since_snapshot: Dict[str, int] = {}
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self.appended = 0
+        self.snapshots = 0
+        self.batches = 0
+        self._writer = threading.Thread(target=self._run, name="session-journal", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _acquire_lock(self, wait: float):
+        """Take the directory's exclusive lock, retrying for up to wait seconds."""
+        if fcntl is None:
+            return None
+        lock_file = open(os.path.join(self.directory, ".lock"), "a")
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return lock_file
+            except OSError:
+                if time.monotonic() >= deadline:
+                    lock_file.close()
+                    raise RuntimeError(
+                        f"Journal directory {self.directory} is in use by another process"
+                    )
+                time.sleep(0.1)
+
+    def _path(self, session_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.{suffix}")
+
+    def _submit(self, kind: str, session_id: str, payload: Any) -> None:
+        with self._cond:
+            self._queue.append((kind, session_id, payload))
+            if len(self._queue) == 1:
+                self._cond.notify()
+
+    def append(self, session_id: str, version: int, ops: List[Dict[str, Any]]) -> bool:
+        """
+        Queue a batch of applied ops.
+
+        Args:
+            session_id: Session the ops were applied to
+            version: Session version after the batch
+            ops: The ops, in the order they were applied
+
+        Returns:
+            True if the session is due for a snapshot
+        """
+        self._submit("ops", session_id, {"v": version, "ops": ops})
+        with self._cond:
+            count = self._since_snapshot.get(session_id, 0) + 1
+            self._since_snapshot[session_id] = count
+        return count >= self.snapshot_every
+
+    def snapshot(self, state: Dict[str, Any]) -> None:
+        """
+        Queue a full-state snapshot; once written, the log is truncated.
+
+        Args:
+            state: {"session_id", "level", "version", "blocks"}; blocks may be
+                any sequence (e.g. a workflow snapshot) that won't change afterwards
+        """
+        with self._cond:
+            self._since_snapshot[state["session_id"]] = 0
+        self._submit("snap", state["session_id"], state)
+
+    def delete(self, session_id: str) -> None:
+        """Queue removal of a session's journal files."""
+        with self._cond:
+            self._since_snapshot.pop(session_id, None)
+        self._submit("delete", session_id, None)
+
+    def quarantine(self, session_id: str) -> None:
+        """Queue renaming a session's journal files aside (see the module docstring)."""
+        with self._cond:
+            self._since_snapshot.pop(session_id, None)
+        self._submit("quarantine", session_id, None)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._closed:
+                    # Let a batch accumulate (later submissions don't notify)
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def flush(self) -> None:
+        """Write everything queued so far (grouped per session, in order)."""
+        with self._write_lock:
+            with self._cond:
+                queue, self._queue = self._queue, []
+            if not queue:
+                return
+            lines: Dict[str, List[bytes]] = {}
+            for kind, session_id, payload in queue:
+                if kind == "ops":
+                    lines.setdefault(session_id, []).append(wire.dumps(payload) + b"\n")
+                    self.appended += 1
+                    continue
+                # Snapshots, deletes and quarantines apply after the ops queued before them
+                self._write_lines(session_id, lines.pop(session_id, []))
+                if kind == "snap":
+                    self._write_snapshot(session_id, payload)
+                elif kind == "quarantine":
+                    self._set_aside(session_id)
+                else:
+                    self._remove(session_id)
+            for session_id, session_lines in lines.items():
+                self._write_lines(session_id, session_lines)
+            self.batches += 1
+
+    def _write_lines(self, session_id: str, lines: List[bytes]) -> None:
+        if not lines:
+            return
+        try:
+            with open(self._path(session_id, "log"), "ab") as f:
+                f.write(b"".join(lines))
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        except OSError:
+            pass
+
+    def _write_snapshot(self, session_id: str, state: Dict[str, Any]) -> None:
+        path = self._path(session_id, "snap")
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(wire.dumps({**state, "blocks": list(state["blocks"])}))
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            # Records up to the snapshot's version are now redundant
+            open(self._path(session_id, "log"), "wb").close()
+            self.snapshots += 1
+        except OSError:
+            pass
+
+    def _remove(self, session_id: str) -> None:
+        for suffix in ("snap", "log"):
+            try:
+                os.unlink(self._path(session_id, suffix))
+            except OSError:
+                pass
+
+    def _set_aside(self, session_id: str) -> None:
+        for suffix in ("snap", "log"):
+            path = self._path(session_id, suffix)
+            try:
+                os.replace(path, f"{path}.rejected")
+            except OSError:
+                pass
+
+    def load(self, session_id: str) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Read a session's snapshot and the log records newer than it.
+
+        Returns:
+            (state, records), or None if the session has no snapshot
+        """
+        try:
+            with open(self._path(session_id, "snap"), "rb") as f:
+                state = wire.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        records = []
+        try:
+            with open(self._path(session_id, "log"), "rb") as f:
+                for line in f:
+                    try:
+                        record = wire.loads(line)
+                    except ValueError:
+                        break  # torn write at the end of the log
+                    if record.get("v", 0) > state.get("version", 0):
+                        records.append(record)
+        except OSError:
+            pass
+        return state, records
+
+    def load_all(self) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Yield (state, records) for every journaled session."""
+        for name in sorted(os.listdir(self.directory)):
+            session_id, _, suffix = name.rpartition(".")
+            if suffix != "snap" or not _SESSION_ID.match(session_id):
+                continue
+            loaded = self.load(session_id)
+            if loaded is not None:
+                yield loaded
+
+    def close(self) -> None:
+        """Write out the queue, stop the writer thread and release the directory lock."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join(timeout=5)
+        self.flush()
+        if self._lock_file is not None:
+            # Closing the file releases the flock
+            self._lock_file.close()
+            self._lock_file = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring."""
+        return {
+            "directory": self.directory,
+            "queued": len(self._queue),
+            "appended": self.appended,
+            "snapshots": self.snapshots,
+            "batches": self.batches
+        }
@@ -0,0 +1,346 @@
+"""
+Precomputed distance fields for hints and shortest solutions.
+
+For every goal of a level we run one reverse BFS over (tile, heading)
+states and keep, per state, the distance to the goal, the best next
+command and the full optimal command sequence. Fields are cached in
+memory and on disk, so a hint is a dictionary lookup from the player's
+simulated pose.
+
+Usage:
+    python3 level_solver.py    # precompute every level to the disk cache
+"""
+
+from typing import Dict, List, Any, Tuple, Optional
+from collections import deque
+import json
+import os
+
+from simulator import (
+    LevelMap, Pose, HEADING_DELTAS, HEADING_NAMES, LEVEL_MAPS,
+    get_level_map, simulate_plan, state_pose, turn
+)
+
+
+CACHE_DIR = os.environ.get(
+    "SYNTAX_SAGA_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+)
+
+# Solver actions in tie-break order, with the block each one maps to
+ACTIONS = ["move_forward", "turn_left", "turn_right", "move_backward"]
+
+ACTION_BLOCKS = {
+    "move_forward": {"type": "move_forward", "params": {"distance": 1}},
+    "move_backward": {"type": "move_backward", "params": {"distance": 1}},
+    "turn_left": {"type": "turn_left", "params": {"degrees": 90}},
+    "turn_right": {"type": "turn_right", "params": {"degrees": 90}},
+}
+
+
+def _successor(level_map: LevelMap, pose: Pose, action: str, collected: List[str]) -> Optional[Pose]:
+    """Pose reached by a single solver action, or None if it leaves the path."""
+    col, row, heading = pose
+    if action == "turn_left":
+        return (col, row, turn(heading, -1))
+    if action == "turn_right":
+        return (col, row, turn(heading, 1))
+    dcol, drow = HEADING_DELTAS[heading]
+    if action == "move_backward":
+        dcol, drow = -dcol, -drow
+    tile = (col + dcol, row + drow)
+    if not level_map.is_walkable(tile, collected):
+        return None
+    return (tile[0], tile[1], heading)
+
+
+def _preference(program: Tuple[str, ...]) -> Tuple[int, int]:
+    """Tie-break key between equally short programs."""
+    return (program.count("move_backward"), ACTIONS.index(program[0]))
+
+
+def _pose_key(pose: Pose) -> str:
+    return f"{pose[0]},{pose[1]},{pose[2]}"
+
+
+def _parse_pose_key(key: str) -> Pose:
+    col, row, heading = key.split(",")
+    return (int(col), int(row), int(heading))
+
+
+class DistanceField:
+    """
+    BFS distance field towards a single goal.
+    Maps every (col, row, heading) state that can reach the goal to its
+    distance, the next optimal action and the full optimal action list.
+    """
+
+    def __init__(self, goal: str, assumes: List[str], distance: Dict[Pose, int],
+                 next_action: Dict[Pose, str], program: Dict[Pose, Tuple[str, ...]]):
+        self.goal = goal
+        self.assumes = assumes  # goals that must be collected for this field to hold
+        self.distance = distance
+        self.next_action = next_action
+        self.program = program
+
+    @classmethod
+    def build(cls, level_map: LevelMap, goal: str) -> "DistanceField":
+        """
+        Run a reverse BFS from every heading on the goal tile.
+
+        Args:
+            level_map: Level to solve
+            goal: Name of the goal to reach
+
+        Returns:
+            Distance field for the goal
+        """
+        # Doors whose key comes before this goal are assumed to be open
+        goal_index = level_map.goal_names.index(goal)
+        assumes = [name for name in level_map.goal_names[:goal_index]
+                   if name in level_map.doors.values()]
+        goal_tile = level_map.goal_tile(goal)
+
+        states = [(col, row, heading)
+                  for col, row in level_map.tiles if level_map.is_walkable((col, row), assumes)
+                  for heading in range(4)]
+
+        predecessors: Dict[Pose, List[Tuple[Pose, str]]] = {state: [] for state in states}
+        for state in states:
+            for action in ACTIONS:
+                successor = _successor(level_map, state, action, assumes)
+                if successor is not None:
+                    predecessors[successor].append((state, action))
+
+        distance: Dict[Pose, int] = {}
+        next_action: Dict[Pose, str] = {}
+        program: Dict[Pose, Tuple[str, ...]] = {}
+        queue = deque()
+        for heading in range(4):
+            state = (goal_tile[0], goal_tile[1], heading)
+            if state in predecessors:
+                distance[state] = 0
+                program[state] = ()
+                queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            for previous, action in predecessors[state]:
+                if previous in distance:
+                    # At equal distance prefer fewer backward moves, then ACTIONS order
+                    candidate = (action,) + program[state]
+                    if (distance[previous] == distance[state] + 1
+                            and _preference(candidate) < _preference(program[previous])):
+                        next_action[previous] = action
+                        program[previous] = candidate
+                    continue
+                distance[previous] = distance[state] + 1
+                next_action[previous] = action
+                program[previous] = (action,) + program[state]
+                queue.append(previous)
+
+        return cls(goal, assumes, distance, next_action, program)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the field for the disk cache."""
+        return {
+            "goal": self.goal,
+            "assumes": self.assumes,
+            "distance": {_pose_key(s): d for s, d in self.distance.items()},
+            "next_action": {_pose_key(s): a for s, a in self.next_action.items()},
+            "program": {_pose_key(s): list(p) for s, p in self.program.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DistanceField":
+        """Load a field previously written with to_dict."""
+        return cls(
+            data["goal"],
+            data["assumes"],
+            {_parse_pose_key(k): d for k, d in data["distance"].items()},
+            {_parse_pose_key(k): a for k, a in data["next_action"].items()},
+            {_parse_pose_key(k): tuple(p) for k, p in data["program"].items()}
+        )
+
+
+class LevelSolver:
+    """
+    All distance fields for one level, plus hint lookups.
+    """
+
+    def __init__(self, level_map: LevelMap, fields: Dict[str, DistanceField]):
+        self.level_map = level_map
+        self.fields = fields
+
+    @classmethod
+    def build(cls, level_map: LevelMap) -> "LevelSolver":
+        """Build the distance field for every goal of a level."""
+        return cls(level_map, {goal: DistanceField.build(level_map, goal)
+                               for goal in level_map.goal_names})
+
+    def cache_path(self) -> str:
+        """Path of this level's disk cache file."""
+        return _cache_path(self.level_map)
+
+    def best_target(self, pose: Pose, collected: List[str]) -> Optional[DistanceField]:
+        """
+        Pick the nearest uncollected goal that is reachable from a pose.
+
+        Args:
+            pose: Current (col, row, heading)
+            collected: Goals collected so far
+
+        Returns:
+            Distance field of the target goal, or None if nothing is reachable
+        """
+        best = None
+        for goal in self.level_map.goal_names:
+            if goal in collected:
+                continue
+            field = self.fields[goal]
+            if any(name not in collected for name in field.assumes):
+                continue
+            distance = field.distance.get(pose)
+            if distance is not None and (best is None or distance < best.distance[pose]):
+                best = field
+        return best
+
+    def next_command(self, pose: Pose, collected: List[str]) -> Optional[Dict[str, Any]]:
+        """Get the next optimal block from a pose, or None if there is none."""
+        field = self.best_target(pose, collected)
+        if field is None or field.distance[pose] == 0:
+            return None
+        return _block(field.next_action[pose])
+
+    def solve(self, pose: Pose, collected: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get a full block program that collects every remaining goal.
+
+        Args:
+            pose: Current (col, row, heading)
+            collected: Goals collected so far
+
+        Returns:
+            List of blocks, or None if some goal cannot be reached
+        """
+        collected = list(collected)
+        actions: List[str] = []
+        while len(collected) < len(self.level_map.goals):
+            field = self.best_target(pose, collected)
+            if field is None:
+                return None
+            actions.extend(field.program[pose])
+            # Walking the program collects every goal it passes through
+            for action in field.program[pose]:
+                pose = _successor(self.level_map, pose, action, collected)
+                goal = self.level_map.goal_tiles.get((pose[0], pose[1]))
+                if goal and goal not in collected:
+                    collected.append(goal)
+        return [_block(action) for action in actions]
+
+
+def _block(action: str) -> Dict[str, Any]:
+    """Build a fresh block dictionary for a solver action."""
+    template = ACTION_BLOCKS[action]
+    return {"type": template["type"], "params": dict(template["params"])}
+
+
+def _cache_path(level_map: LevelMap) -> str:
+    return os.path.join(CACHE_DIR, f"distance_fields_level{level_map.level}_{level_map.fingerprint()}.json")
+
+
+_solvers: Dict[int, LevelSolver] = {}
+
+
+def get_solver(level: int) -> Optional[LevelSolver]:
+    """
+    Get the solver for a level, loading it from memory, disk or by BFS.
+
+    Args:
+        level: Level number (1-4)
+
+    Returns:
+        LevelSolver, or None if the level has no map
+    """
+    solver = _solvers.get(level)
+    if solver is not None:
+        return solver
+
+    level_map = get_level_map(level)
+    if level_map is None:
+        return None
+
+    path = _cache_path(level_map)
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        solver = LevelSolver(level_map, {goal: DistanceField.from_dict(field)
+                                         for goal, field in data["fields"].items()})
+    except (OSError, ValueError, KeyError):
+        solver = LevelSolver.build(level_map)
+        _write_cache(path, {"fields": {goal: field.to_dict() for goal, field in solver.fields.items()}})
+
+    _solvers[level] = solver
+    return solver
+
+
+def _write_cache(path: str, data: Dict[str, Any]) -> None:
+    """Write a cache file atomically; a read-only cache dir is not an error."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def precompute_all() -> None:
+    """Load or build the solver for every level."""
+    for level in LEVEL_MAPS:
+        get_solver(level)
+
+
+def get_hint(plan: List[Dict[str, Any]], level: int, full_program: bool = False) -> Dict[str, Any]:
+    """
+    Suggest the next block (and optionally a full solution) for a program.
+
+    Args:
+        plan: Execution plan of the player's current program
+        level: Level number (1-4)
+        full_program: If True, also return the full optimal remaining program
+
+    Returns:
+        Dictionary with the simulated pose, target goal and suggestions
+    """
+    solver = get_solver(level)
+    if solver is None:
+        raise ValueError(f"No map for level {level}")
+
+    state = simulate_plan(plan, level)
+    pose = state_pose(state)
+    result = {
+        "pose": {"col": pose[0], "row": pose[1], "heading": HEADING_NAMES[pose[2]]},
+        "collected": state["collected"],
+        "completed": state["completed"],
+        "failed": state["failed"]
+    }
+    if state["failed"] or state["completed"]:
+        result["next_command"] = None
+        return result
+
+    field = solver.best_target(pose, state["collected"])
+    result["target"] = field.goal if field else None
+    result["distance"] = field.distance[pose] if field else None
+    result["next_command"] = solver.next_command(pose, state["collected"])
+    if full_program:
+        result["program"] = solver.solve(pose, state["collected"])
+    return result
+
+
+if __name__ == "__main__":
+    precompute_all()
+    for level, solver in sorted(_solvers.items()):
+        program = solver.solve(solver.level_map.start, [])
+        print(f"Level {level} ({solver.level_map.name}): {len(program or [])} blocks -> {solver.cache_path()}")
@@ -0,0 +1,173 @@
+"""
+Server-Sent Events channel for session live preview.
+
+A client opens GET /sessions/<id>/events once per play session and keeps
+it open. Edits still go up through POST /sessions/<id>/ops; after each
+batch the server pushes an "update" event to every open stream with the
+line diff of the code, the new execution plan and a few stats. A new or
+reconnecting stream (and one that fell too far behind) first receives a
+full "snapshot" event.
+
+Streams hold a thread each, so serve them from a threaded server:
+api_server.py, or serve.py, whose request timeout does not apply to
+streamed bodies. If a stream drops anyway (e.g. a worker is recycled),
+the browser's EventSource reconnects and gets a fresh snapshot.
+
+Configuration (environment variables):
+    CODEGEN_SSE_KEEPALIVE        - seconds between keep-alive comments (default: 15)
+    CODEGEN_SSE_MAX_SUBSCRIBERS  - open streams allowed per session (default: 8)
+"""
+
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+import os
+import queue
+import time
+
+from code_diff import line_diff, version_id
+from session_store import HostedSession, SessionNotFound, get_session_store
+import wire
+
+
+SSE_KEEPALIVE = float(os.environ.get("CODEGEN_SSE_KEEPALIVE", 15))
+SSE_MAX_SUBSCRIBERS = int(os.environ.get("CODEGEN_SSE_MAX_SUBSCRIBERS", 8))
+SSE_QUEUE_SIZE = 64
+SSE_RETRY_MS = 2000
+
+# Queued instead of updates when a subscriber falls behind: send a snapshot
+_RESYNC = object()
+
+
+def format_event(event: str, data: Any, event_id: Optional[Any] = None) -> bytes:
+    """Encode one SSE event. The JSON is compact, so it fits on one data: line."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return (head + f"event: {event}\ndata: ").encode("utf-8") + wire.dumps(data) + b"\n\n"
+
+
+class Subscription:
+    """One open event stream: a bounded queue of pending events."""
+
+    def __init__(self):
+        self.queue: "queue.Queue[Any]" = queue.Queue(SSE_QUEUE_SIZE)
+
+    def push(self, event: Any) -> None:
+        """Queue an event; a subscriber that is too far behind gets a resync instead."""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put_nowait(_RESYNC)
+
+
+def subscribe(session: HostedSession) -> Subscription:
+    """
+    Register a new stream on a session.
+
+    Raises:
+        ValueError: If the session already has the maximum number of streams
+    """
+    with session.lock:
+        if len(session.subscribers) >= SSE_MAX_SUBSCRIBERS:
+            raise ValueError(f"Too many open streams (max {SSE_MAX_SUBSCRIBERS})")
+        subscription = Subscription()
+        session.subscribers.append(subscription)
+        return subscription
+
+
+def unsubscribe(session: HostedSession, subscription: Subscription) -> None:
+    """Remove a stream from its session."""
+    with session.lock:
+        if subscription in session.subscribers:
+            session.subscribers.remove(subscription)
+
+
+def _preview_stats(session: HostedSession, started: float) -> Dict[str, Any]:
+    _, plan, timeline = session.gameplay.generator.generate_with_timeline(
+        session.workflow.get_snapshot()
+    )
+    return {
+        "execution_plan": plan,
+        "stats": {
+            "blocks": len(session),
+            "plan_steps": len(timeline),
+            "total_duration": timeline.total_duration,
+            "generation_ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+    }
+
+
+def publish_update(session: HostedSession, changes: List[Dict[str, Any]]) -> None:
+    """
+    Push an "update" event for a batch of applied ops to every open stream.
+    Call with session.lock held. Does nothing when no stream is open.
+
+    Args:
+        session: Session the ops were applied to
+        changes: Per-op changes returned by HostedSession.apply_ops
+    """
+    if not session.subscribers:
+        return
+    started = time.perf_counter()
+    code = session.code()
+    base_code = session.stream_code if session.stream_code is not None else ""
+    event = {
+        "version": session.version,
+        "changes": changes,
+        "code_version": version_id(code),
+        "diff": {
+            "base_version": version_id(base_code),
+            "hunks": line_diff(base_code.split("\n"), code.split("\n"))
+        },
+        **_preview_stats(session, started)
+    }
+    session.stream_code = code
+    for subscription in list(session.subscribers):
+        subscription.push(event)
+
+
+def _snapshot_event(session: HostedSession) -> Tuple[bytes, int]:
+    started = time.perf_counter()
+    with session.lock:
+        snapshot = session.snapshot(include_plan=False)
+        snapshot.update(_preview_stats(session, started))
+        session.stream_code = session.code()
+        return format_event("snapshot", snapshot, session.version), session.version
+
+
+def event_stream(session: HostedSession, subscription: Subscription) -> Iterator[bytes]:
+    """
+    Generate the SSE byte stream for one subscription until the client
+    disconnects or the session expires.
+
+    Args:
+        session: Session being watched
+        subscription: Result of subscribe(session)
+    """
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n".encode("utf-8")
+        snapshot, seen_version = _snapshot_event(session)
+        yield snapshot
+        while True:
+            try:
+                event = subscription.queue.get(timeout=SSE_KEEPALIVE)
+            except queue.Empty:
+                try:
+                    # An open stream counts as activity; stop if the session is gone
+                    get_session_store().get(session.session_id)
+                except SessionNotFound:
+                    yield format_event("closed", {"reason": "Session expired"})
+                    return
+                yield b": keep-alive\n\n"
+                continue
+            if event is _RESYNC:
+                snapshot, seen_version = _snapshot_event(session)
+                yield snapshot
+            elif event["version"] > seen_version:
+                # Updates queued before the last snapshot are already in it
+                seen_version = event["version"]
+                yield format_event("update", event, seen_version)
+    finally:
+        unsubscribe(session, subscription)
@@ -40,6 +40,8 @@ class InteractiveTerminal:
         print("7. Clear Workflow")
         print("8. Remove Last Command")
         print("9. Export Workflow")
+        print("U. Undo Last Edit")
+        print("R. Redo")
         print("L. Change Level (Current: Level {})".format(self.current_level))
         print("0. Exit")
         print("-" * 70)
@@ -359,7 +361,7 @@ class InteractiveTerminal:
             print(code_display['ai_generated'])
         elif mode == 'executable':
             print("Mode: Executable Code (with implementations)\n")
-            sequence = self.session.workflow.get_sequence()
+            sequence = self.session.workflow.get_snapshot()
             code, _ = self.session.generator.generate_from_blocks(sequence, include_implementations=True)
             print(code)
             
@@ -373,7 +375,7 @@ class InteractiveTerminal:
         
     def remove_last_command(self):
         """Remove the last command from workflow."""
-        sequence = self.session.workflow.get_sequence()
+        sequence = self.session.workflow.get_snapshot()
         if sequence:
             last_idx = len(sequence) - 1
             self.session.remove_command_from_workflow(last_idx)
@@ -381,6 +383,20 @@ class InteractiveTerminal:
         else:
             print("\n⚠️  Workflow is empty!")
     
+    def undo_edit(self):
+        """Undo the last change to the workflow."""
+        if self.session.undo()["success"]:
+            print("\n↩️  Undone!")
+        else:
+            print("\n⚠️  Nothing to undo!")
+    
+    def redo_edit(self):
+        """Redo the last undone change."""
+        if self.session.redo()["success"]:
+            print("\n↪️  Redone!")
+        else:
+            print("\n⚠️  Nothing to redo!")
+    
     def change_level(self):
         """Change the current level."""
         print("\n🎯 CHANGE LEVEL:")
@@ -532,6 +548,10 @@ class InteractiveTerminal:
                 self.remove_last_command()
             elif choice == '9':
                 self.export_workflow()
+            elif choice.upper() == 'U':
+                self.undo_edit()
+            elif choice.upper() == 'R':
+                self.redo_edit()
             elif choice.upper() == 'L':
                 self.change_level()
             elif choice == '0':
@@ -0,0 +1,197 @@
+"""
+Immutable sequence with structural sharing (a persistent AVL tree).
+
+A PersistentSequence never changes: append, insert, set and delete
+return a new sequence that shares all but O(log n) tree nodes with the
+old one. Every version stays valid and costs little, so a workflow can
+keep its whole edit history (undo/redo is just swapping versions) and
+hand its current version to readers without copying it.
+
+    seq = PersistentSequence([a, b])
+    seq2 = seq.insert(1, c)      # seq is still [a, b]; seq2 is [a, c, b]
+    seq2[1], len(seq2), list(seq2)
+
+Lookups and edits are O(log n); iteration is O(n).
+"""
+
+from typing import List, Any, Iterable, Iterator, Optional, Tuple
+from collections.abc import Sequence
+
+
+class _Node:
+    """Tree node; never modified after construction."""
+
+    __slots__ = ("left", "value", "right", "height", "size")
+
+    def __init__(self, left: Optional["_Node"], value: Any, right: Optional["_Node"]):
+        self.left = left
+        self.value = value
+        self.right = right
+        self.height = 1 + max(_height(left), _height(right))
+        self.size = 1 + _size(left) + _size(right)
+
+
+def _height(node: Optional[_Node]) -> int:
+    return node.height if node is not None else 0
+
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node is not None else 0
+
+
+def _balance(left: Optional[_Node], value: Any, right: Optional[_Node]) -> _Node:
+    """Join two subtrees (heights differing by at most 2) around a value, rotating if needed."""
+    left_height, right_height = _height(left), _height(right)
+    if left_height > right_height + 1:
+        if _height(left.left) >= _height(left.right):
+            return _Node(left.left, left.value, _Node(left.right, value, right))
+        pivot = left.right
+        return _Node(_Node(left.left, left.value, pivot.left), pivot.value,
+                     _Node(pivot.right, value, right))
+    if right_height > left_height + 1:
+        if _height(right.right) >= _height(right.left):
+            return _Node(_Node(left, value, right.left), right.value, right.right)
+        pivot = right.left
+        return _Node(_Node(left, value, pivot.left), pivot.value,
+                     _Node(pivot.right, right.value, right.right))
+    return _Node(left, value, right)
+
+
+def _build(items: List[Any], low: int, high: int) -> Optional[_Node]:
+    """Perfectly balanced tree of items[low:high]."""
+    if low >= high:
+        return None
+    middle = (low + high) // 2
+    return _Node(_build(items, low, middle), items[middle], _build(items, middle + 1, high))
+
+
+def _get(node: _Node, index: int) -> Any:
+    while True:
+        left_size = _size(node.left)
+        if index < left_size:
+            node = node.left
+        elif index > left_size:
+            index -= left_size + 1
+            node = node.right
+        else:
+            return node.value
+
+
+def _insert(node: Optional[_Node], index: int, value: Any) -> _Node:
+    if node is None:
+        return _Node(None, value, None)
+    left_size = _size(node.left)
+    if index <= left_size:
+        return _balance(_insert(node.left, index, value), node.value, node.right)
+    return _balance(node.left, node.value, _insert(node.right, index - left_size - 1, value))
+
+
+def _set(node: _Node, index: int, value: Any) -> _Node:
+    left_size = _size(node.left)
+    if index < left_size:
+        return _Node(_set(node.left, index, value), node.value, node.right)
+    if index > left_size:
+        return _Node(node.left, node.value, _set(node.right, index - left_size - 1, value))
+    return _Node(node.left, value, node.right)
+
+
+def _pop_first(node: _Node) -> Tuple[Any, Optional[_Node]]:
+    if node.left is None:
+        return node.value, node.right
+    value, left = _pop_first(node.left)
+    return value, _balance(left, node.value, node.right)
+
+
+def _delete(node: _Node, index: int) -> Optional[_Node]:
+    left_size = _size(node.left)
+    if index < left_size:
+        return _balance(_delete(node.left, index), node.value, node.right)
+    if index > left_size:
+        return _balance(node.left, node.value, _delete(node.right, index - left_size - 1))
+    if node.left is None:
+        return node.right
+    if node.right is None:
+        return node.left
+    successor, right = _pop_first(node.right)
+    return _balance(node.left, successor, right)
+
+
+class PersistentSequence(Sequence):
+    """Immutable, structurally shared sequence; edits return new sequences."""
+
+    __slots__ = ("_root",)
+
+    def __init__(self, items: Iterable[Any] = ()):
+        items = list(items)
+        self._root = _build(items, 0, len(items))
+
+    @classmethod
+    def _from_root(cls, root: Optional[_Node]) -> "PersistentSequence":
+        sequence = cls.__new__(cls)
+        sequence._root = root
+        return sequence
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def _position(self, index: int) -> int:
+        size = _size(self._root)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("PersistentSequence index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.to_list()[index]
+        return _get(self._root, self._position(index))
+
+    def __iter__(self) -> Iterator[Any]:
+        stack: List[_Node] = []
+        node = self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.value
+            node = node.right
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, (PersistentSequence, list, tuple)):
+            return NotImplemented
+        if isinstance(other, PersistentSequence) and other._root is self._root:
+            return True
+        return len(other) == len(self) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"PersistentSequence({self.to_list()!r})"
+
+    def __reduce__(self):
+        return (PersistentSequence, (self.to_list(),))
+
+    def append(self, value: Any) -> "PersistentSequence":
+        """New sequence with value added at the end."""
+        return self._from_root(_insert(self._root, _size(self._root), value))
+
+    def insert(self, index: int, value: Any) -> "PersistentSequence":
+        """New sequence with value inserted before index (clamped like list.insert)."""
+        size = _size(self._root)
+        if index < 0:
+            index = max(index + size, 0)
+        return self._from_root(_insert(self._root, min(index, size), value))
+
+    def set(self, index: int, value: Any) -> "PersistentSequence":
+        """New sequence with the item at index replaced."""
+        return self._from_root(_set(self._root, self._position(index), value))
+
+    def delete(self, index: int) -> "PersistentSequence":
+        """New sequence without the item at index."""
+        return self._from_root(_delete(self._root, self._position(index)))
+
+    def to_list(self) -> List[Any]:
+        """The items as a new list."""
+        return list(self)
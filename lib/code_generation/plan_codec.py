@@ -0,0 +1,321 @@
+"""
+Compact binary encoding of /generate-code responses.
+
+The JSON execution_plan repeats string keys and values ("action": "move",
+"direction": "forward", "step": "0_iter3_1") for every item. This format
+stores the plan column by column instead: one-byte action and direction
+enums, float32 magnitudes and durations, int32 loop iterations and step
+IDs as integer paths. Fields that don't fit a column (messages, variable
+values, nested branches, ...) and the rest of the response go into a
+trailing JSON section.
+
+Clients opt in with "Accept: application/vnd.syntax-saga.plan" or the
+query flag ?plan_format=binary. decode_response() is the reference
+decoder and returns the same dictionary as the JSON response;
+decode_columns() stops at the typed arrays, which is all an animation
+loop needs.
+
+Layout (little-endian):
+
+    magic "SSPL" | version u8 | reserved u8 | n u32 | path_len u32 | json_len u32
+    action u8[n] | direction u8[n] | flags u8[n] | path_count u8[n]
+    magnitude f32[n] | duration f32[n] | loop_iteration i32[n]
+    path u32[path_len]                 tag << 29 | value, see STEP_TAGS
+    json (json_len bytes)              {"meta": {...}, "extras": {"<i>": {...}}}
+
+Actions and directions not in the enums are stored as 255 with the
+string in extras.
+"""
+
+from typing import Dict, List, Any, Optional, Tuple
+from array import array
+import struct
+import sys
+
+import wire
+
+
+BINARY_MIME = "application/vnd.syntax-saga.plan"
+FORMAT_VERSION = 1
+
+ACTIONS = ["move", "rotate", "jump", "pick_object", "print", "variable",
+           "wait", "unknown", "conditional", "function_definition"]
+DIRECTIONS = [None, "forward", "backward", "left", "right"]
+OTHER = 255
+
+# Plan key stored in the magnitude column, per action
+MAGNITUDE_KEYS = {"move": "distance", "rotate": "degrees", "jump": "height"}
+
+# Step ID tokens: "3" -> (INDEX, 3), "iter2" -> (ITER, 2), "if"/"else"/"func" -> (tag, 0)
+STEP_TAGS = {"index": 0, "iter": 1, "if": 2, "else": 3, "func": 4}
+_TAG_NAMES = {tag: name for name, tag in STEP_TAGS.items()}
+_VALUE_MASK = (1 << 29) - 1
+
+# flags bits
+F_MAGNITUDE = 1
+F_MAGNITUDE_INT = 2
+F_DURATION = 4
+F_DURATION_INT = 8
+F_STEP_PATH = 16
+F_LOOP_ITERATION = 32
+# Set only by older encoders, whose plans carried "branches" (if_branch +
+# else_branch) on conditionals; still rebuilt on decode
+F_BRANCHES_JOINED = 64
+
+_HEADER = struct.Struct("<4sBBIII")
+_MAGIC = b"SSPL"
+_ACTION_CODES = {name: code for code, name in enumerate(ACTIONS)}
+_DIRECTION_CODES = {name: code for code, name in enumerate(DIRECTIONS)}
+_COLUMN_KEYS = {"step", "action", "direction", "duration", "loop_iteration"}
+
+
+def wants_binary(accept: Optional[str], plan_format: Optional[str] = None) -> bool:
+    """True if the client asked for the binary format (Accept header or query flag)."""
+    return plan_format == "binary" or (accept is not None and BINARY_MIME in accept)
+
+
+def _little_endian(column: array) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _float32_exact(value: Any) -> bool:
+    """True if a number survives a float32 round trip unchanged."""
+    if not _is_number(value):
+        return False
+    try:
+        return struct.unpack("<f", struct.pack("<f", value))[0] == value
+    except OverflowError:
+        return False
+
+
+def _step_path(step: Any) -> Optional[List[int]]:
+    """Integer path of a step ID, or None if it doesn't follow the ID grammar."""
+    if isinstance(step, int) and not isinstance(step, bool):
+        return [step] if 0 <= step <= _VALUE_MASK else None
+    if not isinstance(step, str) or not step:
+        return None
+    path = []
+    for token in step.split("_"):
+        if token.isdigit():
+            tag, value = STEP_TAGS["index"], int(token)
+        elif token.startswith("iter") and token[4:].isdigit():
+            tag, value = STEP_TAGS["iter"], int(token[4:])
+        elif token in ("if", "else", "func"):
+            tag, value = STEP_TAGS[token], 0
+        else:
+            return None
+        if value > _VALUE_MASK:
+            return None
+        path.append(tag << 29 | value)
+    if len(path) == 1 and path[0] >> 29 == STEP_TAGS["index"]:
+        return None  # a bare numeric string; keep it a string via extras
+    return path if len(path) <= 255 else None
+
+
+def _step_id(path: List[int]) -> Any:
+    if len(path) == 1 and path[0] >> 29 == STEP_TAGS["index"]:
+        return path[0]
+    tokens = []
+    for element in path:
+        name, value = _TAG_NAMES[element >> 29], element & _VALUE_MASK
+        tokens.append(str(value) if name == "index" else f"iter{value}" if name == "iter" else name)
+    return "_".join(tokens)
+
+
+def encode_plan(plan: List[Dict[str, Any]], meta: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    Encode an execution plan (and optional response metadata).
+
+    Args:
+        plan: Execution plan items
+        meta: Other response fields, stored in the JSON section
+
+    Returns:
+        Encoded bytes
+    """
+    n = len(plan)
+    actions, directions, flags, path_counts = array("B"), array("B"), array("B"), array("B")
+    magnitudes, durations, iterations = array("f"), array("f"), array("i")
+    paths = array("I")
+    extras: Dict[str, Dict[str, Any]] = {}
+
+    for i, item in enumerate(plan):
+        extra = {key: value for key, value in item.items() if key not in _COLUMN_KEYS}
+        item_flags = 0
+
+        action = item.get("action")
+        code = _ACTION_CODES.get(action, OTHER)
+        actions.append(code)
+        if code == OTHER and "action" in item:
+            extra["action"] = action
+
+        direction = item.get("direction")
+        code = _DIRECTION_CODES.get(direction, OTHER) if direction is None or isinstance(direction, str) else OTHER
+        directions.append(code)
+        if code == OTHER or (direction is None and "direction" in item):
+            extra["direction"] = direction
+
+        magnitude_key = MAGNITUDE_KEYS.get(action)
+        magnitude = item.get(magnitude_key) if magnitude_key else None
+        if magnitude_key in extra and _float32_exact(magnitude):
+            del extra[magnitude_key]
+            item_flags |= F_MAGNITUDE | (F_MAGNITUDE_INT if isinstance(magnitude, int) else 0)
+            magnitudes.append(magnitude)
+        else:
+            magnitudes.append(0.0)
+
+        duration = item.get("duration")
+        if _float32_exact(duration):
+            item_flags |= F_DURATION | (F_DURATION_INT if isinstance(duration, int) else 0)
+            durations.append(duration)
+        else:
+            durations.append(0.0)
+            if "duration" in item:
+                extra["duration"] = duration
+
+        iteration = item.get("loop_iteration")
+        if isinstance(iteration, int) and not isinstance(iteration, bool) and -2**31 <= iteration < 2**31:
+            item_flags |= F_LOOP_ITERATION
+            iterations.append(iteration)
+        else:
+            iterations.append(0)
+            if "loop_iteration" in item:
+                extra["loop_iteration"] = iteration
+
+        path = _step_path(item.get("step"))
+        if path is not None:
+            item_flags |= F_STEP_PATH
+            path_counts.append(len(path))
+            paths.extend(path)
+        else:
+            path_counts.append(0)
+            if "step" in item:
+                extra["step"] = item["step"]
+
+        flags.append(item_flags)
+        if extra:
+            extras[str(i)] = extra
+
+    tail = wire.dumps({"meta": meta or {}, "extras": extras})
+    return b"".join([
+        _HEADER.pack(_MAGIC, FORMAT_VERSION, 0, n, len(paths), len(tail)),
+        _little_endian(actions), _little_endian(directions),
+        _little_endian(flags), _little_endian(path_counts),
+        _little_endian(magnitudes), _little_endian(durations), _little_endian(iterations),
+        _little_endian(paths),
+        tail
+    ])
+
+
+def decode_columns(data: bytes) -> Dict[str, Any]:
+    """
+    Split encoded bytes into typed column arrays without building plan dicts.
+    This is the fast path for clients that animate straight from columns.
+
+    Args:
+        data: Bytes from encode_plan
+
+    Returns:
+        {"count", "action", "direction", "flags", "path_count", "magnitude",
+         "duration", "loop_iteration", "path", "extras", "meta"}
+
+    Raises:
+        ValueError: If the data is not in this format
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated plan header")
+    magic, version, _, n, path_len, json_len = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Not a version 1 binary plan")
+
+    offset = _HEADER.size
+    columns: Dict[str, Any] = {"count": n}
+    for name, typecode, count in (("action", "B", n), ("direction", "B", n), ("flags", "B", n),
+                                  ("path_count", "B", n), ("magnitude", "f", n), ("duration", "f", n),
+                                  ("loop_iteration", "i", n), ("path", "I", path_len)):
+        size = array(typecode).itemsize * count
+        if offset + size > len(data):
+            raise ValueError("Truncated plan data")
+        columns[name] = _from_little_endian(typecode, data[offset:offset + size])
+        offset += size
+    tail = wire.loads(data[offset:offset + json_len])
+    columns["extras"] = tail["extras"]
+    columns["meta"] = tail["meta"]
+    return columns
+
+
+def decode_plan(data: bytes) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Reference decoder: rebuild the plan dictionaries.
+
+    Args:
+        data: Bytes from encode_plan
+
+    Returns:
+        Tuple of (execution plan, metadata)
+
+    Raises:
+        ValueError: If the data is not in this format
+    """
+    columns = decode_columns(data)
+    actions, directions, flags = columns["action"], columns["direction"], columns["flags"]
+    magnitudes, durations, iterations = columns["magnitude"], columns["duration"], columns["loop_iteration"]
+    path_counts, paths, extras = columns["path_count"], columns["path"], columns["extras"]
+
+    plan = []
+    path_offset = 0
+    for i in range(columns["count"]):
+        item_flags = flags[i]
+        item: Dict[str, Any] = {}
+
+        if item_flags & F_STEP_PATH:
+            count = path_counts[i]
+            item["step"] = _step_id(paths[path_offset:path_offset + count])
+            path_offset += count
+        if actions[i] != OTHER:
+            item["action"] = ACTIONS[actions[i]]
+        if directions[i] not in (OTHER, 0):
+            item["direction"] = DIRECTIONS[directions[i]]
+        if item_flags & F_MAGNITUDE:
+            value = magnitudes[i]
+            item[MAGNITUDE_KEYS[item["action"]]] = int(value) if item_flags & F_MAGNITUDE_INT else value
+        if item_flags & F_DURATION:
+            value = durations[i]
+            item["duration"] = int(value) if item_flags & F_DURATION_INT else value
+        extra = extras.get(str(i))
+        if extra:
+            item.update(extra)
+        if item_flags & F_BRANCHES_JOINED:
+            item["branches"] = item["if_branch"] + item["else_branch"]
+        if item_flags & F_LOOP_ITERATION:
+            item["loop_iteration"] = iterations[i]
+        plan.append(item)
+
+    return plan, columns["meta"]
+
+
+def encode_response(payload: Dict[str, Any]) -> bytes:
+    """Encode a /generate-code response, plan in columns and the rest as metadata."""
+    meta = {key: value for key, value in payload.items() if key != "execution_plan"}
+    return encode_plan(payload.get("execution_plan", []), meta)
+
+
+def decode_response(data: bytes) -> Dict[str, Any]:
+    """Decode encode_response output back to the JSON response dictionary."""
+    plan, meta = decode_plan(data)
+    return {**meta, "execution_plan": plan}
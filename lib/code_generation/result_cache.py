@@ -0,0 +1,304 @@
+"""
+Two-level cache of generation and simulation results.
+
+Results are keyed by (kind, level, mode, program hash): e.g. the code and
+execution plan /generate-code produced for a program in preview or
+executable mode, or a simulation outcome on a level. Every process keeps
+a small in-memory LRU (L1). Behind it, if CODEGEN_RESULT_CACHE names a
+file, a SQLite database in WAL mode (L2) is shared by all worker
+processes and survives restarts, so new and recycled workers start warm.
+
+The L1 is bounded by entry count and by the serialized size of its
+values; a value larger than a quarter of that budget is not kept in
+memory at all, so a few huge plans cannot pin hundreds of megabytes per
+worker. The L2 is bounded by total size; the least recently used entries are
+evicted first, and entries idle for longer than the TTL are dropped.
+Keys include RESULT_SCHEMA_VERSION and a hash of every source that
+shapes a result (request expansion, validation, generation, simulation
+and the service layer that assembles the cached payloads), so a new
+release never serves results of the old code. Bump RESULT_SCHEMA_VERSION
+when the cached shape changes for reasons outside those files. Kinds in
+UNVERSIONED_KINDS (AI answers, which are paid for and depend on the
+model and prompt rather than on this code) are kept across releases.
+Kinds in VOLATILE_KINDS (AI job statuses) skip L1, so a status written
+by one worker is what every other worker reads.
+
+Cached values are shared between requests; treat them as read-only.
+
+Configuration (environment variables):
+    CODEGEN_RESULT_CACHE         - SQLite file for the shared cache (default: unset, L1 only)
+    CODEGEN_RESULT_CACHE_MB      - size bound of the SQLite cache (default: 256)
+    CODEGEN_RESULT_CACHE_TTL     - seconds an unused entry is kept (default: 604800, a week)
+    CODEGEN_RESULT_L1_ENTRIES    - results kept in memory per process (default: 512)
+    CODEGEN_RESULT_L1_MB         - serialized size bound of the in-memory cache (default: 64)
+"""
+
+from typing import Dict, List, Any, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import wire
+
+
+CACHE_PATH = os.environ.get("CODEGEN_RESULT_CACHE") or None
+CACHE_MAX_BYTES = int(float(os.environ.get("CODEGEN_RESULT_CACHE_MB", 256)) * 1024 * 1024)
+CACHE_TTL = float(os.environ.get("CODEGEN_RESULT_CACHE_TTL", 7 * 24 * 3600))
+L1_ENTRIES = int(os.environ.get("CODEGEN_RESULT_L1_ENTRIES", 512))
+L1_MAX_BYTES = int(float(os.environ.get("CODEGEN_RESULT_L1_MB", 64)) * 1024 * 1024)
+
+# Values larger than this (compressed) are not worth a disk round trip
+MAX_ENTRY_BYTES = 4 * 1024 * 1024
+# Check the size bound after this many writes
+MAINTENANCE_INTERVAL = 64
+# Refresh an entry's access time at most this often (seconds)
+TOUCH_INTERVAL = 60
+
+# Bump when the shape of cached values changes
+RESULT_SCHEMA_VERSION = 2
+
+_SOURCE_FILES = (
+    "block_input.py",
+    "validation.py",
+    "interning.py",
+    "code_generator.py",
+    "simulator.py",
+    "conditions.py",
+    "fingerprint.py",
+    "service.py",
+)
+
+# Kinds whose values do not depend on this code: they carry their own
+# version in the key (e.g. "ai": backend/model id and prompt version) and
+# survive deploys
+UNVERSIONED_KINDS = frozenset(["ai", "ai_job"])
+# Kinds that are rewritten after being stored (e.g. a job's status): never
+# kept in L1, so every read sees the latest value written by any process
+VOLATILE_KINDS = frozenset(["ai_job"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+"""
+
+
+def _code_version() -> str:
+    """Hash of the sources that determine results (part of every key)."""
+    digest = hashlib.sha256(f"schema:{RESULT_SCHEMA_VERSION}".encode("utf-8"))
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in _SOURCE_FILES:
+        try:
+            with open(os.path.join(here, name), "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(name.encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+CODE_VERSION = _code_version()
+
+
+def program_hash(blocks: List[Any]) -> str:
+    """
+    Exact hash of a block list (unlike fingerprint(), equivalent but
+    differently written programs hash differently, as their code differs).
+    """
+    return hashlib.sha256(wire.dumps_sorted(blocks)).hexdigest()[:32]
+
+
+class ResultCache:
+    """
+    In-process LRU in front of an optional SQLite store.
+    SQLite errors never fail a request; the cache just misses.
+    """
+
+    def __init__(self, path: Optional[str] = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES,
+                 ttl: float = CACHE_TTL, l1_entries: int = L1_ENTRIES,
+                 l1_max_bytes: int = L1_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.l1_entries = l1_entries
+        self.l1_max_bytes = l1_max_bytes
+        # key -> (value, serialized size)
+        self._l1: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._l1_bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.errors = 0
+
+    @property
+    def shared(self) -> bool:
+        """True if values are visible to other processes (an L2 is configured)."""
+        return self.path is not None
+
+    @staticmethod
+    def key(kind: str, level: Any, mode: str, program: str) -> str:
+        version = "-" if kind in UNVERSIONED_KINDS else CODE_VERSION
+        return f"{version}:{kind}:{level}:{mode}:{program}"
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """This thread's connection (reopened after a fork)."""
+        if self.path is None:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _remember(self, key: str, value: Any, size: int) -> None:
+        """Keep a value in L1 unless it is too large; size is its serialized length."""
+        if size > self.l1_max_bytes // 4:
+            return
+        with self._lock:
+            previous = self._l1.pop(key, None)
+            if previous is not None:
+                self._l1_bytes -= previous[1]
+            self._l1[key] = (value, size)
+            self._l1_bytes += size
+            while len(self._l1) > self.l1_entries or self._l1_bytes > self.l1_max_bytes:
+                _, (_, evicted_size) = self._l1.popitem(last=False)
+                self._l1_bytes -= evicted_size
+
+    def get(self, kind: str, level: Any, mode: str, program: str) -> Optional[Any]:
+        """
+        Look a result up in L1, then in SQLite.
+
+        Args:
+            kind: What was computed ("generate", "simulate", "grade")
+            level: Level number
+            mode: Variant of the computation (e.g. "preview" or "executable")
+            program: Program hash (see program_hash) or fingerprint
+
+        Returns:
+            The cached value, or None
+        """
+        key = self.key(kind, level, mode, program)
+        volatile = kind in VOLATILE_KINDS
+        with self._lock:
+            entry = None if volatile else self._l1.get(key)
+            if entry is not None:
+                self._l1.move_to_end(key)
+                self.l1_hits += 1
+                return entry[0]
+        value = None
+        size = 0
+        try:
+            conn = self._connection()
+            row = None
+            if conn is not None:
+                row = conn.execute("SELECT value, accessed FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                raw = zlib.decompress(row[0])
+                size = len(raw)
+                value = wire.loads(raw)
+                now = time.time()
+                if now - row[1] > TOUCH_INTERVAL:
+                    conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        except (sqlite3.Error, OSError, ValueError, zlib.error):
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.l2_hits += 1
+        if not volatile:
+            self._remember(key, value, size)
+        return value
+
+    def put(self, kind: str, level: Any, mode: str, program: str, value: Any) -> None:
+        """Store a JSON-serializable result in both levels."""
+        key = self.key(kind, level, mode, program)
+        raw = wire.dumps(value)
+        if kind not in VOLATILE_KINDS:
+            self._remember(key, value, len(raw))
+        try:
+            conn = self._connection()
+            if conn is None:
+                return
+            blob = zlib.compress(raw, 1)
+            if len(blob) > MAX_ENTRY_BYTES:
+                return
+            conn.execute("INSERT OR REPLACE INTO results (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                         (key, blob, len(blob), time.time()))
+            with self._lock:
+                self._writes += 1
+                due = self._writes % MAINTENANCE_INTERVAL == 0
+            if due:
+                self._maintain(conn)
+        except (sqlite3.Error, OSError):
+            self.errors += 1
+
+    def _maintain(self, conn: sqlite3.Connection) -> None:
+        """Drop idle entries, then evict least recently used ones down to 90% of the bound."""
+        cursor = conn.execute("DELETE FROM results WHERE accessed < ?", (time.time() - self.ttl,))
+        self.evicted += max(cursor.rowcount, 0)
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY accessed"):
+            if total <= target:
+                break
+            victims.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM results WHERE key = ?", victims)
+        self.evicted += len(victims)
+
+    def clear(self) -> None:
+        """Empty both levels."""
+        with self._lock:
+            self._l1.clear()
+            self._l1_bytes = 0
+        conn = self._connection()
+        if conn is not None:
+            conn.execute("DELETE FROM results")
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring."""
+        return {
+            "path": self.path,
+            "l1_entries": len(self._l1),
+            "l1_bytes": self._l1_bytes,
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "errors": self.errors
+        }
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Get the process-wide result cache (created on first use)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
@@ -0,0 +1,128 @@
+"""
+Priority classes for server work.
+
+Requests are sorted into three classes, highest priority first:
+
+    interactive - live preview: /generate-code, sessions, hints, timeline
+    grading     - grading, batch and executable-mode generation
+    background  - AI-mode generation and other deferred jobs
+
+Each class gets its own share of worker slots, so heavy work can never
+take the slots interactive requests need. Long jobs call yield_point()
+between chunks of work; it pauses them while a higher class has requests
+running or waiting, which makes them cooperatively preemptible.
+
+Configuration (environment variables):
+    CODEGEN_SCHED_SLOTS         - worker slots shared by all classes (default: 2 x CPU count, at least 6)
+    CODEGEN_SHARE_INTERACTIVE   - fraction of slots for interactive work (default: 0.5)
+    CODEGEN_SHARE_GRADING       - fraction of slots for grading/batch (default: 0.35)
+    CODEGEN_SHARE_BACKGROUND    - fraction of slots for background jobs (default: 0.15)
+    CODEGEN_MAX_PREEMPT_MS      - longest a job is paused at one yield point (default: 2000)
+"""
+
+from typing import Dict, Any, Optional
+import os
+import threading
+import time
+
+from admission import MAX_QUEUE, AdmissionController
+
+
+INTERACTIVE = "interactive"
+GRADING = "grading"
+BACKGROUND = "background"
+
+# Highest priority first
+PRIORITY_CLASSES = (INTERACTIVE, GRADING, BACKGROUND)
+
+SCHED_SLOTS = int(os.environ.get("CODEGEN_SCHED_SLOTS", max(6, 2 * (os.cpu_count() or 1))))
+CLASS_SHARES = {
+    INTERACTIVE: float(os.environ.get("CODEGEN_SHARE_INTERACTIVE", 0.5)),
+    GRADING: float(os.environ.get("CODEGEN_SHARE_GRADING", 0.35)),
+    BACKGROUND: float(os.environ.get("CODEGEN_SHARE_BACKGROUND", 0.15)),
+}
+MAX_PREEMPT = float(os.environ.get("CODEGEN_MAX_PREEMPT_MS", 2000)) / 1000
+
+
+class PriorityScheduler:
+    """
+    One admission gate per priority class, sized by the class's share,
+    plus yield points that let lower classes step aside.
+    """
+
+    def __init__(self, slots: int = SCHED_SLOTS, shares: Optional[Dict[str, float]] = None,
+                 max_queue: int = MAX_QUEUE):
+        shares = shares or CLASS_SHARES
+        self.gates = {
+            priority: AdmissionController(priority, max(1, round(slots * shares[priority])), max_queue)
+            for priority in PRIORITY_CLASSES
+        }
+        self._changed = threading.Condition()
+
+    def gate(self, priority: str) -> AdmissionController:
+        """
+        Admission gate of a priority class.
+
+        Raises:
+            ValueError: If the class is unknown
+        """
+        if priority not in self.gates:
+            raise ValueError(f"Unknown priority class: {priority!r}")
+        return self.gates[priority]
+
+    def acquire(self, priority: str, deadline: float) -> None:
+        """Take a slot in a class (see AdmissionController.acquire)."""
+        self.gate(priority).acquire(deadline)
+
+    def release(self, priority: str, elapsed: Optional[float] = None) -> None:
+        """Free a slot in a class and wake paused lower-priority jobs."""
+        self.gate(priority).release(elapsed)
+        with self._changed:
+            self._changed.notify_all()
+
+    def higher_priority_busy(self, priority: str) -> bool:
+        """True if any class above this one has requests running or queued."""
+        for other in PRIORITY_CLASSES[:PRIORITY_CLASSES.index(priority)]:
+            gate = self.gates[other]
+            if gate.in_flight or gate.queued:
+                return True
+        return False
+
+    def yield_point(self, priority: str, max_pause: float = MAX_PREEMPT) -> float:
+        """
+        Pause a long job while higher-priority work is pending.
+        Call between chunks of work.
+
+        Args:
+            priority: Class of the calling job
+            max_pause: Give up waiting after this many seconds
+
+        Returns:
+            Seconds spent paused
+        """
+        started = time.monotonic()
+        deadline = started + max_pause
+        with self._changed:
+            while self.higher_priority_busy(priority):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(min(remaining, 0.05))
+        return time.monotonic() - started
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-class gate counters."""
+        return {priority: gate.stats() for priority, gate in self.gates.items()}
+
+
+_scheduler: Optional[PriorityScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> PriorityScheduler:
+    """Get the process-wide scheduler (created on first use)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PriorityScheduler()
+        return _scheduler
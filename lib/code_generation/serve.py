@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Production server for the Code Generator API (POSIX only).
+
+A master process opens the listening socket, loads the Flask app once
+and prefork-spawns worker processes that all accept on the shared socket.
+Each worker serves requests on threads (at most --threads at once), so a
+slow request or an open event stream does not block the others. Workers
+are recycled after a number of requests, and the master keeps the worker
+count constant.
+
+A request that runs longer than --timeout cannot be interrupted on its
+thread; the worker stops accepting, lets its other requests finish
+(up to --graceful-timeout) and exits, and the master starts a new one.
+The timeout covers producing a response, not sending its body, so
+streaming responses (Server-Sent Events) stay open as long as the client
+listens; each holds one of the worker's threads meanwhile.
+
+Overload is shed, not queued: a worker with all its threads busy still
+accepts connections but answers them at once with 503 + Retry-After,
+and the listen backlog is sized to one connection per thread of all
+workers (--backlog), so the kernel does not hold an unbounded queue.
+Within a worker, api_server.py's admission control and scheduler limit
+each endpoint and priority class (their limits are per worker).
+
+Per-process state: sessions (session_store.py), their live-preview
+streams and edit coalescing, and each worker's admission and scheduler
+queues live in one worker's memory. Requests are not routed to a
+particular worker, so with more than one worker api_server.py refuses
+the session routes (503); run --workers 1 and scale with --threads.
+
+Usage:
+    python3 serve.py --workers 4 --threads 64 --port 5000
+
+Signals (sent to the master):
+    SIGHUP           - graceful restart: start fresh workers, retire the old ones
+    SIGTERM / SIGINT - graceful shutdown: let in-flight requests finish
+
+Configuration (flags override environment variables):
+    CODEGEN_HOST, CODEGEN_PORT, CODEGEN_WORKERS, CODEGEN_THREADS (default: 64),
+    CODEGEN_TIMEOUT, CODEGEN_MAX_REQUESTS, CODEGEN_GRACEFUL_TIMEOUT
+
+The worker count is exported to the workers as CODEGEN_SERVER_WORKERS.
+"""
+
+from typing import Dict, Optional
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+import argparse
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler that only logs when access logging is enabled."""
+
+    access_log = False
+
+    def log_message(self, format, *args):
+        if self.access_log:
+            super().log_message(format, *args)
+
+
+class PreforkWSGIServer(ThreadingMixIn, WSGIServer):
+    """
+    Threaded WSGI server bound to a socket inherited from the master process.
+    Counts open connections (one thread each) and tracks when each app call
+    started, so the worker can spot overruns; a streamed body is sent after
+    the app call returns and is not timed. Connections beyond
+    max_connections are answered with 503 on the accepting thread.
+    """
+
+    daemon_threads = True
+    block_on_close = False
+    request_timeout = 30
+    max_connections = 64
+    retry_after = 1
+
+    def __init__(self, listen_socket: socket.socket, app):
+        super().__init__(listen_socket.getsockname()[:2], QuietRequestHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = listen_socket
+        host, port = listen_socket.getsockname()[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.setup_environ()
+        self.set_app(app)
+        self.timeout = 1.0  # wake up regularly to check for shutdown
+        self.handled = 0
+        self.connections = 0
+        self.rejected = 0
+        # Thread ident -> monotonic start time of its app call
+        self._started: Dict[int, float] = {}
+        self._started_lock = threading.Lock()
+
+    def set_app(self, application):
+        def timed_app(environ, start_response):
+            ident = threading.get_ident()
+            with self._started_lock:
+                self._started[ident] = time.monotonic()
+            try:
+                return application(environ, start_response)
+            finally:
+                with self._started_lock:
+                    self._started.pop(ident, None)
+
+        super().set_app(timed_app)
+
+    def process_request(self, request, client_address):
+        with self._started_lock:
+            full = self.connections >= self.max_connections
+            if not full:
+                self.connections += 1
+        if full:
+            self.reject(request)
+            return
+        self.handled += 1
+        request.settimeout(self.request_timeout)
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            with self._started_lock:
+                self.connections -= 1
+            raise
+
+    def reject(self, request: socket.socket) -> None:
+        """Answer a connection with 503 + Retry-After without handing it to a thread."""
+        body = b'{"success": false, "error": "Server is at capacity; try again shortly"}'
+        try:
+            request.settimeout(0.05)
+            try:
+                request.recv(64 * 1024)  # read the request so closing doesn't reset the connection
+            except OSError:
+                pass
+            request.sendall(
+                b"HTTP/1.1 503 Service Unavailable\r\n"
+                b"Content-Type: application/json\r\n"
+                + f"Retry-After: {self.retry_after}\r\nContent-Length: {len(body)}\r\n".encode("ascii")
+                + b"Connection: close\r\n\r\n" + body
+            )
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+        self.rejected += 1
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self._started_lock:
+                self.connections -= 1
+
+    def in_flight(self, now: float, overdue: bool = False) -> int:
+        """App calls running now; with overdue=True, only those past the timeout."""
+        with self._started_lock:
+            return sum(1 for started in self._started.values()
+                       if not overdue or now - started > self.request_timeout)
+
+
+class Worker:
+    """Worker process loop: accept and serve until recycled or told to stop."""
+
+    def __init__(self, listen_socket: socket.socket, app, max_requests: int, timeout: int,
+                 threads: int = 64, graceful_timeout: int = 30):
+        self.server = PreforkWSGIServer(listen_socket, app)
+        self.server.request_timeout = timeout
+        self.server.max_connections = max(1, threads)
+        self.max_requests = max_requests
+        self.graceful_timeout = graceful_timeout
+        self.running = True
+
+    def _on_stop(self, signum, frame):
+        self.running = False
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        parent = os.getppid()
+        while self.running and (self.max_requests <= 0 or self.server.handled < self.max_requests):
+            if os.getppid() != parent:
+                break  # master died
+            if self.server.in_flight(time.monotonic(), overdue=True):
+                print(f"⏱️ Worker {os.getpid()}: a request exceeded {self.server.request_timeout}s; recycling",
+                      file=sys.stderr)
+                break
+            # Returns after accepting one connection, or after server.timeout with none
+            self.server.handle_request()
+        self.drain()
+
+    def drain(self) -> None:
+        """Wait for in-flight app calls (not overdue ones or open streams) before the process exits."""
+        deadline = time.monotonic() + self.graceful_timeout
+        while time.monotonic() < deadline:
+            now = time.monotonic()
+            if self.server.in_flight(now) <= self.server.in_flight(now, overdue=True):
+                return
+            time.sleep(0.05)
+
+
+class Master:
+    """
+    Prefork master: owns the listening socket and supervises workers.
+    """
+
+    def __init__(self, app, host: str, port: int, workers: int, timeout: int,
+                 max_requests: int, max_requests_jitter: int, graceful_timeout: int,
+                 backlog: Optional[int] = None, threads: int = 64):
+        self.app = app
+        self.workers = workers
+        self.threads = threads
+        self.timeout = timeout
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.children: Dict[int, float] = {}  # pid -> start time
+        self.running = True
+        self.restart_requested = False
+
+        self.socket = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((host, port))
+        # One pending connection per thread of all workers; beyond that, shed
+        self.socket.listen(backlog if backlog is not None else max(64, workers * threads))
+        # Non-blocking so a worker that loses the accept race just loops
+        self.socket.setblocking(False)
+
+    def spawn_worker(self) -> Optional[int]:
+        """Fork one worker process."""
+        # Jitter keeps workers from all recycling at the same moment
+        max_requests = self.max_requests
+        if max_requests > 0 and self.max_requests_jitter > 0:
+            max_requests += random.randint(0, self.max_requests_jitter)
+
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                Worker(self.socket, self.app, max_requests, self.timeout,
+                       self.threads, self.graceful_timeout).run()
+            except Exception as e:
+                print(f"❌ Worker {os.getpid()} crashed: {e}", file=sys.stderr)
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = time.time()
+        return pid
+
+    def _on_stop(self, signum, frame):
+        self.running = False
+
+    def _on_restart(self, signum, frame):
+        self.restart_requested = True
+
+    def reap(self) -> None:
+        """Collect exited workers."""
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.children.pop(pid, None)
+
+    def stop_workers(self, pids) -> None:
+        """Ask workers to finish their request and exit; kill them after the grace period."""
+        pids = list(pids)
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.time() + self.graceful_timeout
+        while time.time() < deadline and any(pid in self.children for pid in pids):
+            self.reap()
+            time.sleep(0.1)
+        for pid in pids:
+            if pid in self.children:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+        self.reap()
+
+    def run(self) -> None:
+        """Supervise workers until asked to stop."""
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_restart)
+
+        for _ in range(self.workers):
+            self.spawn_worker()
+
+        while self.running:
+            self.reap()
+            if self.restart_requested:
+                self.restart_requested = False
+                old = list(self.children)
+                for _ in range(self.workers):
+                    self.spawn_worker()
+                self.stop_workers(old)
+            # Replace recycled or crashed workers
+            while len(self.children) < self.workers and self.running:
+                self.spawn_worker()
+            time.sleep(0.2)
+
+        self.stop_workers(list(self.children))
+        self.socket.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefork production server for the Code Generator API")
+    parser.add_argument("--host", default=os.environ.get("CODEGEN_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("CODEGEN_PORT", 5000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("CODEGEN_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("CODEGEN_THREADS", 64)),
+                        help="requests each worker serves at once")
+    parser.add_argument("--backlog", type=int, default=None,
+                        help="listen backlog (default: workers x threads, at least 64)")
+    parser.add_argument("--timeout", type=int, default=int(os.environ.get("CODEGEN_TIMEOUT", 30)),
+                        help="seconds a single request may take before its worker is recycled")
+    parser.add_argument("--max-requests", type=int, default=int(os.environ.get("CODEGEN_MAX_REQUESTS", 10000)),
+                        help="recycle a worker after this many requests (0 = never)")
+    parser.add_argument("--max-requests-jitter", type=int, default=1000)
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.environ.get("CODEGEN_GRACEFUL_TIMEOUT", 30)))
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    # Lets per-process pools (batch.py) split the cores between the workers
+    os.environ["CODEGEN_SERVER_WORKERS"] = str(max(1, args.workers))
+
+    # Load the app (and warm shared caches) once, before forking
+    from api_server import app
+    from level_solver import precompute_all
+    precompute_all()
+
+    QuietRequestHandler.access_log = args.access_log
+    master = Master(app, args.host, args.port, args.workers, args.timeout,
+                    args.max_requests, args.max_requests_jitter, args.graceful_timeout,
+                    backlog=args.backlog, threads=args.threads)
+    print(f"🚀 Serving on http://{args.host}:{args.port} with {args.workers} workers "
+          f"x {args.threads} threads (pid {os.getpid()})")
+    if args.workers > 1:
+        print("⚠️  Session routes are disabled with more than one worker (use --workers 1 for sessions)")
+    master.run()
+
+
+if __name__ == "__main__":
+    main()
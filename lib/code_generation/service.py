@@ -0,0 +1,383 @@
+"""
+Framework-free request handlers for the core Code Generator API routes.
+
+Both HTTP front ends (api_server.py on Flask, stdlib_server.py on the
+standard library) call these functions, so they share one contract:
+each handler returns a (payload, status_code) tuple.
+"""
+
+from typing import Dict, List, Any, Tuple, Optional
+import hashlib
+import json
+
+from admission import Rejected
+from block_input import StreamingRequestParser, expand_blocks
+from code_diff import get_version_ring
+from code_generator import CodeGenerator, GameplaySession
+from fingerprint import fingerprint
+from result_cache import get_result_cache, program_hash
+from simulator import HEADING_NAMES, simulate_plan
+from validation import ValidationError, check_blocks, check_plan_steps, get_validator, parse_level
+import wire
+
+
+Response = Tuple[Dict[str, Any], int]
+RawResponse = Tuple[bytes, int, Dict[str, str]]
+
+# Levels whose /available-commands payload is serialized once at startup
+PRECOMPUTED_LEVELS = (1, 2, 3, 4)
+COMMANDS_CACHE_CONTROL = "public, max-age=86400"
+
+TEST_LOOP_BLOCKS = [
+    {
+        "type": "loop",
+        "params": {
+            "iterations": 4,
+            "body": [
+                {"type": "move_forward", "params": {"distance": 1}},
+                {"type": "turn_right", "params": {"degrees": 90}}
+            ]
+        }
+    }
+]
+
+
+def generate_code(data: Any) -> Response:
+    """
+    Generate code from a /generate-code request body.
+
+    Args:
+        data: Parsed JSON body ({"blocks": [...], "level": n}); blocks may
+            use the compact array form (see block_input.py). With
+            "base_version", the code is returned as a line diff against
+            that version when it is still known (remembered per
+            "client_id", if given; see code_diff.py); "include_plan": false
+            leaves out the execution plan (code-only preview)
+
+    Returns:
+        Tuple of (response payload, HTTP status); 422 with "violations"
+        if the blocks fail validation for the level (see validation.py)
+    """
+    try:
+        if not isinstance(data, dict):
+            return {'success': False, 'error': 'Request body must be a JSON object'}, 400
+        blocks = expand_blocks(data.get('blocks', []))
+
+        if not blocks:
+            return {'success': False, 'error': 'No blocks provided'}, 400
+        level = check_blocks(blocks, data.get('level', 1))
+
+        mode = _generation_mode(data)
+        program = program_hash(blocks)
+        cache = get_result_cache()
+        result = cache.get('generate', level, mode, program)
+        if result is None:
+            generator = CodeGenerator()
+            program_lines, execution_plan = generator.generate_program(blocks)
+            result = _generation_result(generator, program_lines, execution_plan, blocks, mode)
+            cache.put('generate', level, mode, program, result)
+        return _generate_code_payload(result, data), 200
+
+    except ValidationError as e:
+        return e.to_dict(), 422
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}, 400
+    except Exception as e:
+        return {'success': False, 'error': str(e)}, 500
+
+
+def generate_code_stream(stream) -> Response:
+    """
+    Generate code from a /generate-code body read incrementally from a stream.
+    Blocks are validated and generated as they are parsed; other fields may
+    come before or after "blocks". Generation stops at the first invalid
+    block. If "level" comes after "blocks", level availability can only be
+    checked once the body has been read.
+
+    Args:
+        stream: Binary file-like object positioned at the start of the body
+
+    Returns:
+        Tuple of (response payload, HTTP status)
+    """
+    try:
+        parser = StreamingRequestParser(stream)
+        blocks: List[Dict[str, Any]] = []
+        violations: List[Dict[str, str]] = []
+        validators = []
+
+        def parsed_blocks():
+            steps = 0
+            for index, block in enumerate(parser.blocks()):
+                if not validators:
+                    # Level-agnostic checks until the level is known
+                    level = parser.fields.get('level')
+                    validators.append(get_validator(None if level is None else parse_level(level)))
+                steps += validators[0].check_block(block, f"blocks[{index}]", violations)
+                if not violations:
+                    check_plan_steps(steps, "blocks", violations)
+                blocks.append(block)  # kept for the fingerprint
+                if not violations:
+                    yield block
+
+        generator = CodeGenerator()
+        program_lines, execution_plan = generator.generate_program(parsed_blocks())
+
+        if not blocks:
+            return {'success': False, 'error': 'No blocks provided'}, 400
+        level = parse_level(parser.fields.get('level', 1))
+        if not violations and validators[0].level is None:
+            violations = get_validator(level).validate(blocks)
+        if violations:
+            raise ValidationError(violations)
+
+        mode = _generation_mode(parser.fields)
+        result = _generation_result(generator, program_lines, execution_plan, blocks, mode)
+        get_result_cache().put('generate', level, mode, program_hash(blocks), result)
+        return _generate_code_payload(result, parser.fields), 200
+
+    except ValidationError as e:
+        return e.to_dict(), 422
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}, 400
+    except Exception as e:
+        return {'success': False, 'error': str(e)}, 500
+
+
+def generate_ai_code(data: Any) -> Response:
+    """
+    Start AI generation for a /generate-code/ai request body and answer
+    with the template code right away.
+
+    Args:
+        data: Parsed JSON body, as for generate_code
+
+    Returns:
+        Tuple of (response payload, HTTP status): the generate_code payload
+        plus the job's "job_id" and "status" (and "ai_code" if it was
+        cached); 202 while the job is pending, 200 once it is done
+
+    Raises:
+        Rejected: If no more AI jobs can be queued
+    """
+    # Imported on first use: it pulls in the job and HTTP backend machinery,
+    # which the stdlib server's cold start doesn't need
+    from ai_jobs import get_ai_jobs
+
+    if isinstance(data, dict):
+        data = {**data, 'blocks': expand_blocks(data.get('blocks', []))}
+    payload, status = generate_code(data)
+    if status != 200:
+        return payload, status
+    try:
+        job = get_ai_jobs().submit(data['blocks'])
+    except Rejected:
+        raise
+    except Exception as e:
+        return {'success': False, 'error': str(e)}, 500
+    payload.update(job.to_dict())
+    return payload, 200 if job.finished.is_set() else 202
+
+
+def ai_job(job_id: str) -> Response:
+    """
+    Status of an AI generation job.
+
+    Returns:
+        Tuple of (response payload, HTTP status); 404 if the job is unknown
+        or expired
+    """
+    from ai_jobs import get_ai_jobs
+
+    job = get_ai_jobs().get(job_id)
+    if job is None:
+        return {'success': False, 'error': 'Job not found or expired'}, 404
+    return {'success': True, **job.to_dict()}, 200
+
+
+def _generation_mode(options: Dict[str, Any]) -> str:
+    return 'executable' if options.get('include_implementations', False) else 'preview'
+
+
+def _generation_result(generator: CodeGenerator, program_lines: List[str],
+                       execution_plan: List[Dict[str, Any]], blocks: List[Dict[str, Any]],
+                       mode: str) -> Dict[str, Any]:
+    """The cacheable part of a /generate-code response."""
+    return {
+        'code': generator.assemble_code(program_lines, include_implementations=mode == 'executable'),
+        'execution_plan': execution_plan,
+        'fingerprint': fingerprint(blocks)
+    }
+
+
+def _generate_code_payload(result: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    ring = get_version_ring(options.get('client_id'))
+    payload = {
+        'success': True,
+        **ring.code_payload(result['code'], options.get('base_version')),
+        'execution_plan': result['execution_plan'],
+        'level': options.get('level', 1),
+        'fingerprint': result['fingerprint']
+    }
+    if options.get('include_plan') is False:
+        del payload['execution_plan']
+    return payload
+
+
+def available_commands(level_arg: Any) -> Response:
+    """
+    List the commands available at a level.
+
+    Args:
+        level_arg: Level from the query string (defaults to 1)
+
+    Returns:
+        Tuple of (response payload, HTTP status)
+    """
+    try:
+        level = int(level_arg if level_arg is not None else 1)
+
+        session = GameplaySession(current_level=level)
+        commands = session.get_available_commands_for_level(level)
+
+        return {'success': True, 'level': level, 'commands': commands}, 200
+
+    except Exception as e:
+        return {'success': False, 'error': str(e)}, 500
+
+
+def _serialize_with_etag(payload: Dict[str, Any]) -> Tuple[bytes, str]:
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _precompute_available_commands() -> Dict[int, Tuple[bytes, str]]:
+    precomputed = {}
+    for level in PRECOMPUTED_LEVELS:
+        payload, _ = available_commands(level)
+        precomputed[level] = _serialize_with_etag(payload)
+    return precomputed
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag. Tags of the same
+    body in any content coding (wire.coded_etag) match too.
+
+    Args:
+        if_none_match: Raw header value (may list several tags, or be "*")
+        etag: Current strong ETag of the identity body, quoted
+
+    Returns:
+        True if the client's cached copy is still current
+    """
+    if not if_none_match:
+        return False
+    current = {etag} | {wire.coded_etag(etag, encoding) for encoding in wire.SUPPORTED_ENCODINGS}
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag in current:
+            return True
+    return False
+
+
+def available_commands_response(level_arg: Any, if_none_match: Optional[str] = None,
+                                accept_encoding: Optional[str] = None) -> RawResponse:
+    """
+    Serve /available-commands from the bytes precomputed at startup.
+
+    Args:
+        level_arg: Level from the query string (defaults to 1)
+        if_none_match: If-None-Match request header, if any
+        accept_encoding: Accept-Encoding request header, if any; picks the
+            ETag a 304 carries (the servers compress a 200 themselves)
+
+    Returns:
+        Tuple of (body bytes, HTTP status, extra headers); 304 with an
+        empty body when the client's ETag is current
+    """
+    try:
+        level = int(level_arg if level_arg is not None else 1)
+    except (TypeError, ValueError):
+        body, _ = _serialize_with_etag({'success': False, 'error': f'Invalid level: {level_arg!r}'})
+        return body, 400, {}
+
+    cached = _AVAILABLE_COMMANDS.get(level)
+    if cached is None:
+        payload, status = available_commands(level)
+        body, etag = _serialize_with_etag(payload)
+        if status != 200:
+            return body, status, {}
+    else:
+        body, etag = cached
+
+    headers = {"ETag": etag, "Cache-Control": COMMANDS_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, etag):
+        headers["ETag"] = wire.coded_etag(etag, wire.body_encoding(body, accept_encoding))
+        return b"", 304, headers
+    return body, 200, headers
+
+
+def simulate(data: Any) -> Response:
+    """
+    Run a program on a level's tile map.
+
+    Args:
+        data: {"blocks": [...], "level": n}
+
+    Returns:
+        Tuple of (response payload with the final state, HTTP status)
+    """
+    try:
+        if not isinstance(data, dict):
+            return {'success': False, 'error': 'Request body must be a JSON object'}, 400
+        blocks = expand_blocks(data.get('blocks', []))
+        level = check_blocks(blocks, data.get('level', 1))
+        program = program_hash(blocks)
+        cache = get_result_cache()
+        state = cache.get('simulate', level, 'state', program)
+        if state is None:
+            _, execution_plan = CodeGenerator().generate_from_blocks(blocks)
+            state = simulate_plan(execution_plan, level)
+            cache.put('simulate', level, 'state', program, state)
+
+        return {
+            'success': True,
+            'level': level,
+            **state,
+            'heading': HEADING_NAMES[state['heading']]
+        }, 200
+
+    except ValidationError as e:
+        return e.to_dict(), 422
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}, 400
+    except Exception as e:
+        return {'success': False, 'error': str(e)}, 500
+
+
+def health() -> Response:
+    """Health check payload."""
+    return {
+        'status': 'healthy',
+        'service': 'code-generator-api',
+        'version': '1.0'
+    }, 200
+
+
+def test_loop() -> Response:
+    """Generate the square-path loop example (checks the generator end to end)."""
+    generator = CodeGenerator()
+    code, _ = generator.generate_from_blocks(TEST_LOOP_BLOCKS, include_implementations=False)
+
+    return {
+        'success': True,
+        'example': 'Square path loop',
+        'blocks': TEST_LOOP_BLOCKS,
+        'code': code
+    }, 200
+
+
+_AVAILABLE_COMMANDS = _precompute_available_commands()
@@ -0,0 +1,423 @@
+"""
+Server-side gameplay sessions for incremental live preview.
+
+Instead of reposting the whole block list on every edit, the editor
+creates a session once and then sends small delta operations (add,
+insert, remove, move, update). Each session keeps the generated code
+fragment of every top-level block, so an edit only regenerates the
+blocks it touches and the response only carries what changed.
+
+Sessions live in process memory, bounded by an LRU limit and an idle
+TTL. Requests are not routed to a particular serve.py worker, so
+api_server.py refuses the session routes (503) when serve.py runs more
+than one; run serve.py --workers 1 and scale it with --threads.
+
+With CODEGEN_JOURNAL_DIR set, every applied batch of ops is appended to
+the session's journal (journal.py) and sessions are restored from it when
+the store is created, so a restart keeps open sessions.
+
+Configuration (environment variables):
+    CODEGEN_MAX_SESSIONS        - sessions kept before LRU eviction (default: 1000)
+    CODEGEN_SESSION_TTL         - idle seconds before a session expires (default: 1800)
+    CODEGEN_SESSION_MAX_BLOCKS  - top-level blocks allowed per session (default: 2000)
+    CODEGEN_SESSION_VERSIONS    - code versions kept per session for diffs (default: 4)
+"""
+
+from typing import Dict, List, Any, Optional, Tuple
+from collections import OrderedDict
+import os
+import secrets
+import threading
+import time
+import weakref
+
+from code_diff import VersionRing
+from code_generator import CODE_HEADER_LINES, GameplaySession
+from interning import intern_block
+from journal import JOURNAL_DIR, SessionJournal
+from validation import ValidationError, check_blocks, check_plan_steps, get_validator
+
+
+MAX_SESSIONS = int(os.environ.get("CODEGEN_MAX_SESSIONS", 1000))
+SESSION_TTL = float(os.environ.get("CODEGEN_SESSION_TTL", 1800))
+SESSION_MAX_BLOCKS = int(os.environ.get("CODEGEN_SESSION_MAX_BLOCKS", 2000))
+SESSION_VERSIONS = int(os.environ.get("CODEGEN_SESSION_VERSIONS", 4))
+
+# Matches the framing generate_from_blocks puts around the main program
+_PREVIEW_HEADER = list(CODE_HEADER_LINES) + ["", "# Main program", ""]
+
+OPS = ("add", "insert", "remove", "move", "update")
+
+# Code fragment of each interned block, shared by all sessions
+_fragments: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+_fragments_lock = threading.Lock()
+
+
+class SessionNotFound(KeyError):
+    """Raised when a session ID is unknown or has expired."""
+
+
+class HostedSession:
+    """
+    A GameplaySession plus the generated code fragment of each top-level block.
+    Fragments are kept parallel to the workflow sequence.
+    
+    Blocks are interned (interning.py), so the workflow holds references to
+    immutable blocks shared with every other session, and a block's fragment
+    is generated once per process.
+    """
+
+    def __init__(self, session_id: str, level: int = 1):
+        self.session_id = session_id
+        # Edits arrive as ops and are journaled; no undo history is kept here
+        self.gameplay = GameplaySession(current_level=level, max_history=0)
+        self.fragments: List[str] = []
+        self.version = 0
+        self.plan_steps = 0  # expanded plan size of the whole program (validation.py)
+        self.last_access = time.monotonic()
+        self.lock = threading.Lock()
+        self.code_versions = VersionRing(SESSION_VERSIONS)
+        # Open live-preview streams and the code they last received (live_preview.py)
+        self.subscribers: List[Any] = []
+        self.stream_code: Optional[str] = None
+        self.coalescer: Optional[Any] = None  # coalesce.EditCoalescer, created on first edit
+        self.journal: Optional[SessionJournal] = None
+        self._generator = self.gameplay.generator
+        self._code: Optional[str] = None
+
+    @property
+    def workflow(self):
+        return self.gameplay.workflow
+
+    def __len__(self) -> int:
+        return len(self.fragments)
+
+    def _block_steps(self, index: int) -> int:
+        """Plan steps of the (already validated) block at an index."""
+        return get_validator(self.gameplay.get_level()).check_block(self.workflow.get_command(index), "block", [])
+
+    def _prepare(self, block: Dict[str, Any], replaced_steps: int = 0) -> Tuple[Dict[str, Any], str, int]:
+        """
+        Validate and intern a block; get its (shared) code fragment.
+
+        Args:
+            block: The new block
+            replaced_steps: Plan steps of the block it replaces, if any
+
+        Returns:
+            (interned block, code fragment, plan steps of the block)
+        """
+        violations = []
+        steps = get_validator(self.gameplay.get_level()).check_block(block, "block", violations)
+        if not violations:
+            check_plan_steps(self.plan_steps - replaced_steps + steps, "block", violations)
+        if violations:
+            raise ValidationError(violations)
+        block = intern_block(block)
+        with _fragments_lock:
+            code = _fragments.get(block)
+        if code is None:
+            code = self._generator.generate_code_for_single_command(block)
+            with _fragments_lock:
+                _fragments[block] = code
+        return block, code, steps
+
+    def _check_index(self, index: Any, upper: int) -> int:
+        if not isinstance(index, int) or isinstance(index, bool) or not 0 <= index < upper:
+            raise ValueError(f"Index out of range: {index!r}")
+        return index
+
+    def _check_capacity(self) -> None:
+        if len(self.fragments) >= SESSION_MAX_BLOCKS:
+            raise ValueError(f"Session is full (max {SESSION_MAX_BLOCKS} blocks)")
+
+    def apply_op(self, op: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Apply one delta operation through the workflow's edit methods.
+
+        Args:
+            op: {"op": "add", "block": {...}}
+                {"op": "insert", "index": i, "block": {...}}
+                {"op": "remove", "index": i}
+                {"op": "move", "from": i, "to": j}
+                {"op": "update", "index": i, "block": {...}}
+
+        Returns:
+            What changed: the op, affected index and (for new blocks) its code
+
+        Raises:
+            ValueError: Unknown op, bad index, or session full
+            ValidationError: If the block is invalid at the session's level
+        """
+        if not isinstance(op, dict):
+            raise ValueError("Each op must be an object")
+        kind = op.get("op")
+        size = len(self.fragments)
+
+        if kind == "add":
+            self._check_capacity()
+            block, code, steps = self._prepare(op.get("block"))
+            index = self.workflow.add_command(block)
+            self.fragments.append(code)
+            self.plan_steps += steps
+            change = {"op": kind, "index": index, "code": code}
+        elif kind == "insert":
+            self._check_capacity()
+            index = self._check_index(op.get("index"), size + 1)
+            block, code, steps = self._prepare(op.get("block"))
+            self.workflow.insert_command(index, block)
+            self.fragments.insert(index, code)
+            self.plan_steps += steps
+            change = {"op": kind, "index": index, "code": code}
+        elif kind == "remove":
+            index = self._check_index(op.get("index"), size)
+            self.plan_steps -= self._block_steps(index)
+            self.workflow.remove_command(index)
+            self.fragments.pop(index)
+            change = {"op": kind, "index": index}
+        elif kind == "move":
+            from_index = self._check_index(op.get("from"), size)
+            to_index = self._check_index(op.get("to"), size)
+            self.workflow.move_command(from_index, to_index)
+            self.fragments.insert(to_index, self.fragments.pop(from_index))
+            change = {"op": kind, "from": from_index, "to": to_index}
+        elif kind == "update":
+            index = self._check_index(op.get("index"), size)
+            replaced_steps = self._block_steps(index)
+            block, code, steps = self._prepare(op.get("block"), replaced_steps)
+            self.workflow.update_command(index, block)
+            self.fragments[index] = code
+            self.plan_steps += steps - replaced_steps
+            change = {"op": kind, "index": index, "code": code}
+        else:
+            raise ValueError(f"Unknown op: {kind!r} (expected one of {', '.join(OPS)})")
+
+        self._code = None
+        return change
+
+    def apply_ops(self, ops: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Apply a list of ops in order and bump the version.
+        Ops before a failing op stay applied (and are journaled).
+
+        Returns:
+            List of per-op changes
+        """
+        changes = []
+        try:
+            for index, op in enumerate(ops):
+                try:
+                    changes.append(self.apply_op(op))
+                except ValidationError as e:
+                    raise ValidationError([{**violation, "path": f"ops[{index}].{violation['path']}"}
+                                           for violation in e.violations]) from None
+            return changes
+        finally:
+            self.version += 1
+            if changes and self.journal is not None:
+                if self.journal.append(self.session_id, self.version, ops[:len(changes)]):
+                    self.journal.snapshot(self.state())
+
+    def state(self) -> Dict[str, Any]:
+        """Level, version and blocks: what the journal needs to restore the session."""
+        return {
+            "session_id": self.session_id,
+            "level": self.gameplay.get_level(),
+            "version": self.version,
+            "blocks": self.workflow.get_snapshot()
+        }
+
+    def code(self) -> str:
+        """Full live-preview code, assembled from the cached fragments."""
+        if self._code is None:
+            self._code = "\n".join(_PREVIEW_HEADER + self.fragments)
+        return self._code
+
+    def snapshot(self, include_plan: bool = True, base_version: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Full session state.
+
+        Args:
+            include_plan: Also regenerate the execution plan (O(program))
+            base_version: Code version the client last saw; if still known,
+                the code is sent as a line diff against it
+        """
+        snapshot = {
+            "session_id": self.session_id,
+            "version": self.version,
+            "level": self.gameplay.get_level(),
+            "blocks": self.workflow.get_sequence()
+        }
+        code = self.code_versions.code_payload(self.code(), base_version)
+        snapshot["code_version"] = code.pop("version")
+        snapshot.update(code)
+        if include_plan:
+            _, snapshot["execution_plan"] = self._generator.generate_from_blocks(
+                self.workflow.get_snapshot(), include_implementations=False
+            )
+        return snapshot
+
+
+class SessionStore:
+    """
+    Thread-safe session registry with LRU eviction and idle expiry.
+    The OrderedDict is kept in access order, so expired sessions are
+    always at the front.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl: float = SESSION_TTL,
+                 journal: Optional[SessionJournal] = None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.journal = journal
+        self._sessions: "OrderedDict[str, HostedSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.expired = 0
+        self.quarantined = 0
+        self.skipped_ops = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _expire(self, now: float) -> None:
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_access < self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self._forget(session.session_id)
+            self.expired += 1
+
+    def _forget(self, session_id: str) -> None:
+        if self.journal is not None:
+            self.journal.delete(session_id)
+
+    def _admit(self, session: HostedSession, now: float) -> None:
+        """Register a session, evicting the least recently used if full (store lock held)."""
+        self._expire(now)
+        while len(self._sessions) >= self.max_sessions:
+            _, evicted = self._sessions.popitem(last=False)
+            self._forget(evicted.session_id)
+            self.evicted += 1
+        session.last_access = now
+        self._sessions[session.session_id] = session
+
+    def create(self, level: int = 1, blocks: Optional[List[Dict[str, Any]]] = None) -> HostedSession:
+        """
+        Create a session, optionally seeded with a block list.
+
+        Raises:
+            ValidationError: If the level or the seed blocks are invalid
+        """
+        level = check_blocks(blocks or [], level)
+        session = HostedSession(secrets.token_urlsafe(16), level=level)
+        if blocks:
+            session.apply_ops([{"op": "add", "block": block} for block in blocks])
+        if self.journal is not None:
+            session.journal = self.journal
+            self.journal.snapshot(session.state())
+
+        with self._lock:
+            self._admit(session, time.monotonic())
+        return session
+
+    def recover(self) -> int:
+        """
+        Restore every session in the journal: load its snapshot and replay
+        the ops recorded after it.
+
+        A snapshot that no longer loads (e.g. its blocks fail a tightened
+        validation rule) is quarantined and the session is not restored.
+        Ops that no longer apply are skipped and counted in skipped_ops;
+        the session is restored without them and its original files are
+        quarantined before the replayed state is compacted, so nothing is
+        lost.
+
+        Returns:
+            Number of sessions restored
+        """
+        if self.journal is None:
+            return 0
+        restored = 0
+        for state, records in self.journal.load_all():
+            session_id = state.get("session_id", "") if isinstance(state, dict) else ""
+            try:
+                session = HostedSession(state["session_id"], level=state.get("level", 1))
+                for block in state.get("blocks", []):
+                    session.apply_op({"op": "add", "block": block})
+                session.version = state.get("version", 0)
+            except (KeyError, TypeError, AttributeError, ValueError):
+                if session_id:
+                    self.journal.quarantine(session_id)
+                self.quarantined += 1
+                continue
+            skipped = 0
+            for record in records:
+                for op in record.get("ops", []):
+                    try:
+                        session.apply_op(op)
+                    except ValueError:
+                        skipped += 1
+                session.version = record.get("v", session.version)
+            session.journal = self.journal
+            if skipped:
+                self.skipped_ops += skipped
+                self.journal.quarantine(session.session_id)  # keep the full record
+            if records:
+                self.journal.snapshot(session.state())  # compact what was replayed
+            with self._lock:
+                self._admit(session, time.monotonic())
+            restored += 1
+        return restored
+
+    def get(self, session_id: str) -> HostedSession:
+        """
+        Look up a live session and mark it as recently used.
+
+        Raises:
+            SessionNotFound: If the session is unknown or expired
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise SessionNotFound(session_id)
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        """Drop a session. Returns False if it did not exist."""
+        with self._lock:
+            existed = self._sessions.pop(session_id, None) is not None
+        if existed:
+            self._forget(session_id)
+        return existed
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring."""
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "ttl": self.ttl,
+            "evicted": self.evicted,
+            "expired": self.expired,
+            "quarantined": self.quarantined,
+            "skipped_ops": self.skipped_ops
+        }
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Get the process-wide session store (created on first use)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore(journal=SessionJournal(JOURNAL_DIR) if JOURNAL_DIR else None)
+            _store.recover()
+        return _store
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Unix-domain-socket RPC sidecar for callers on the same host.
+
+Serves the generator's operations without TCP, HTTP parsing or CORS:
+each message is a 4-byte big-endian length followed by a JSON body.
+Connections are persistent, and a client may pipeline several requests
+before reading the replies, which come back in the same order.
+
+Request:  {"id": 1, "method": "generate", "params": {"blocks": [...], "level": 2}}
+Response: {"id": 1, "status": 200, "result": {...}}
+
+Methods: generate, available_commands, simulate, health
+(the same handlers and payloads as the HTTP API, see service.py).
+
+Usage:
+    python3 sidecar.py serve --socket /tmp/codegen.sock
+    python3 sidecar.py bench --socket /tmp/codegen.sock --requests 5000
+"""
+
+from typing import Dict, List, Any, Optional, Tuple
+import argparse
+import os
+import socket
+import socketserver
+import statistics
+import struct
+import tempfile
+import threading
+import time
+
+import service
+import wire
+
+
+SOCKET_PATH = os.environ.get("CODEGEN_SOCKET", "/tmp/codegen.sock")
+MAX_FRAME_BYTES = int(os.environ.get("CODEGEN_MAX_BODY_BYTES", 10 * 1024 * 1024))
+
+_HEADER = struct.Struct("!I")
+
+METHODS = {
+    "generate": service.generate_code,
+    "available_commands": lambda params: service.available_commands((params or {}).get("level")),
+    "simulate": service.simulate,
+    "health": lambda params: service.health(),
+}
+
+
+class FrameError(Exception):
+    """Raised on a malformed or oversized frame."""
+
+
+def encode_frame(message: Any) -> bytes:
+    """Length-prefix a JSON message."""
+    body = wire.dumps(message)
+    return _HEADER.pack(len(body)) + body
+
+
+def read_frame(stream) -> Optional[Any]:
+    """
+    Read one message from a binary file-like stream.
+
+    Returns:
+        The decoded message, or None at a clean end of stream
+
+    Raises:
+        FrameError: On a truncated or oversized frame
+    """
+    header = stream.read(_HEADER.size)
+    if not header:
+        return None
+    if len(header) < _HEADER.size:
+        raise FrameError("Truncated frame header")
+    (length,) = _HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise FrameError(f"Frame too large ({length} bytes)")
+    body = stream.read(length)
+    if len(body) < length:
+        raise FrameError("Truncated frame body")
+    return wire.loads(body)
+
+
+def dispatch(message: Any) -> Dict[str, Any]:
+    """Run one request message and build its response message."""
+    if not isinstance(message, dict):
+        return {"id": None, "status": 400, "result": {"success": False, "error": "Request must be an object"}}
+    handler = METHODS.get(message.get("method"))
+    if handler is None:
+        result, status = {"success": False, "error": f"Unknown method: {message.get('method')!r}"}, 404
+    else:
+        try:
+            result, status = handler(message.get("params"))
+        except Exception as e:
+            result, status = {"success": False, "error": str(e)}, 500
+    return {"id": message.get("id"), "status": status, "result": result}
+
+
+class SidecarHandler(socketserver.StreamRequestHandler):
+    """Serves frames on one persistent connection, in order."""
+
+    def handle(self):
+        while True:
+            try:
+                message = read_frame(self.rfile)
+            except (FrameError, ValueError) as e:
+                # The stream can't be resynchronized; report and hang up
+                self.wfile.write(encode_frame({"id": None, "status": 400,
+                                               "result": {"success": False, "error": str(e)}}))
+                return
+            if message is None:
+                return
+            self.wfile.write(encode_frame(dispatch(message)))
+
+
+class SidecarServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(path: str = SOCKET_PATH) -> SidecarServer:
+    """Bind the sidecar on a Unix socket, replacing a stale socket file."""
+    if os.path.exists(path):
+        os.unlink(path)
+    server = SidecarServer(path, SidecarHandler)
+    os.chmod(path, 0o660)
+    return server
+
+
+class SidecarClient:
+    """
+    Persistent client for the sidecar.
+
+        with SidecarClient("/tmp/codegen.sock") as client:
+            result, status = client.call("generate", {"blocks": blocks, "level": 2})
+    """
+
+    def __init__(self, path: str = SOCKET_PATH, timeout: Optional[float] = None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self._rfile = self.sock.makefile("rb")
+        self._next_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self._rfile.close()
+        self.sock.close()
+
+    def _frame(self, method: str, params: Optional[Dict[str, Any]]) -> bytes:
+        self._next_id += 1
+        return encode_frame({"id": self._next_id, "method": method, "params": params})
+
+    def _reply(self) -> Tuple[Dict[str, Any], int]:
+        message = read_frame(self._rfile)
+        if message is None:
+            raise ConnectionError("Sidecar closed the connection")
+        return message["result"], message["status"]
+
+    def call(self, method: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], int]:
+        """Send one request and wait for its (result, status)."""
+        self.sock.sendall(self._frame(method, params))
+        return self._reply()
+
+    def pipeline(self, calls: List[Tuple[str, Optional[Dict[str, Any]]]]) -> List[Tuple[Dict[str, Any], int]]:
+        """Send several requests without waiting, then read all replies in order."""
+        payload = b"".join(self._frame(method, params) for method, params in calls)
+        # Write from another thread: a long pipeline would otherwise fill both
+        # socket buffers while nobody reads the replies
+        writer = threading.Thread(target=self.sock.sendall, args=(payload,), daemon=True)
+        writer.start()
+        replies = [self._reply() for _ in calls]
+        writer.join()
+        return replies
+
+
+def _bench(path: str, requests: int) -> None:
+    blocks = service.TEST_LOOP_BLOCKS
+    with SidecarClient(path) as client:
+        for method, params in (("health", None), ("generate", {"blocks": blocks, "level": 4})):
+            client.call(method, params)  # warm up
+            timings = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                client.call(method, params)
+                timings.append(time.perf_counter() - started)
+            print(f"  {method:<10} median {statistics.median(timings) * 1e6:8.1f} µs   "
+                  f"p99 {sorted(timings)[int(len(timings) * 0.99) - 1] * 1e6:8.1f} µs")
+
+            started = time.perf_counter()
+            client.pipeline([(method, params)] * requests)
+            per_call = (time.perf_counter() - started) / requests
+            print(f"  {method:<10} pipelined {per_call * 1e6:8.1f} µs/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Unix-socket RPC sidecar for the Code Generator")
+    parser.add_argument("command", choices=["serve", "bench"])
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = make_server(args.socket)
+        print(f"🚀 Sidecar listening on unix:{args.socket}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            os.unlink(args.socket)
+        return
+
+    print("=" * 70)
+    print(f"⏱  Sidecar round trips over unix:{args.socket} ({args.requests} calls)")
+    print("=" * 70)
+    if os.path.exists(args.socket):
+        _bench(args.socket, args.requests)
+        return
+    # Nothing listening: benchmark against an in-process server
+    path = os.path.join(tempfile.mkdtemp(), "codegen.sock")
+    server = make_server(path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        _bench(path, args.requests)
+    finally:
+        server.shutdown()
+        server.server_close()
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
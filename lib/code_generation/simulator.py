@@ -0,0 +1,298 @@
+"""
+Grid simulator for the Syntax Saga levels.
+Replays an execution plan (as produced by CodeGenerator) on a tile map
+so the server can tell where the seahorse ends up without running the
+generated Python code.
+
+Each level is a grid abstraction of its 3D scene: one tile per forward
+step (4.5 world units in the frontend), four headings, and a list of
+goals (coins, keys, finish tiles) that are collected by entering them.
+"""
+
+from typing import Dict, List, Any, Tuple, Optional, Iterable
+import json
+import hashlib
+
+from conditions import ConditionError, evaluate_condition
+
+
+# Headings, clockwise starting from the frontend's rotation 0 (facing +X)
+EAST = 0
+SOUTH = 1
+WEST = 2
+NORTH = 3
+
+HEADING_NAMES = ["east", "south", "west", "north"]
+
+# (dcol, drow) for each heading
+HEADING_DELTAS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+
+# A pose is (col, row, heading)
+Pose = Tuple[int, int, int]
+Tile = Tuple[int, int]
+
+
+def _rect(min_col: int, max_col: int, min_row: int, max_row: int) -> List[Tile]:
+    """Return every tile in an inclusive rectangle."""
+    return [(c, r) for c in range(min_col, max_col + 1) for r in range(min_row, max_row + 1)]
+
+
+class LevelMap:
+    """
+    Tile map for a single level.
+    Holds the walkable tiles, the start pose, the goals and any doors
+    that stay closed until a given goal (usually a key) is collected.
+    """
+
+    def __init__(self, level: int, name: str, tiles: Iterable[Tile], start: Pose,
+                 goals: List[Tuple[str, Tile]], doors: Optional[Dict[Tile, str]] = None):
+        self.level = level
+        self.name = name
+        self.tiles = frozenset(tiles)
+        self.start = start
+        self.goals = list(goals)
+        self.goal_names = [goal_name for goal_name, _ in self.goals]
+        self.goal_tiles = {tile: goal_name for goal_name, tile in self.goals}
+        self.doors = dict(doors or {})
+
+    def is_walkable(self, tile: Tile, collected: Iterable[str] = ()) -> bool:
+        """
+        Check whether the seahorse may stand on a tile.
+
+        Args:
+            tile: (col, row) to check
+            collected: Names of goals collected so far (opens matching doors)
+
+        Returns:
+            True if the tile is on the path and not behind a closed door
+        """
+        if tile not in self.tiles:
+            return False
+        key = self.doors.get(tile)
+        return key is None or key in collected
+
+    def goal_tile(self, goal_name: str) -> Optional[Tile]:
+        """Get the tile of a goal by name."""
+        for name, tile in self.goals:
+            if name == goal_name:
+                return tile
+        return None
+
+    def fingerprint(self) -> str:
+        """Stable hash of the map definition (used to key on-disk caches)."""
+        payload = json.dumps({
+            "level": self.level,
+            "tiles": sorted(self.tiles),
+            "start": self.start,
+            "goals": self.goals,
+            "doors": sorted([list(tile), key] for tile, key in self.doors.items())
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# Grid abstractions of the four level scenes in app/game/
+LEVEL_MAPS: Dict[int, LevelMap] = {
+    # Level 1: open platform, finish three tiles ahead of the start
+    1: LevelMap(
+        level=1,
+        name="First Steps",
+        tiles=_rect(-1, 3, -1, 2),
+        start=(0, 0, EAST),
+        goals=[("finish", (3, 0))]
+    ),
+    # Level 2: three tiles forward, turn right, one more tile; coin on tile 3
+    2: LevelMap(
+        level=2,
+        name="Coin Path",
+        tiles=[(0, 0), (1, 0), (2, 0), (3, 0), (3, 1)],
+        start=(0, 0, EAST),
+        goals=[("coin", (2, 0)), ("finish", (3, 1))]
+    ),
+    # Level 3: fetch the key from the side corridor, then go through the door
+    3: LevelMap(
+        level=3,
+        name="Key & Door",
+        tiles=[(0, 0), (1, 0), (2, 0), (2, -1), (2, -2), (3, 0), (4, 0)],
+        start=(0, 0, EAST),
+        goals=[("key", (2, -2)), ("finish", (4, 0))],
+        doors={(3, 0): "key"}
+    ),
+    # Level 4: collect all three coins on the open platform
+    4: LevelMap(
+        level=4,
+        name="Coin Loop",
+        tiles=_rect(0, 6, 0, 2),
+        start=(0, 0, EAST),
+        goals=[("coin_1", (3, 0)), ("coin_2", (6, 0)), ("coin_3", (3, 2))]
+    ),
+}
+
+
+def get_level_map(level: int) -> Optional[LevelMap]:
+    """Get the tile map for a level, or None if the level has no map."""
+    return LEVEL_MAPS.get(level)
+
+
+def turn(heading: int, quarter_turns: int) -> int:
+    """Rotate a heading clockwise by a number of quarter turns."""
+    return (heading + quarter_turns) % 4
+
+
+def quarter_turns(degrees: Any) -> int:
+    """Convert a degree amount to whole quarter turns."""
+    try:
+        return int(round(float(degrees) / 90.0))
+    except (TypeError, ValueError):
+        return 1
+
+
+def new_state(level_map: LevelMap, pose: Optional[Pose] = None) -> Dict[str, Any]:
+    """
+    Create a fresh simulation state.
+
+    Args:
+        level_map: Level being simulated
+        pose: Optional starting pose (defaults to the level's start)
+
+    Returns:
+        Mutable simulation state dictionary
+    """
+    col, row, heading = pose if pose is not None else level_map.start
+    return {
+        "col": col,
+        "row": row,
+        "heading": heading,
+        "collected": [],
+        "inventory": [],
+        "messages": [],
+        "steps": 0,
+        "failed": None,
+        "completed": False
+    }
+
+
+def _enter_tile(level_map: LevelMap, state: Dict[str, Any]) -> None:
+    """Collect the goal on the current tile, if any."""
+    goal_name = level_map.goal_tiles.get((state["col"], state["row"]))
+    if goal_name and goal_name not in state["collected"]:
+        state["collected"].append(goal_name)
+        if len(state["collected"]) == len(level_map.goals):
+            state["completed"] = True
+
+
+def _move(level_map: LevelMap, state: Dict[str, Any], distance: Any, direction: str) -> None:
+    """Move tile by tile, stopping on the first tile that is off the path."""
+    try:
+        tiles = int(round(float(distance)))
+    except (TypeError, ValueError):
+        tiles = 1
+    sign = -1 if direction == "backward" else 1
+    if tiles < 0:
+        tiles, sign = -tiles, -sign
+    dcol, drow = HEADING_DELTAS[state["heading"]]
+    for _ in range(tiles):
+        tile = (state["col"] + sign * dcol, state["row"] + sign * drow)
+        if not level_map.is_walkable(tile, state["collected"]):
+            state["failed"] = f"Left the path at tile {tile}"
+            return
+        state["col"], state["row"] = tile
+        _enter_tile(level_map, state)
+
+
+def apply_plan_item(level_map: LevelMap, state: Dict[str, Any], item: Dict[str, Any]) -> None:
+    """
+    Apply a single execution plan item to a simulation state.
+
+    Args:
+        level_map: Level being simulated
+        state: Simulation state (modified in place)
+        item: Execution plan item
+    """
+    action = item.get("action")
+    if action == "move":
+        _move(level_map, state, item.get("distance", 1), item.get("direction", "forward"))
+    elif action == "rotate":
+        turns = quarter_turns(item.get("degrees", 90))
+        if item.get("direction") == "left":
+            turns = -turns
+        state["heading"] = turn(state["heading"], turns)
+    elif action == "pick_object":
+        state["inventory"].append(item.get("object_name", "item"))
+    elif action == "print":
+        state["messages"].append(item.get("message", ""))
+    elif action == "conditional":
+        state["steps"] += 1
+        try:
+            taken = evaluate_condition(str(item.get("condition", "True")), condition_env(level_map, state))
+        except ConditionError as e:
+            state["failed"] = str(e)
+            return
+        branch = item.get("if_branch", []) if taken else item.get("else_branch", [])
+        for branch_item in branch:
+            apply_plan_item(level_map, state, branch_item)
+            if state["failed"]:
+                return
+        return
+    # jump, wait, variable and function definitions do not move the seahorse
+    state["steps"] += 1
+
+
+def condition_env(level_map: LevelMap, state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the names a conditional block may test (see conditions.STATE_NAMES).
+
+    Args:
+        level_map: Level being simulated
+        state: Current simulation state
+
+    Returns:
+        Dictionary of state names to values
+    """
+    collected = state["collected"]
+    has_key = "key" in collected or "key" in state["inventory"]
+    coins = sum(1 for name in collected if name.startswith("coin"))
+    return {
+        "key_collected": has_key,
+        "has_key": has_key,
+        "door_open": all(key in collected for key in level_map.doors.values()),
+        "coin_collected": coins > 0,
+        "coins_collected": coins,
+        "goals_collected": len(collected),
+        "completed": state["completed"],
+        "inventory_count": len(state["inventory"]),
+        "steps": state["steps"],
+        "x": state["col"],
+        "y": state["row"],
+        "col": state["col"],
+        "row": state["row"],
+        "heading": HEADING_NAMES[state["heading"]],
+    }
+
+
+def simulate_plan(plan: List[Dict[str, Any]], level: int, pose: Optional[Pose] = None) -> Dict[str, Any]:
+    """
+    Replay an execution plan on a level's tile map.
+
+    Args:
+        plan: Execution plan from CodeGenerator.generate_from_blocks
+        level: Level number (1-4)
+        pose: Optional starting pose (defaults to the level's start)
+
+    Returns:
+        Final simulation state with pose, collected goals and failure reason
+    """
+    level_map = get_level_map(level)
+    if level_map is None:
+        raise ValueError(f"No map for level {level}")
+
+    state = new_state(level_map, pose)
+    for item in plan:
+        apply_plan_item(level_map, state, item)
+        if state["failed"]:
+            break
+    return state
+
+
+def state_pose(state: Dict[str, Any]) -> Pose:
+    """Get the (col, row, heading) pose from a simulation state."""
+    return (state["col"], state["row"], state["heading"])
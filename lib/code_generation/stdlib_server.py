@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Zero-dependency HTTP server for the Code Generator API.
+
+Serves the same /generate-code, /available-commands, /health and
+/test-loop contract as api_server.py, but only uses the standard library
+(http.server.ThreadingHTTPServer), so it starts much faster on
+scale-to-zero and serverless deployments. See bench_cold_start.py.
+
+Usage:
+    python3 stdlib_server.py --port 5000
+"""
+
+from typing import Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import argparse
+import os
+
+from block_input import STREAM_PARSE_BYTES
+import plan_codec
+import service
+import wire
+
+
+MAX_BODY_BYTES = int(os.environ.get("CODEGEN_MAX_BODY_BYTES", 10 * 1024 * 1024))
+
+
+class _BodyReader:
+    """Reads at most Content-Length bytes from the connection."""
+
+    def __init__(self, rfile, length: int):
+        self._rfile = rfile
+        self.remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        chunk = self._rfile.read(size) if size else b""
+        self.remaining -= len(chunk)
+        return chunk
+
+
+class CodeGeneratorHandler(BaseHTTPRequestHandler):
+    """Routes requests to the shared handlers in service.py."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    server_version = "CodeGeneratorAPI/1.0"
+    access_log = False
+
+    def log_message(self, format, *args):
+        if self.access_log:
+            super().log_message(format, *args)
+
+    def _send_json(self, payload, status: int = 200) -> None:
+        self._send_bytes(wire.dumps(payload), status, {})
+
+    def _send_bytes(self, body: bytes, status: int, headers, content_type: str = "application/json") -> None:
+        if status != 304:
+            body, encoding_headers = wire.maybe_compress(body, self.headers.get("Accept-Encoding"),
+                                                         headers.get("ETag"))
+            headers = {**headers, **encoding_headers}
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self._send_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_cors_headers(self) -> None:
+        self.send_header("Access-Control-Allow-Origin", self.headers.get("Origin") or "*")
+        self.send_header("Vary", "Origin")
+
+    def _content_length(self) -> Optional[int]:
+        """
+        Parse and check Content-Length once. A malformed, negative or
+        oversized length gets a 400/413 and closes the connection, since
+        the body cannot be drained safely; returns None in that case.
+        """
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            error = {"success": False, "error": "Invalid Content-Length"}, 400
+        elif length > MAX_BODY_BYTES:
+            error = {"success": False, "error": "Request body too large"}, 413
+        else:
+            return length
+        self.close_connection = True
+        self._send_bytes(wire.dumps(error[0]), error[1], {"Connection": "close"})
+        return None
+
+    def _read_json(self, length: int):
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return wire.loads(raw or b"null"), None
+        except ValueError:
+            return None, ({"success": False, "error": "Invalid JSON body"}, 400)
+
+    def do_OPTIONS(self):
+        # CORS preflight
+        self.send_response(204)
+        self._send_cors_headers()
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers",
+                         self.headers.get("Access-Control-Request-Headers") or "Content-Type")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/available-commands":
+            level = parse_qs(url.query).get("level", [None])[0]
+            self._send_bytes(*service.available_commands_response(
+                level, self.headers.get("If-None-Match"), self.headers.get("Accept-Encoding")))
+        elif url.path == "/health":
+            self._send_json(*service.health())
+        elif url.path == "/test-loop":
+            self._send_json(*service.test_loop())
+        else:
+            self._send_json({"success": False, "error": "Not found"}, 404)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        length = self._content_length()
+        if length is None:
+            return
+        if url.path != "/generate-code":
+            # Drain the (bounded) body so the keep-alive connection stays usable
+            self.rfile.read(length)
+            self._send_json({"success": False, "error": "Not found"}, 404)
+            return
+        if length >= STREAM_PARSE_BYTES:
+            body = _BodyReader(self.rfile, length)
+            payload, status = service.generate_code_stream(body)
+            # Drain whatever a parse error left unread, for keep-alive
+            while body.read(64 * 1024):
+                pass
+        else:
+            data, error = self._read_json(length)
+            if error:
+                self._send_json(*error)
+                return
+            payload, status = service.generate_code(data)
+        plan_format = parse_qs(url.query).get("plan_format", [None])[0]
+        if status == 200 and plan_codec.wants_binary(self.headers.get("Accept"), plan_format):
+            self._send_bytes(plan_codec.encode_response(payload), status, {}, plan_codec.BINARY_MIME)
+            return
+        self._send_json(payload, status)
+
+
+def make_server(host: str = "0.0.0.0", port: int = 5000) -> ThreadingHTTPServer:
+    """Create (but do not start) the threaded HTTP server."""
+    server = ThreadingHTTPServer((host, port), CodeGeneratorHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Standard-library HTTP server for the Code Generator API")
+    parser.add_argument("--host", default=os.environ.get("CODEGEN_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("CODEGEN_PORT", 5000)))
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    CodeGeneratorHandler.access_log = args.access_log
+    server = make_server(args.host, args.port)
+    print(f"🚀 Serving on http://{args.host}:{args.port} (stdlib server)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Tests for fingerprint.py: equivalent programs share a fingerprint,
+programs that behave differently don't, and grade() agrees with
+simulating the submitted program.
+
+    python -m pytest test_fingerprint.py
+"""
+
+import random
+
+import pytest
+
+from code_generator import CodeGenerator
+from fingerprint import SolutionIndex, fingerprint
+from simulator import simulate_plan
+
+
+def block(block_type, **params):
+    return {"type": block_type, "params": params}
+
+
+def conditional(condition, if_body, else_body=()):
+    return block("conditional", condition=condition, if_body=list(if_body), else_body=list(else_body))
+
+
+def simulate(blocks, level):
+    _, plan = CodeGenerator().generate_from_blocks(blocks)
+    state = simulate_plan(plan, level)
+    return {"completed": state["completed"], "collected": state["collected"], "failed": state["failed"]}
+
+
+STEPS_PROBE = [conditional("steps >= 2", [block("move_forward", distance=1)])]
+
+
+def test_equivalent_programs_share_a_fingerprint():
+    rolled = [block("loop", iterations=2, body=[block("move_forward")])]
+    unrolled = [block("move_forward", distance=1), block("move_forward", distance=1.0)]
+    assert fingerprint(rolled) == fingerprint(unrolled)
+    assert fingerprint([block("turn_right"), block("turn_right")]) == \
+        fingerprint([block("turn_right", degrees=180)])
+
+
+def test_turns_are_kept_when_a_condition_reads_steps():
+    cancelling = [block("turn_right"), block("turn_left")] + STEPS_PROBE
+    assert fingerprint(cancelling) != fingerprint(STEPS_PROBE)
+    # Without a steps condition the cancelling turns still fold away
+    assert fingerprint([block("turn_right"), block("turn_left"), block("move_forward")]) == \
+        fingerprint([block("move_forward")])
+
+
+@pytest.mark.parametrize("blocks", [
+    [block("turn_right"), block("turn_left")] + STEPS_PROBE,
+    STEPS_PROBE,
+])
+def test_grade_matches_the_submitted_program(blocks):
+    index = SolutionIndex(1)
+    assert {key: index.grade(blocks)[key] for key in ("completed", "collected", "failed")} == \
+        simulate(blocks, 1)
+
+
+def test_grade_matches_simulation_on_random_programs():
+    rng = random.Random(7)
+    simple = ["move_forward", "move_backward", "turn_left", "turn_right", "jump"]
+    conditions = ["steps >= 3", "steps < 2", "heading == 'east'", "coins_collected > 0"]
+    for level in (1, 2, 3, 4):
+        index = SolutionIndex(level)
+        for _ in range(150):
+            blocks = []
+            for _ in range(rng.randint(1, 6)):
+                if rng.random() < 0.2:
+                    blocks.append(conditional(rng.choice(conditions),
+                                              [block(rng.choice(simple))], [block(rng.choice(simple))]))
+                elif rng.random() < 0.2:
+                    blocks.append(block("loop", iterations=rng.randint(0, 3),
+                                        body=[block(rng.choice(simple))]))
+                else:
+                    blocks.append(block(rng.choice(simple)))
+            graded = index.grade(blocks)
+            assert {key: graded[key] for key in ("completed", "collected", "failed")} == \
+                simulate(blocks, level), blocks
@@ -0,0 +1,118 @@
+"""
+Recovery tests for journal.py and SessionStore.recover: torn log lines,
+ops that no longer apply, snapshots that no longer validate and a
+second writer on the same directory.
+
+    python -m pytest test_journal.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import journal as journal_module
+from journal import SessionJournal
+from session_store import SessionStore
+
+
+FORWARD = {"type": "move_forward", "params": {"distance": 1}}
+LEFT = {"type": "turn_left", "params": {"degrees": 90}}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = SessionJournal(str(tmp_path), flush_interval=0.01, snapshot_every=1000)
+    yield journal
+    journal.close()
+
+
+def reopen(journal):
+    """Close a journal and restore its sessions into a fresh store."""
+    journal.close()
+    reopened = SessionJournal(journal.directory, flush_interval=0.01, snapshot_every=1000)
+    store = SessionStore(journal=reopened)
+    store.recover()
+    reopened.flush()
+    return store, reopened
+
+
+def test_torn_last_line_is_ignored(journal):
+    store = SessionStore(journal=journal)
+    session = store.create(level=1, blocks=[FORWARD])
+    session.apply_ops([{"op": "add", "block": LEFT}])
+    session.apply_ops([{"op": "add", "block": FORWARD}])
+    journal.flush()
+    with open(os.path.join(journal.directory, f"{session.session_id}.log"), "ab") as f:
+        f.write(b'{"v": 99, "ops": [{"op": "add", "blo')  # crash mid-write
+
+    store, reopened = reopen(journal)
+    restored = store.get(session.session_id)
+    assert restored.workflow.get_sequence() == [FORWARD, LEFT, FORWARD]
+    assert restored.version == session.version
+    assert store.stats()["skipped_ops"] == 0
+    reopened.close()
+
+
+def test_ops_that_no_longer_apply_are_counted_and_kept(journal):
+    store = SessionStore(journal=journal)
+    session = store.create(level=1, blocks=[FORWARD])
+    journal.flush()
+    log_path = os.path.join(journal.directory, f"{session.session_id}.log")
+    with open(log_path, "a") as f:
+        f.write(json.dumps({"v": session.version + 1, "ops": [
+            {"op": "add", "block": LEFT},
+            {"op": "remove", "index": 42}
+        ]}) + "\n")
+
+    store, reopened = reopen(journal)
+    assert store.get(session.session_id).workflow.get_sequence() == [FORWARD, LEFT]
+    assert store.stats()["skipped_ops"] == 1
+    # The original record is kept for inspection
+    with open(f"{log_path}.rejected") as f:
+        assert '"index": 42' in f.read()
+    reopened.close()
+
+
+def test_invalid_snapshot_is_quarantined_not_deleted(journal):
+    store = SessionStore(journal=journal)
+    session = store.create(level=1, blocks=[FORWARD])
+    journal.flush()
+    snap_path = os.path.join(journal.directory, f"{session.session_id}.snap")
+    with open(snap_path, "w") as f:
+        json.dump({"session_id": session.session_id, "level": 1, "version": 1,
+                   "blocks": [{"type": "no_such_block", "params": {}}]}, f)
+
+    store, reopened = reopen(journal)
+    assert len(store) == 0
+    assert store.stats()["quarantined"] == 1
+    assert not os.path.exists(snap_path)
+    assert os.path.exists(f"{snap_path}.rejected")
+    # Quarantined sessions are not loaded again
+    assert list(reopened.load_all()) == []
+    reopened.close()
+
+
+OPEN_IN_ANOTHER_PROCESS = """
+import sys
+from journal import SessionJournal
+try:
+    SessionJournal(sys.argv[1], lock_wait=0.2).close()
+except RuntimeError:
+    sys.exit(3)
+"""
+
+
+def open_in_another_process(directory):
+    here = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.run([sys.executable, "-c", OPEN_IN_ANOTHER_PROCESS, directory], cwd=here).returncode
+
+
+@pytest.mark.skipif(journal_module.fcntl is None, reason="no fcntl on this platform")
+def test_second_process_cannot_open_a_locked_directory(journal):
+    assert open_in_another_process(journal.directory) == 3
+    # The lock is released on close
+    journal.close()
+    assert open_in_another_process(journal.directory) == 0
@@ -0,0 +1,79 @@
+"""
+Tests for persistent_sequence.py: a random edit fuzz against a plain
+list, with the AVL invariants checked after every edit.
+
+    python -m pytest test_persistent_sequence.py
+"""
+
+import random
+
+import pytest
+
+from persistent_sequence import PersistentSequence, _height, _size
+
+
+def check_invariants(node):
+    """Assert heights, sizes and the AVL balance of a subtree; return its height."""
+    if node is None:
+        return 0
+    left_height = check_invariants(node.left)
+    right_height = check_invariants(node.right)
+    assert abs(left_height - right_height) <= 1
+    assert node.height == 1 + max(left_height, right_height)
+    assert node.size == 1 + _size(node.left) + _size(node.right)
+    return node.height
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_edits_match_a_list_and_stay_balanced(seed):
+    rng = random.Random(seed)
+    sequence = PersistentSequence()
+    expected = []
+    versions = []
+    for step in range(2000):
+        op = rng.randrange(4) if expected else 0
+        if op == 0:
+            index = rng.randint(-len(expected) - 2, len(expected) + 2)
+            sequence = sequence.insert(index, step)
+            expected.insert(index, step)
+        elif op == 1:
+            sequence = sequence.append(step)
+            expected.append(step)
+        elif op == 2:
+            index = rng.randrange(-len(expected), len(expected))
+            sequence = sequence.delete(index)
+            del expected[index]
+        else:
+            index = rng.randrange(len(expected))
+            sequence = sequence.set(index, -step)
+            expected[index] = -step
+        check_invariants(sequence._root)
+        assert len(sequence) == len(expected)
+        if step % 97 == 0:
+            versions.append((sequence, list(expected)))
+
+    assert list(sequence) == expected
+    assert [sequence[i] for i in range(len(expected))] == expected
+    # Old versions are untouched by later edits
+    for version, items in versions:
+        assert version.to_list() == items
+
+
+def test_height_is_logarithmic():
+    sequence = PersistentSequence()
+    for value in range(4096):
+        sequence = sequence.append(value)
+    # AVL height bound: 1.44 * log2(n + 2)
+    assert _height(sequence._root) <= 18
+    check_invariants(sequence._root)
+
+
+def test_index_errors_and_equality():
+    sequence = PersistentSequence([1, 2, 3])
+    with pytest.raises(IndexError):
+        sequence[3]
+    with pytest.raises(IndexError):
+        sequence.delete(-4)
+    assert sequence[-1] == 3
+    assert sequence == [1, 2, 3] == list(PersistentSequence(sequence))
+    assert sequence.set(0, 9) != sequence
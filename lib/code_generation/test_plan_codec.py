@@ -0,0 +1,87 @@
+"""
+Round-trip tests for plan_codec.py on real execution plans with loops
+and conditionals.
+
+    python -m pytest test_plan_codec.py
+"""
+
+import pytest
+
+import plan_codec
+import service
+
+
+LOOP = {"type": "loop", "params": {"iterations": 3, "body": [
+    {"type": "move_forward", "params": {"distance": 2}},
+    {"type": "turn_right", "params": {"degrees": 90}},
+    {"type": "loop", "params": {"iterations": 2, "body": [
+        {"type": "jump", "params": {"height": 2}}
+    ]}}
+]}}
+
+CONDITIONAL = {"type": "conditional", "params": {
+    "condition": "steps < 4",
+    "if_body": [{"type": "move_forward", "params": {"distance": 1}},
+                {"type": "pick_object", "params": {"object_name": "key"}}],
+    "else_body": [{"type": "turn_left", "params": {"degrees": 90}},
+                  {"type": "wait", "params": {"seconds": 0.1}}]
+}}
+
+PROGRAMS = {
+    "loop": [LOOP],
+    "conditional": [CONDITIONAL],
+    "conditional_in_loop": [
+        {"type": "print", "params": {"message": "start"}},
+        {"type": "loop", "params": {"iterations": 2, "body": [CONDITIONAL, LOOP]}},
+        {"type": "move_backward", "params": {"distance": 1}}
+    ]
+}
+
+
+def generate(blocks):
+    payload, status = service.generate_code({"level": 4, "blocks": blocks})
+    assert status == 200, payload
+    assert payload["execution_plan"]
+    return payload
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_response_round_trip(name):
+    payload = generate(PROGRAMS[name])
+    assert plan_codec.decode_response(plan_codec.encode_response(payload)) == payload
+
+
+@pytest.mark.parametrize("name", sorted(PROGRAMS))
+def test_columns_match_plan(name):
+    plan = generate(PROGRAMS[name])["execution_plan"]
+    columns = plan_codec.decode_columns(plan_codec.encode_plan(plan))
+    assert columns["count"] == len(plan)
+    for i, item in enumerate(plan):
+        if "loop_iteration" in item:
+            assert columns["loop_iteration"][i] == item["loop_iteration"]
+        if "duration" in item:
+            # Durations that float32 can't hold exactly travel in the extras
+            if columns["flags"][i] & plan_codec.F_DURATION:
+                assert columns["duration"][i] == item["duration"]
+            else:
+                assert columns["extras"][str(i)]["duration"] == item["duration"]
+
+
+def test_unusual_items_round_trip():
+    plan = [
+        {"action": "teleport", "direction": 7, "duration": 0.1, "step": "a_b"},
+        {"action": "move", "direction": None, "distance": 1e40, "loop_iteration": True},
+        {"action": "turn", "direction": "right", "degrees": 90, "step": "0_iter2_1"},
+        {"note": "no action at all", "branches": [1], "if_branch": [1], "else_branch": []}
+    ]
+    decoded, meta = plan_codec.decode_plan(plan_codec.encode_plan(plan, {"success": True}))
+    assert decoded == plan
+    assert meta == {"success": True}
+
+
+def test_rejects_foreign_and_truncated_data():
+    encoded = plan_codec.encode_plan(generate([LOOP])["execution_plan"])
+    with pytest.raises(ValueError):
+        plan_codec.decode_plan(b"JSON" + encoded[4:])
+    with pytest.raises(ValueError):
+        plan_codec.decode_plan(encoded[:40])
@@ -0,0 +1,44 @@
+"""
+Tests for PlanTimeline in code_generator.py: conditionals count as their
+longer branch, function definitions as nothing.
+
+    python -m pytest test_plan_timeline.py
+"""
+
+from code_generator import CodeGenerator, PlanTimeline
+
+
+def block(block_type, **params):
+    return {"type": block_type, "params": params}
+
+
+def timeline(blocks):
+    _, _, plan_timeline = CodeGenerator().generate_with_timeline(blocks)
+    return plan_timeline
+
+
+def test_conditional_counts_as_its_longer_branch():
+    plan_timeline = timeline([
+        block("conditional", condition="steps > 1",
+              if_body=[block("wait", seconds=2)],
+              else_body=[block("move_forward", distance=1)]),
+        block("turn_left")
+    ])
+    assert plan_timeline.starts == [0.0, 2.0, 2.5]
+    assert plan_timeline.step_at(1.9) == 0
+    assert plan_timeline.time_of(1) == 2.0
+
+
+def test_nested_conditionals_and_empty_branches():
+    inner = block("conditional", condition="heading == 'east'",
+                  if_body=[block("wait", seconds=1), block("wait", seconds=1)])
+    plan_timeline = timeline([block("conditional", condition="True", if_body=[],
+                                    else_body=[inner, block("wait", seconds=0.5)])])
+    assert plan_timeline.total_duration == 2.5
+
+
+def test_function_definition_takes_no_time():
+    plan_timeline = timeline([block("function", name="walk", body=[block("wait", seconds=3)]),
+                              block("wait", seconds=1)])
+    assert plan_timeline.total_duration == 1.0
+    assert PlanTimeline.item_duration({"action": "wait", "duration": -1}) == 0.0
@@ -0,0 +1,294 @@
+"""
+Level-aware validation of incoming blocks, compiled once per level.
+
+Blocks are checked before any code is generated:
+
+    - the block type exists and the CommandPalette offers it at the
+      request's level (its available_levels)
+    - each param has the right type and lies in its range
+    - strings that are written into the generated code can't break out
+      of it: print messages must not contain quotes, backslashes or
+      control characters, and conditions must compile with the
+      restricted condition compiler (conditions.py)
+    - the program's execution plan stays within MAX_PLAN_STEPS steps once
+      loops are expanded (a few nested loops of 1000 iterations would
+      otherwise make a tiny request generate a billion-step plan)
+
+For every level, the palette metadata is compiled into a table of
+per-type param checkers, so validating a program is one pass over its
+blocks. Every violation is reported with the path of the offending value:
+
+    {"path": "blocks[2].params.body[0].params.iterations",
+     "code": "out_of_range", "message": "must be between 0 and 1000"}
+
+and the request is answered with 422 instead of being generated.
+
+Configuration (environment variables):
+    CODEGEN_MAX_LOOP_ITERATIONS - largest loop count accepted (default: 1000)
+    CODEGEN_MAX_NESTING         - deepest nesting of block bodies (default: 16)
+    CODEGEN_MAX_PLAN_STEPS      - largest expanded execution plan (default: 100000)
+"""
+
+from typing import Dict, List, Any, Callable, Optional, Tuple
+from functools import lru_cache
+import math
+import os
+
+from code_generator import BlockType, CommandPalette
+from conditions import ConditionError, compile_condition
+
+
+MAX_LOOP_ITERATIONS = int(os.environ.get("CODEGEN_MAX_LOOP_ITERATIONS", 1000))
+MAX_NESTING = int(os.environ.get("CODEGEN_MAX_NESTING", 16))
+MAX_PLAN_STEPS = int(os.environ.get("CODEGEN_MAX_PLAN_STEPS", 100000))
+
+# Stop collecting after this many violations
+MAX_VIOLATIONS = 20
+
+# Param name -> (kind, low, high); for text kinds the bounds are lengths
+PARAM_RULES: Dict[str, Tuple[str, Any, Any]] = {
+    "distance": ("int", 1, 100),
+    "degrees": ("number", 1, 360),
+    "height": ("int", 1, 10),
+    "seconds": ("number", 0, 60),
+    "iterations": ("int", 0, MAX_LOOP_ITERATIONS),
+    "message": ("text", 0, 200),
+    "object_name": ("text", 1, 64),
+    "condition": ("condition", 1, 200),
+    "body": ("blocks", None, None),
+    "if_body": ("blocks", None, None),
+    "else_body": ("blocks", None, None),
+}
+
+# Characters that would end or escape the string literal in print("...")
+_UNSAFE_TEXT = ('"', "\\")
+
+Violations = List[Dict[str, str]]
+# Returns the plan steps of nested blocks (0 for scalar params)
+Checker = Callable[[Any, str, Violations, int], int]
+
+
+class ValidationError(ValueError):
+    """Raised when a request's blocks (or level) fail validation."""
+
+    def __init__(self, violations: Violations):
+        first = violations[0]
+        more = f" (and {len(violations) - 1} more)" if len(violations) > 1 else ""
+        super().__init__(f"{first['path']}: {first['message']}{more}")
+        self.violations = violations
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Error response payload."""
+        return {"success": False, "error": str(self), "violations": self.violations}
+
+
+def _violation(violations: Violations, path: str, code: str, message: str) -> None:
+    violations.append({"path": path, "code": code, "message": message})
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _range_checker(kind: str, low: Any, high: Any) -> Checker:
+    def check(value, path, violations, depth):
+        if kind == "int" and not (isinstance(value, int) and not isinstance(value, bool)):
+            _violation(violations, path, "invalid_type", "must be an integer")
+        elif kind == "number" and not (_is_number(value) and math.isfinite(value)):
+            _violation(violations, path, "invalid_type", "must be a number")
+        elif not low <= value <= high:
+            _violation(violations, path, "out_of_range", f"must be between {low} and {high}")
+        return 0
+    return check
+
+
+def _text_checker(kind: str, low: int, high: int) -> Checker:
+    def check(value, path, violations, depth):
+        if not isinstance(value, str):
+            _violation(violations, path, "invalid_type", "must be a string")
+        elif not low <= len(value) <= high:
+            _violation(violations, path, "out_of_range", f"length must be between {low} and {high}")
+        elif not value.isprintable():
+            _violation(violations, path, "unsafe_value", "must not contain control characters")
+        elif kind == "condition":
+            try:
+                compile_condition(value)
+            except ConditionError as e:
+                _violation(violations, path, "invalid_condition", str(e))
+        elif any(char in value for char in _UNSAFE_TEXT):
+            _violation(violations, path, "unsafe_value", "must not contain quotes or backslashes")
+        return 0
+    return check
+
+
+# What the generator assumes when a loop has no iterations param
+_DEFAULT_ITERATIONS = 3
+
+
+def check_plan_steps(steps: int, path: str, violations: Violations) -> bool:
+    """
+    Report a program whose expanded plan exceeds MAX_PLAN_STEPS.
+
+    Returns:
+        True if the program is within the budget
+    """
+    if steps <= MAX_PLAN_STEPS:
+        return True
+    _violation(violations, path, "too_large",
+               f"program expands to more than {MAX_PLAN_STEPS} plan steps")
+    return False
+
+
+class LevelValidator:
+    """
+    Param checkers for the block types offered at one level
+    (or at any level, if level is None).
+    """
+
+    def __init__(self, level: Optional[int], commands: Dict[str, Dict[str, Any]]):
+        self.level = level
+        self._rules: Dict[str, Tuple[Tuple[str, Checker], ...]] = {}
+        for command in commands.values():
+            if level is not None and level not in command.get("available_levels", []):
+                continue
+            self._rules[command["type"]] = tuple(
+                (param, self._compile(param)) for param in command.get("default_params", {})
+            )
+        self._known_types = frozenset(block_type.value for block_type in BlockType)
+
+    def _compile(self, param: str) -> Checker:
+        kind, low, high = PARAM_RULES[param]
+        if kind in ("int", "number"):
+            return _range_checker(kind, low, high)
+        if kind in ("text", "condition"):
+            return _text_checker(kind, low, high)
+
+        def check_body(value, path, violations, depth):
+            steps = 0
+            if not isinstance(value, list):
+                _violation(violations, path, "invalid_type", "must be a list of blocks")
+            elif depth >= MAX_NESTING:
+                _violation(violations, path, "too_deep", f"blocks may be nested at most {MAX_NESTING} deep")
+            else:
+                for index, block in enumerate(value):
+                    steps += self.check_block(block, f"{path}[{index}]", violations, depth + 1)
+            return steps
+        return check_body
+
+    def check_block(self, block: Any, path: str, violations: Violations, depth: int = 0) -> int:
+        """
+        Check one block and its nested bodies, appending any violations.
+
+        Args:
+            block: Block in dict form (see block_input.expand_blocks)
+            path: Path of the block in the request, e.g. "blocks[3]"
+            violations: List the violations are appended to
+            depth: Nesting depth of the block
+
+        Returns:
+            Number of execution plan steps the block expands to (loops
+            multiplied out; both branches of a conditional counted)
+        """
+        if len(violations) >= MAX_VIOLATIONS:
+            return 0
+        if not isinstance(block, dict):
+            _violation(violations, path, "invalid_block", "must be an object")
+            return 0
+        block_type = block.get("type")
+        rules = self._rules.get(block_type) if isinstance(block_type, str) else None
+        if rules is None:
+            if isinstance(block_type, str) and block_type in self._known_types:
+                where = f"at level {self.level}" if self.level is not None else "at any level"
+                _violation(violations, f"{path}.type", "not_available", f"'{block_type}' is not available {where}")
+            else:
+                _violation(violations, f"{path}.type", "unknown_type", f"unknown block type {block_type!r}")
+            return 0
+        params = block.get("params", {})
+        if not isinstance(params, dict):
+            _violation(violations, f"{path}.params", "invalid_type", "must be an object")
+            return 0
+        nested = 0
+        for param, check in rules:
+            if param in params:
+                nested += check(params[param], f"{path}.params.{param}", violations, depth)
+        if block_type == BlockType.LOOP.value:
+            iterations = params.get("iterations", _DEFAULT_ITERATIONS)
+            if not isinstance(iterations, int) or isinstance(iterations, bool):
+                return 0  # already reported
+            return max(iterations, 0) * nested
+        return 1 + nested
+
+    def validate(self, blocks: Any, path: str = "blocks") -> Violations:
+        """
+        Check a block list.
+
+        Returns:
+            List of violations (empty if the blocks are valid)
+        """
+        violations: Violations = []
+        if not isinstance(blocks, list):
+            _violation(violations, path, "invalid_type", "must be a list of blocks")
+            return violations
+        steps = 0
+        for index, block in enumerate(blocks):
+            steps += self.check_block(block, f"{path}[{index}]", violations)
+            if len(violations) >= MAX_VIOLATIONS:
+                break
+        check_plan_steps(steps, path, violations)
+        return violations
+
+    def check(self, blocks: Any, path: str = "blocks") -> None:
+        """
+        Check a block list.
+
+        Raises:
+            ValidationError: With every violation found
+        """
+        violations = self.validate(blocks, path)
+        if violations:
+            raise ValidationError(violations)
+
+
+_PALETTE_COMMANDS = CommandPalette.shared_commands()
+LEVELS = tuple(sorted({level for command in _PALETTE_COMMANDS.values()
+                       for level in command.get("available_levels", [])}))
+
+
+def parse_level(value: Any, path: str = "level") -> int:
+    """
+    Check a level from a request.
+
+    Raises:
+        ValidationError: If it is not one of the palette's levels
+    """
+    try:
+        level = int(value) if not isinstance(value, (bool, float)) else None
+    except (TypeError, ValueError):
+        level = None
+    if level not in LEVELS:
+        raise ValidationError([{
+            "path": path, "code": "invalid_level",
+            "message": f"must be one of {', '.join(map(str, LEVELS))}"
+        }])
+    return level
+
+
+@lru_cache(maxsize=None)
+def get_validator(level: Optional[int]) -> LevelValidator:
+    """Get the compiled validator of a level (None: types offered at any level)."""
+    return LevelValidator(level, _PALETTE_COMMANDS)
+
+
+def check_blocks(blocks: Any, level: Any) -> int:
+    """
+    Check a request's level and blocks.
+
+    Returns:
+        The level as an int
+
+    Raises:
+        ValidationError: With every violation found
+    """
+    level = parse_level(level)
+    get_validator(level).check(blocks)
+    return level
@@ -0,0 +1,196 @@
+"""
+Response encoding: fast JSON and negotiated compression.
+
+JSON is encoded with orjson when it is installed and with the standard
+library otherwise. The executable-code prelude is JSON-escaped once at
+import time and spliced into responses, so the constant ~2.5 KB of
+function implementations is not re-escaped on every request. Bodies
+above a size threshold are gzip- or deflate-compressed when the client
+accepts it; a compressed body's ETag gets the coding appended
+("abc" -> "abc-gzip"), since its bytes differ from the identity body's.
+
+Configuration (environment variables):
+    CODEGEN_COMPRESS_MIN_BYTES - smallest body worth compressing (default: 1024)
+    CODEGEN_COMPRESS_LEVEL     - zlib/gzip level 1-9 (default: 6)
+    CODEGEN_DISABLE_ORJSON     - set to 1 to force the stdlib encoder
+"""
+
+from typing import Dict, Any, Optional, Tuple
+import gzip
+import json
+import os
+import zlib
+
+from code_generator import EXECUTABLE_PRELUDE
+
+try:
+    if os.environ.get("CODEGEN_DISABLE_ORJSON") == "1":
+        raise ImportError
+    import orjson
+except ImportError:
+    orjson = None
+
+
+COMPRESS_MIN_BYTES = int(os.environ.get("CODEGEN_COMPRESS_MIN_BYTES", 1024))
+COMPRESS_LEVEL = int(os.environ.get("CODEGEN_COMPRESS_LEVEL", 6))
+
+# Preferred first when the client ranks encodings equally
+SUPPORTED_ENCODINGS = ("gzip", "deflate")
+
+
+def _encode_string_contents(text: str) -> bytes:
+    """JSON-escape a string without the surrounding quotes."""
+    return json.dumps(text).encode("utf-8")[1:-1]
+
+
+_PRELUDE_JSON = _encode_string_contents(EXECUTABLE_PRELUDE)
+
+
+def dumps(payload: Any) -> bytes:
+    """
+    Encode a payload as compact JSON bytes.
+
+    A top-level "code" string that starts with the executable prelude is
+    written last, with the pre-encoded prelude spliced in.
+
+    Args:
+        payload: JSON-serializable value
+
+    Returns:
+        UTF-8 JSON bytes
+    """
+    code = payload.get("code") if isinstance(payload, dict) else None
+    if isinstance(code, str) and code.startswith(EXECUTABLE_PRELUDE):
+        rest = {key: value for key, value in payload.items() if key != "code"}
+        head = _dumps(rest)
+        return b"".join([
+            head[:-1],
+            b',"code":"' if len(head) > 2 else b'"code":"',
+            _PRELUDE_JSON,
+            _encode_string_contents(code[len(EXECUTABLE_PRELUDE):]),
+            b'"}'
+        ])
+    return _dumps(payload)
+
+
+def dumps_sorted(payload: Any) -> bytes:
+    """Encode compact JSON with sorted keys (a stable form for hashing)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload)
+        except TypeError:
+            pass  # e.g. non-string dict keys; the stdlib encoder handles them
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    """Decode JSON bytes or text with the fastest available decoder."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding: Raw header value, e.g. "gzip, deflate;q=0.5"
+
+    Returns:
+        "gzip", "deflate", or None for identity
+    """
+    if not accept_encoding:
+        return None
+    ranked: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        ranked[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = ranked.get(encoding, ranked.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body with the given content coding."""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0)
+    if encoding == "deflate":
+        return zlib.compress(body, COMPRESS_LEVEL)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def body_encoding(body: bytes, accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Get the content coding maybe_compress would use for a body.
+
+    Args:
+        body: Uncompressed response body
+        accept_encoding: Accept-Encoding request header
+
+    Returns:
+        "gzip", "deflate", or None if the body is sent as is
+    """
+    if len(body) < COMPRESS_MIN_BYTES:
+        return None
+    return choose_encoding(accept_encoding)
+
+
+def coded_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    Get the ETag of a body sent with a content coding.
+
+    Args:
+        etag: ETag of the identity body, quoted (optionally W/-prefixed)
+        encoding: Content coding, or None for identity
+
+    Returns:
+        The ETag with "-<encoding>" appended inside the quotes
+    """
+    if not encoding or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def maybe_compress(body: bytes, accept_encoding: Optional[str],
+                   etag: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Compress a body if it is large enough and the client accepts it.
+
+    Args:
+        body: Uncompressed response body
+        accept_encoding: Accept-Encoding request header
+        etag: The identity body's ETag, if the response has one
+
+    Returns:
+        Tuple of (body, extra response headers); these include the
+        coding's ETag when the body was compressed
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = body_encoding(body, accept_encoding)
+    if encoding is None:
+        return body, headers
+    headers["Content-Encoding"] = encoding
+    if etag:
+        headers["ETag"] = coded_etag(etag, encoding)
+    return compress(body, encoding), headers